@@ -0,0 +1,165 @@
+# backend/batching.py
+"""Micro-batching: merge single-item calls that arrive close together into one batch call."""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Callers block in `submit(item)` while a dispatcher thread gathers up to
+    `max_batch_size` items (waiting at most `max_wait` seconds after the first)
+    and passes them to `process_batch(items)`, which must return one result per item.
+
+    With `concurrency` > 1, up to that many batches are processed at once on a
+    small thread pool (for remote calls); items queue up while every slot is busy.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait=0.01, name="batcher", concurrency=1):
+        self._process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name) if concurrency > 1 else None
+        self._counters = {"items": 0, "batches": 0, "errors": 0}
+        self._queue_wait = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """Queue `item` and wait for its result; re-raises the batch's exception."""
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        limit = self._batch_limit()
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Take a slot first, so items keep queueing (and batches grow) while all slots are busy
+            self._slots.acquire()
+            batch = self._collect()
+            if self._pool is None:
+                self._dispatch(batch)
+            else:
+                self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            started = time.monotonic()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self._process_batch(items)
+                if len(results) != len(items):
+                    raise ValueError(f"batch returned {len(results)} results for {len(items)} items")
+            except Exception as err:
+                logger.error(f"⚠️ Batch of {len(items)} failed: {err}")
+                with self._lock:
+                    self._counters["errors"] += 1
+                self._observe(len(items), time.monotonic() - started, ok=False)
+                for _, future, _ in batch:
+                    future.set_exception(err)
+                return
+            with self._lock:
+                self._counters["items"] += len(items)
+                self._counters["batches"] += 1
+                self._queue_wait += sum(started - queued for _, _, queued in batch)
+            self._observe(len(items), time.monotonic() - started, ok=True)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _batch_limit(self):
+        return self.max_batch_size
+
+    def _observe(self, size, seconds, ok):
+        """Called after every batch (size, duration, success); subclasses tune themselves here."""
+
+    def stats(self):
+        with self._lock:
+            batches, items = self._counters["batches"], self._counters["items"]
+            return {
+                **self._counters,
+                "pending": self._queue.qsize(),
+                "meanBatchSize": round(items / batches, 2) if batches else None,
+                "meanQueueWaitMs": round(self._queue_wait / items * 1000, 1) if items else None,
+                "maxBatchSize": self.max_batch_size,
+                "maxWaitMs": round(self.max_wait * 1000, 1),
+                "concurrency": self.concurrency,
+            }
+
+
+class AdaptiveMicroBatcher(MicroBatcher):
+    """
+    MicroBatcher whose batch size follows the observed batch latency (AIMD).
+
+    A full batch that finished within `target_latency` seconds raises the limit
+    by one (up to `max_batch_size`; doubling it until the first decrease, like
+    TCP slow start); a slower or failed batch halves it (down to `min_batch_size`),
+    once per congestion episode. The current limit is `batch_limit`.
+    """
+
+    def __init__(self, process_batch, min_batch_size=1, max_batch_size=32, target_latency=1.0,
+                 initial_batch_size=None, **kwargs):
+        super().__init__(process_batch, max_batch_size=max_batch_size, **kwargs)
+        self.min_batch_size = min_batch_size
+        self.target_latency = target_latency
+        self.batch_limit = initial_batch_size or min_batch_size
+        self._adjustments = {"increased": 0, "decreased": 0}
+        self._decreased_at = 0.0
+        self._slow_start = True
+
+    def _batch_limit(self):
+        with self._lock:
+            return self.batch_limit
+
+    def _observe(self, size, seconds, ok):
+        now = time.monotonic()
+        with self._lock:
+            if not ok or seconds > self.target_latency:
+                # Batches already in flight at the last decrease saw the same congestion: halve once
+                if now - seconds < self._decreased_at:
+                    return
+                self._decreased_at = now
+                self._slow_start = False
+                limit = max(self.min_batch_size, self.batch_limit // 2)
+                if limit < self.batch_limit:
+                    self._adjustments["decreased"] += 1
+                    logger.info(f"📉 {self._thread.name} batch limit {self.batch_limit} -> {limit} "
+                                f"({'failed' if not ok else f'{seconds * 1000:.0f} ms'})")
+                self.batch_limit = limit
+            elif size >= self.batch_limit and self.batch_limit < self.max_batch_size:
+                step = self.batch_limit if self._slow_start else 1
+                self.batch_limit = min(self.max_batch_size, self.batch_limit + step)
+                self._adjustments["increased"] += 1
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                "batchLimit": self.batch_limit,
+                "minBatchSize": self.min_batch_size,
+                "targetLatencyMs": round(self.target_latency * 1000, 1),
+                **self._adjustments,
+            })
+        return stats
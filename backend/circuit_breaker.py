@@ -0,0 +1,98 @@
+# backend/circuit_breaker.py
+"""
+Per-provider circuit breakers ("hf", "groq") shared by every caller in the process.
+
+closed: calls go through; `failure_threshold` consecutive failures open the circuit.
+open: calls are refused (callers use their fallback) for `reset_timeout` seconds.
+half_open: one probe call is let through; success closes the circuit, failure reopens it.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self._counts = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        """True if a call may go out now; False means use the fallback."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced after reset_timeout
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self._counts["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"✅ {self.name} circuit closed")
+            self.state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._counts["opened"] += 1
+                logger.warning(f"⚠️ {self.name} circuit opened after {self._failures} consecutive failures; "
+                               f"retrying in {self.reset_timeout:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic() if self.state == OPEN else None
+            return {
+                "state": self.state,
+                "consecutiveFailures": self._failures,
+                "retryInSeconds": round(max(0.0, retry_in), 1) if retry_in is not None else None,
+                **self._counts,
+            }
+
+
+_breakers = {
+    provider: CircuitBreaker(
+        provider,
+        failure_threshold=int(os.getenv(f"{provider.upper()}_BREAKER_FAILURES", 5)),
+        reset_timeout=float(os.getenv(f"{provider.upper()}_BREAKER_RESET", 30)),
+    )
+    for provider in ("hf", "groq")
+}
+
+
+def allow(provider):
+    return _breakers[provider].allow()
+
+
+def record(provider, ok):
+    if ok:
+        _breakers[provider].record_success()
+    else:
+        _breakers[provider].record_failure()
+
+
+def stats():
+    return {provider: breaker.stats() for provider, breaker in _breakers.items()}
@@ -0,0 +1,140 @@
+# backend/classification_queue.py
+"""Bounded background worker pool for asynchronous grievance classification."""
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFullError(Exception):
+    """Raised by `ClassificationQueue.submit` when the queue is at capacity."""
+
+
+class QueueClosedError(QueueFullError):
+    """Raised by `ClassificationQueue.submit` once shutdown has started."""
+
+
+class ClassificationQueue:
+    """
+    Fixed pool of worker threads fed by a bounded FIFO queue.
+
+    `handler(payload)` is called once per job; if it raises, the job is retried
+    in the same worker with jittered exponential backoff up to `max_retries` times.
+    """
+
+    def __init__(self, handler, workers=4, max_size=200, max_retries=3, retry_backoff=1.0):
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=max_size)
+        self._workers = workers
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._in_flight = 0
+        self._counters = {"enqueued": 0, "completed": 0, "failed": 0, "retried": 0, "rejected": 0}
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self._threads:
+            return
+        for i in range(self._workers):
+            t = threading.Thread(target=self._run, name=f"classify-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def is_full(self):
+        """True when `submit` would be refused: the queue is at capacity or shutting down."""
+        return self._closed or self._queue.full()
+
+    def submit(self, job_id, payload):
+        """
+        Enqueue a job without blocking.
+
+        Raises QueueFullError when at capacity, and QueueClosedError (a QueueFullError)
+        once shutdown has started, since nothing queued behind the stop markers would run.
+        """
+        with self._lock:
+            if self._closed:
+                self._counters["rejected"] += 1
+                raise QueueClosedError("classification queue is shutting down")
+            try:
+                self._queue.put_nowait((job_id, payload, time.monotonic()))
+            except queue.Full:
+                self._counters["rejected"] += 1
+                raise QueueFullError(f"classification queue is full ({self._queue.maxsize})")
+            self._counters["enqueued"] += 1
+
+    def shutdown(self, timeout=None):
+        """Stop accepting work, let workers drain the queue and wait for them to exit (at most `timeout` seconds)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            # Taken under the submit lock, so no job can be enqueued behind the stop markers
+            self._closed = True
+        for _ in self._threads:
+            try:
+                # A full queue blocks the stop markers too; they count against the same timeout
+                self._queue.put(_STOP, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "maxSize": self._queue.maxsize,
+                "workers": len(self._threads),
+                "closed": self._closed,
+                "inFlight": self._in_flight,
+                "lastLagSeconds": round(self._last_lag, 3),
+                "maxLagSeconds": round(self._max_lag, 3),
+                **self._counters,
+            }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            job_id, payload, enqueued_at = item
+            lag = time.monotonic() - enqueued_at
+            with self._lock:
+                self._in_flight += 1
+                self._last_lag = lag
+                self._max_lag = max(self._max_lag, lag)
+            try:
+                self._process(job_id, payload)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._queue.task_done()
+
+    def _process(self, job_id, payload):
+        for attempt in range(self._max_retries + 1):
+            try:
+                self._handler(payload)
+                with self._lock:
+                    self._counters["completed"] += 1
+                return
+            except Exception as err:
+                if attempt == self._max_retries:
+                    logger.error(f"❌ Classification job {job_id} failed after {attempt + 1} attempts: {err}")
+                    with self._lock:
+                        self._counters["failed"] += 1
+                    return
+                delay = self._retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"⚠️ Classification job {job_id} failed ({err}), retrying in {delay:.1f}s")
+                with self._lock:
+                    self._counters["retried"] += 1
+                time.sleep(delay)
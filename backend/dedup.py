@@ -0,0 +1,296 @@
+# backend/dedup.py
+"""
+Near-duplicate grievance detection with MinHash + LSH.
+
+Open grievances are indexed in memory by the MinHash signature of their word
+tokens (pipeline.tokenize) and word bigrams. A submission whose estimated
+Jaccard similarity to an indexed grievance reaches the threshold joins that
+grievance's cluster and reuses the cluster's hfEngine instead of calling HF and
+Groq again. With a scope precision, LSH buckets are also keyed by geohash cell,
+so only grievances in the same or a neighbouring cell can match.
+
+A reused classification is re-checked against the new text's own urgency
+rules, so a near-duplicate that mentions a fire or an accident is escalated
+rather than inheriting a low priority. NumPy is only imported once an index is
+built, so importing this module is cheap when DEDUP_ENABLED is off.
+
+The index lives in process memory. Each gunicorn worker keeps its own copy and
+`keep_synced` re-reads recently created grievances every few seconds, so
+duplicates submitted through another worker become matchable after one sync
+interval rather than never.
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import geo
+from pipeline import PRIORITY_LEVELS, category_from_rule_hits, decide_initial, extract_keywords, match_rules, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def shingles(text):
+    tokens = tokenize(text)
+    return sorted(set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])})
+
+
+class MinHashLSH:
+    """MinHash signatures (multiply-shift hashing over 64-bit token hashes) split into LSH bands."""
+
+    def __init__(self, num_perm=64, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signature(self, tokens):
+        """uint32[num_perm] signature, or None for an empty token set."""
+        if not tokens:
+            return None
+        import numpy as np
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little") for t in tokens),
+            dtype=np.uint64, count=len(tokens),
+        )
+        # uint64 arithmetic wraps, which is what multiply-shift hashing relies on
+        return ((hashes[:, None] * self._a + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def similarities(self, signature, others):
+        """Estimated Jaccard similarity of `signature` to each row of `others`."""
+        import numpy as np
+        return np.count_nonzero(others == signature, axis=1) / self.num_perm
+
+
+class DuplicateIndex:
+    """In-memory LSH index of open grievances, grouped into clusters that share one classification."""
+
+    def __init__(self, threshold=0.6, num_perm=64, bands=16, scope_precision=None,
+                 max_age_days=14, max_entries=50000):
+        self.lsh = MinHashLSH(num_perm, bands)
+        self.threshold = threshold
+        self.scope_precision = scope_precision
+        self.max_age = max_age_days * 86400
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # doc_id -> (signature, scope, cluster_id, added_at), oldest first
+        self._buckets = {}  # (scope, band, band bytes) -> set of doc_ids
+        self._clusters = {}  # cluster_id -> {"hfEngine", "size"}
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "hits": 0, "added": 0, "evicted": 0}
+        self.ready = False
+
+    def _scope(self, geohash):
+        return geohash[:self.scope_precision] if self.scope_precision and geohash else ""
+
+    def lookup(self, text, geohash=None):
+        """Best matching open cluster as {clusterId, matchedId, similarity, hfEngine}, or None."""
+        import numpy as np
+        signature = self.lsh.signature(shingles(text))
+        if signature is None:
+            return None
+        scope = self._scope(geohash)
+        scopes = geo.neighbours(scope) if scope else [""]
+        keys = self.lsh.band_keys(signature)
+        with self._lock:
+            self._counts["lookups"] += 1
+            candidates = set()
+            for s in scopes:
+                for band, key in keys:
+                    candidates |= self._buckets.get((s, band, key), set())
+            if not candidates:
+                return None
+            candidates = list(candidates)
+            similarities = self.lsh.similarities(signature, np.stack([self._entries[c][0] for c in candidates]))
+            position = int(np.argmax(similarities))
+            best, best_id = float(similarities[position]), candidates[position]
+            if best < self.threshold:
+                return None
+            self._counts["hits"] += 1
+            cluster_id = self._entries[best_id][2]
+            return {
+                "clusterId": cluster_id,
+                "matchedId": best_id,
+                "similarity": round(best, 3),
+                "hfEngine": self._clusters[cluster_id]["hfEngine"],
+            }
+
+    def add(self, doc_id, text, geohash, hf_engine, cluster_id=None, added_at=None):
+        """Index a classified grievance; `cluster_id` is the cluster it joined (default: its own)."""
+        signature = self.lsh.signature(shingles(text))
+        if signature is None or not hf_engine:
+            return
+        scope = self._scope(geohash)
+        cluster_id = cluster_id or doc_id
+        with self._lock:
+            if doc_id in self._entries:
+                self._remove_locked(doc_id)
+            self._entries[doc_id] = (signature, scope, cluster_id, added_at or time.time())
+            for band, key in self.lsh.band_keys(signature):
+                self._buckets.setdefault((scope, band, key), set()).add(doc_id)
+            cluster = self._clusters.setdefault(cluster_id, {"hfEngine": hf_engine, "size": 0})
+            cluster["size"] += 1
+            self._counts["added"] += 1
+            self._evict_locked()
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def remove_cluster(self, cluster_id):
+        """Drop every grievance of a cluster (e.g. once its grievance is no longer open)."""
+        with self._lock:
+            for doc_id in [d for d, entry in self._entries.items() if entry[2] == cluster_id]:
+                self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            return
+        signature, scope, cluster_id, _ = entry
+        for band, key in self.lsh.band_keys(signature):
+            bucket = self._buckets.get((scope, band, key))
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[(scope, band, key)]
+        cluster = self._clusters.get(cluster_id)
+        if cluster is not None:
+            cluster["size"] -= 1
+            if cluster["size"] <= 0:
+                del self._clusters[cluster_id]
+
+    def _evict_locked(self):
+        cutoff = time.time() - self.max_age
+        while self._entries:
+            doc_id, (_, _, _, added_at) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and added_at >= cutoff:
+                break
+            self._remove_locked(doc_id)
+            self._counts["evicted"] += 1
+
+    def rebuild(self, db, page_size=500, since=None):
+        """Load open grievances created since `since` (default: the last max_age seconds). True on success."""
+        incremental = since is not None
+        if since is None:
+            since = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        query = (
+            db.collection("grievances")
+            .where("status", "==", "open")
+            .where("createdAt", ">=", since)
+            .select(["title", "description", "geohash", "hfEngine", "createdAt"])
+            .order_by("createdAt")
+            .order_by("__name__")
+        )
+        started = time.monotonic()
+        cursor = None
+        loaded = 0
+        try:
+            while True:
+                page_query = query.limit(page_size)
+                if cursor is not None:
+                    page_query = page_query.start_after(cursor)
+                page = list(page_query.stream())
+                for snap in page:
+                    data = snap.to_dict() or {}
+                    hf_engine = data.get("hfEngine")
+                    if not hf_engine:
+                        continue
+                    text = f"{data.get('title', '')}\n{data.get('description', '')}".strip()
+                    created_at = data.get("createdAt")
+                    self.add(snap.id, text, data.get("geohash"), hf_engine,
+                             cluster_id=hf_engine.get("duplicateOf"),
+                             added_at=created_at.timestamp() if hasattr(created_at, "timestamp") else None)
+                    loaded += 1
+                if len(page) < page_size:
+                    break
+                cursor = page[-1]
+        except Exception as err:
+            logger.error(f"❌ Duplicate index {'sync' if incremental else 'rebuild'} failed: {err}")
+            return False
+        if incremental:
+            logger.debug(f"Duplicate index synced: {loaded} recent grievances")
+            return True
+        self.ready = True
+        logger.info(f"✅ Duplicate index rebuilt: {len(self._entries)} grievances in "
+                    f"{time.monotonic() - started:.1f}s")
+        return True
+
+    def keep_synced(self, db, interval=30.0, overlap=300.0, stop_event=None):
+        """
+        Rebuild, then every `interval` seconds re-read grievances created in the last
+        interval + `overlap` seconds (run in a background thread in each worker).
+
+        This picks up grievances saved by other workers or processes. The overlap
+        covers documents classified some time after they were created; re-adding
+        an indexed document replaces its entry.
+        """
+        stop_event = stop_event or threading.Event()
+        while not self.rebuild(db):
+            if stop_event.wait(interval):
+                return
+        last_sync = datetime.now(timezone.utc)
+        while not stop_event.wait(interval):
+            now = datetime.now(timezone.utc)
+            if self.rebuild(db, since=last_sync - timedelta(seconds=overlap)):
+                last_sync = now
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "entries": len(self._entries),
+                "clusters": len(self._clusters),
+                "buckets": len(self._buckets),
+                **self._counts,
+            }
+
+
+def reuse_classification(match, text):
+    """
+    hfEngine for a near-duplicate: the cluster's classification with this text's keywords.
+
+    The rules stage and the initial decision run on the new text (the cluster's
+    sentiment stands in for the skipped HF call), so its own urgent matches can
+    raise the priority; a reused classification is never lowered.
+    """
+    hf_engine = copy.deepcopy(match["hfEngine"])
+    model_info = hf_engine.setdefault("modelInfo", {})
+    rule_hits = match_rules(text)
+    _, rule_priority = decide_initial(
+        {"category": hf_engine.get("category", "other")},
+        {"sentiment": model_info.get("sentimentLabel"), "sentimentScore": model_info.get("sentimentScore") or 0.0},
+        rule_hits["urgent"],
+        category_from_rule_hits(rule_hits),
+    )
+    priority = hf_engine.get("priority") if hf_engine.get("priority") in PRIORITY_LEVELS else "low"
+    if PRIORITY_LEVELS.index(rule_priority) < PRIORITY_LEVELS.index(priority):
+        priority = rule_priority
+    hf_engine["priority"] = priority
+    hf_engine["isUrgent"] = priority == "high"
+    hf_engine["urgentMatches"] = rule_hits["urgent"]
+    if "duplicateOf" not in hf_engine:
+        hf_engine["explanation"] = (
+            f"Near-duplicate of grievance {match['clusterId']} (similarity {match['similarity']:.2f}); "
+            f"its classification was reused. {hf_engine.get('explanation', '')}"
+        ).strip()
+    hf_engine["keywords"] = extract_keywords(text)
+    hf_engine["duplicateOf"] = match["clusterId"]
+    # No stage ran for this grievance; the source's timings would be misleading
+    model_info.pop("stageTimingsMs", None)
+    model_info["dedup"] = {
+        "clusterId": match["clusterId"],
+        "matchedId": match["matchedId"],
+        "similarity": match["similarity"],
+    }
+    return hf_engine
@@ -0,0 +1,147 @@
+# backend/geo.py
+"""
+Geohash helpers for location queries.
+
+Grievances with a location get a `geohash` field (GEOHASH_PRECISION characters)
+at write time. A geohash prefix is a rectangular cell, so "near here" becomes a
+few range queries on that field (the cell around the point and its neighbours)
+followed by an exact distance filter. `cell_ids`/`encode_many` are the NumPy
+versions used by tools/geo_hotspots.py; NumPy is only imported when they are called.
+"""
+import math
+from functools import lru_cache
+
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+# Approximate cell height in km per precision (width is the same or double, times cos(latitude))
+_CELL_HEIGHT_KM = {1: 5000, 2: 625, 3: 156, 4: 19.5, 5: 4.89, 6: 0.61, 7: 0.153, 8: 0.019, 9: 0.0048}
+_CELL_WIDTH_KM = {1: 5000, 2: 1250, 3: 156, 4: 39.1, 5: 4.89, 6: 1.22, 7: 0.153, 8: 0.038, 9: 0.0048}
+
+
+def valid_location(latitude, longitude):
+    return -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def decode_bounds(geohash):
+    """Return ((min_lat, max_lat), (min_lng, max_lng)) of a cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return tuple(lat_range), tuple(lng_range)
+
+
+@lru_cache(maxsize=4096)
+def neighbours(geohash):
+    """The cell itself and its (up to) 8 neighbours at the same precision (a tuple; results are cached)."""
+    (min_lat, max_lat), (min_lng, max_lng) = decode_bounds(geohash)
+    lat, lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    d_lat, d_lng = max_lat - min_lat, max_lng - min_lng
+    cells = []
+    for dy in (-1, 0, 1):
+        n_lat = lat + dy * d_lat
+        if not -90.0 <= n_lat <= 90.0:
+            continue
+        for dx in (-1, 0, 1):
+            n_lng = (lng + dx * d_lng + 180.0) % 360.0 - 180.0
+            cell = encode(n_lat, n_lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return tuple(cells)
+
+
+def precision_for_radius(radius_km, latitude=0.0):
+    """Finest precision whose cells are at least `radius_km` across, so cell + neighbours cover the circle."""
+    shrink = max(math.cos(math.radians(latitude)), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if min(_CELL_HEIGHT_KM[precision], _CELL_WIDTH_KM[precision] * shrink) >= radius_km:
+            return precision
+    return 1
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def prefix_range(prefix):
+    """Firestore range (>=, <) that matches every geohash starting with `prefix`."""
+    return prefix, prefix + "~"
+
+
+def _spread_bits(x):
+    """Insert a zero bit between each of the low 32 bits of a uint64 array (Morton encoding)."""
+    import numpy as np
+
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        x = (x | (x << np.uint64(shift))) & np.uint64(mask)
+    return x
+
+
+def cell_ids(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """Vectorized geohash over NumPy arrays, as integer cell IDs (the 5 * precision interleaved bits)."""
+    import numpy as np
+
+    bits = 5 * precision
+    lng_bits, lat_bits = (bits + 1) // 2, bits // 2
+
+    def quantize(values, low, span, n_bits):
+        scaled = np.floor((np.asarray(values, dtype=np.float64) - low) / span * (1 << n_bits))
+        return np.clip(scaled, 0, (1 << n_bits) - 1).astype(np.uint64)
+
+    lng = _spread_bits(quantize(longitudes, -180.0, 360.0, lng_bits))
+    lat = _spread_bits(quantize(latitudes, -90.0, 180.0, lat_bits))
+    # Geohash bits alternate longitude, latitude starting from the most significant bit
+    if bits % 2:
+        return lng | (lat << np.uint64(1))
+    return (lng << np.uint64(1)) | lat
+
+
+def cell_id_to_geohash(cell_id, precision=GEOHASH_PRECISION):
+    cell_id = int(cell_id)
+    return "".join(_BASE32[(cell_id >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def encode_many(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """Vectorized `encode`; returns an array of geohash strings."""
+    import numpy as np
+
+    ids = cell_ids(latitudes, longitudes, precision)
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    groups = ((ids[..., None] >> shifts) & np.uint64(31)).astype(np.uint8)
+    chars = np.frombuffer(_BASE32.encode(), dtype="S1")[groups]
+    return np.char.decode(np.ascontiguousarray(chars).view(f"S{precision}")[..., 0], "ascii")
@@ -0,0 +1,215 @@
+# backend/grievance_stats.py
+"""
+Aggregate grievance counters behind the /stats endpoint.
+
+Counts by status, category, priority, day and keyword are maintained with
+firestore.Increment as grievances are written, so the admin dashboard does not
+have to download the whole collection. Deltas go to one of a few shard
+documents under stats/grievances/shards (a single counter document only takes
+about one write per second); reads sum the shards. Keywords are open-ended, so
+each one gets its own counter document under stats/grievances/keywords instead
+of a field in the shards, which would grow without bound; /stats reads the top
+ones with an ordered query. tools/rebuild_stats.py recomputes everything from
+the grievances collection.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from firebase_admin import firestore
+
+logger = logging.getLogger(__name__)
+
+STATS_SHARDS_PATH = "stats/grievances/shards"
+STATS_KEYWORDS_PATH = "stats/grievances/keywords"
+# Largest topKeywords /stats serves; read() fetches this many and summary() slices
+MAX_TOP_KEYWORDS = 100
+FIRESTORE_BATCH_LIMIT = 500
+
+
+# --- Deltas (plain nested dicts of ints, so they can be merged before writing) ---
+def day_bucket(created_at=None):
+    if not isinstance(created_at, datetime):
+        created_at = datetime.now(timezone.utc)
+    return created_at.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+def submission_deltas(status="open", created_at=None):
+    """A new, not yet classified grievance."""
+    return {"total": 1, "unclassified": 1, "byStatus": {status: 1}, "byDay": {day_bucket(created_at): 1}}
+
+
+def classification_deltas(hf_engine, previous=None):
+    """hfEngine written for a grievance; `previous` is the hfEngine it replaces, if any."""
+    deltas = {}
+    if previous:
+        add_deltas(deltas, _classification_counts(previous), sign=-1)
+    else:
+        deltas["unclassified"] = -1
+    add_deltas(deltas, _classification_counts(hf_engine))
+    return deltas
+
+
+def status_deltas(old_status, new_status):
+    return {"byStatus": {old_status: -1, new_status: 1}}
+
+
+def _classification_counts(hf_engine):
+    return {
+        "byCategory": {hf_engine.get("category") or "other": 1},
+        "byPriority": {hf_engine.get("priority") or "low": 1},
+        "byKeyword": {keyword: 1 for keyword in hf_engine.get("keywords") or []},
+    }
+
+
+def add_deltas(target, source, sign=1):
+    """Add `source` into `target` in place (nested dicts of ints)."""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            add_deltas(target.setdefault(key, {}), value, sign)
+        else:
+            target[key] = target.get(key, 0) + sign * value
+    return target
+
+
+def merge_deltas(*parts):
+    merged = {}
+    for part in parts:
+        add_deltas(merged, part)
+    return merged
+
+
+def _to_increments(deltas):
+    increments = {}
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            nested = _to_increments(value)
+            if nested:
+                increments[key] = nested
+        elif value:
+            increments[key] = firestore.Increment(value)
+    return increments
+
+
+# --- Counters ---
+class GrievanceStats:
+    """Sharded aggregate counters; `summary()` results are cached for `cache_ttl` seconds."""
+
+    def __init__(self, db, shards=10, cache_ttl=10.0):
+        self.db = db
+        self.shards = shards
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self._keyword_executor = None
+
+    def _shard(self, index=None):
+        return self.db.document(f"{STATS_SHARDS_PATH}/{random.randrange(self.shards) if index is None else index}")
+
+    def apply(self, deltas, batch=None):
+        """Add deltas (except keywords) to a random shard, as part of `batch` when given (no extra round trip)."""
+        increments = _to_increments({k: v for k, v in deltas.items() if k != "byKeyword"})
+        if not increments:
+            return
+        if batch is not None:
+            batch.set(self._shard(), increments, merge=True)
+        else:
+            self._shard().set(increments, merge=True)
+
+    def apply_keywords(self, deltas):
+        """
+        Add the keyword deltas to their counter documents in the background.
+
+        Call after the grievance write committed. These writes are best effort:
+        a failure is logged and left for tools/rebuild_stats.py, never raised.
+        """
+        keywords = {k: v for k, v in (deltas.get("byKeyword") or {}).items() if v}
+        if not keywords:
+            return
+        with self._lock:
+            if self._keyword_executor is None:
+                # One thread: keeps concurrent increments off the same hot keyword documents
+                self._keyword_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stats-keywords")
+        self._keyword_executor.submit(self._write_keywords, keywords)
+
+    def _write_keywords(self, keywords):
+        try:
+            items = sorted(keywords.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                batch = self.db.batch()
+                for keyword, count in items[start:start + FIRESTORE_BATCH_LIMIT]:
+                    batch.set(
+                        self.db.document(f"{STATS_KEYWORDS_PATH}/{keyword}"),
+                        {"keyword": keyword, "count": firestore.Increment(count)},
+                        merge=True,
+                    )
+                batch.commit()
+        except Exception as err:
+            logger.warning(f"⚠️ Keyword counters not updated ({len(keywords)} keywords): {err}")
+
+    def read(self):
+        """Sum all shards into one nested dict of counts, plus the MAX_TOP_KEYWORDS largest keyword counts."""
+        with self._lock:
+            if self._cached is not None and time.monotonic() - self._cached_at < self.cache_ttl:
+                return self._cached
+        totals = {}
+        for snap in self.db.collection(STATS_SHARDS_PATH).stream():
+            add_deltas(totals, {k: v for k, v in (snap.to_dict() or {}).items() if k != "byKeyword"})
+        query = self.db.collection(STATS_KEYWORDS_PATH).order_by("count", direction=firestore.Query.DESCENDING)
+        totals["topKeywords"] = [
+            {"keyword": snap.id, "count": (snap.to_dict() or {}).get("count", 0)}
+            for snap in query.limit(MAX_TOP_KEYWORDS).stream()
+        ]
+        with self._lock:
+            self._cached, self._cached_at = totals, time.monotonic()
+        return totals
+
+    def summary(self, days=30, top_keywords=20):
+        totals = self.read()
+
+        def positive(counts):
+            return {k: v for k, v in (counts or {}).items() if v > 0}
+
+        keywords = [item for item in totals["topKeywords"] if item["count"] > 0]
+        return {
+            "total": totals.get("total", 0),
+            "unclassified": max(0, totals.get("unclassified", 0)),
+            "byStatus": positive(totals.get("byStatus")),
+            "byCategory": positive(totals.get("byCategory")),
+            "byPriority": positive(totals.get("byPriority")),
+            "byDay": dict(sorted(positive(totals.get("byDay")).items())[-days:]),
+            "topKeywords": keywords[:top_keywords],
+        }
+
+    def reset(self, totals):
+        """Replace all counters with `totals` (used by tools/rebuild_stats.py)."""
+        batch = self.db.batch()
+        for snap in self.db.collection(STATS_SHARDS_PATH).stream():
+            batch.delete(snap.reference)
+        batch.set(self._shard(0), {k: v for k, v in totals.items() if k != "byKeyword"})
+        batch.commit()
+
+        # Keyword counter documents can outnumber one batch, so they are replaced in chunks
+        keywords = {k: v for k, v in (totals.get("byKeyword") or {}).items() if v > 0}
+        writes = [
+            ("delete", snap.reference, None)
+            for snap in self.db.collection(STATS_KEYWORDS_PATH).stream() if snap.id not in keywords
+        ] + [
+            ("set", self.db.document(f"{STATS_KEYWORDS_PATH}/{keyword}"), {"keyword": keyword, "count": count})
+            for keyword, count in sorted(keywords.items())
+        ]
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for op, ref, data in writes[start:start + FIRESTORE_BATCH_LIMIT]:
+                if op == "delete":
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data)
+            batch.commit()
+        with self._lock:
+            self._cached = None
+        logger.info(f"✅ Stats reset ({totals.get('total', 0)} grievances)")
@@ -0,0 +1,116 @@
+# backend/gunicorn.conf.py
+"""
+Production server config: `cd backend && gunicorn server:app` (picked up automatically).
+
+The handlers are I/O-bound (HF, Groq, Firestore), so workers run several
+requests each: GUNICORN_WORKER_CLASS=gthread (default) uses GUNICORN_THREADS
+threads per worker, gevent uses up to GUNICORN_WORKER_CONNECTIONS greenlets.
+Clients are warmed and background threads started in every worker after the
+fork (threads and gRPC channels do not survive fork), and on shutdown each
+worker drains its queued classifications before exiting.
+
+The master SIGKILLs workers graceful_timeout after telling them to stop, and
+that one budget covers both finishing in-flight requests and the drain: each
+worker notes when it was signalled, and `worker_exit` drains only for what is
+left of graceful_timeout (minus DRAIN_MARGIN).
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+# Tells server.py to leave start-up work to the worker hooks below
+os.environ["GUNICORN_MANAGED"] = "1"
+
+logger = logging.getLogger("gunicorn.error")
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", min(multiprocessing.cpu_count() + 1, 4)))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+# Preloading imports the app once in the master, so workers share its memory (keyword rules,
+# models with INFERENCE_BACKEND=local). gevent must patch the stdlib before the app is imported.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+if preload_app and worker_class == "gevent":
+    logger.warning("GUNICORN_PRELOAD is ignored with the gevent worker class")
+    preload_app = False
+
+# Seconds of graceful_timeout kept back so the queue drain ends before the master's SIGKILL
+DRAIN_MARGIN = float(os.getenv("GUNICORN_DRAIN_MARGIN", 2))
+# Monotonic time this worker was told to stop (SIGTERM, SIGINT or SIGQUIT)
+_stop_requested_at = None
+
+
+def _mark_stop_requested():
+    global _stop_requested_at
+    if _stop_requested_at is None:
+        _stop_requested_at = time.monotonic()
+
+
+def on_starting(server):
+    # Multiprocess metrics (see backend/metrics.py): drop the previous run's per-worker files
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.remove(os.path.join(directory, name))
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        # Firestore talks gRPC, which needs its gevent integration to not block the event loop
+        from grpc.experimental import gevent as grpc_gevent
+
+        grpc_gevent.init_gevent()
+
+
+def post_worker_init(worker):
+    import server as app_module
+
+    app_module.start_background_work()
+
+    # gunicorn has no hook for SIGTERM (graceful stop), so note the time in front of its handler
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_term(signum, frame):
+        _mark_stop_requested()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+    logger.info(f"Worker {worker.pid} ready ({worker_class})")
+
+
+def worker_int(worker):
+    # SIGINT/SIGQUIT: quick shutdown; the master's SIGKILL follows on the same clock
+    _mark_stop_requested()
+
+
+def worker_exit(server, worker):
+    app_module = sys.modules.get("server")
+    if app_module is not None:
+        # Without a signal (max_requests restart) the worker leaves on its own and gets the full budget
+        started = _stop_requested_at if _stop_requested_at is not None else time.monotonic()
+        remaining = max(0.0, started + graceful_timeout - DRAIN_MARGIN - time.monotonic())
+        app_module.stop_background_work(timeout=remaining)
+
+
+def child_exit(server, worker):
+    # Runs in the master: drop the dead worker's live gauge files from PROMETHEUS_MULTIPROC_DIR
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
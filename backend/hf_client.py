@@ -0,0 +1,166 @@
+# backend/hf_client.py
+"""Shared, connection-pooled HTTP client for the Hugging Face Inference API."""
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limit
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the per-model latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+RETRY_STATUSES = (429, 503)
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline ran out before a request could be sent; says nothing about HF's health."""
+
+
+class HFClient:
+    """
+    Keep-alive `requests.Session` shared by every HF model call.
+
+    Retries 429/503 responses (including "model is loading") and connection
+    errors with jittered exponential backoff, honouring `Retry-After` and HF's
+    `estimated_time` hint up to `backoff_max` seconds.
+    """
+
+    def __init__(self, base_url, token, pool_size=10, connect_timeout=3.05, read_timeout=30.0,
+                 max_retries=3, backoff=0.5, backoff_max=8.0):
+        self.base_url = base_url
+        self.token = token
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._session = None
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._retries = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=False)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update({
+                        "Authorization": f"Bearer {self.token}",
+                        "Content-Type": "application/json",
+                    })
+                    self._session = session
+        return self._session
+
+    def post(self, model_name, payload, timeout=None, deadline=None):
+        """
+        POST `payload` to a model endpoint, retrying transient failures. Returns the final Response.
+
+        `deadline` (time.monotonic()) caps each attempt's read timeout to the remaining
+        budget and skips retries that would start after it; DeadlineExceeded is raised
+        if it has already passed.
+        """
+        url = f"{self.base_url}/models/{model_name}"
+        attempt = 0
+        while True:
+            request_timeout = timeout or self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"No time left for HF {model_name}")
+                request_timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            rate_limit.acquire("hf")
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=request_timeout)
+            except requests.exceptions.ConnectionError:
+                self._observe(model_name, start)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+            else:
+                self._observe(model_name, start)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_delay(response, attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    return response
+            attempt += 1
+            with self._lock:
+                self._retries += 1
+            logger.warning(f"⚠️ HF {model_name} retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _backoff_delay(self, attempt):
+        # "Full jitter": uniform over [0, capped exponential]
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    def _retry_delay(self, response, attempt):
+        hint = response.headers.get("Retry-After")
+        if hint is None and response.status_code == 503:
+            try:
+                hint = response.json().get("estimated_time")
+            except (ValueError, AttributeError):
+                hint = None
+        try:
+            hinted = float(hint)
+        except (TypeError, ValueError):
+            return self._backoff_delay(attempt)
+        return min(self.backoff_max, hinted) + random.uniform(0, self.backoff)
+
+    def _observe(self, model_name, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            hist = self._latency.setdefault(
+                model_name, {"buckets": [0] * len(LATENCY_BUCKETS_MS), "count": 0, "sumMs": 0.0}
+            )
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    hist["buckets"][i] += 1
+                    break
+            hist["count"] += 1
+            hist["sumMs"] += elapsed_ms
+
+    def pool_stats(self):
+        """Connection reuse per host pool: a request that did not open a new connection is a hit."""
+        if self._session is None:
+            return {}
+        stats = {}
+        adapter = self._session.get_adapter(self.base_url)
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            requests_made = pool.num_requests
+            connections = pool.num_connections
+            stats[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "requests": requests_made,
+                "newConnections": connections,
+                "hitRate": round(1 - connections / requests_made, 3) if requests_made else None,
+                "maxSize": self.pool_size,
+            }
+        return stats
+
+    def stats(self):
+        with self._lock:
+            latency = {
+                model: {
+                    "count": hist["count"],
+                    "meanMs": round(hist["sumMs"] / hist["count"], 1) if hist["count"] else None,
+                    "bucketsMs": {
+                        ("+Inf" if bound == float("inf") else str(bound)): n
+                        for bound, n in zip(LATENCY_BUCKETS_MS, hist["buckets"])
+                    },
+                }
+                for model, hist in self._latency.items()
+            }
+            retries = self._retries
+        return {"pool": self.pool_stats(), "retries": retries, "latency": latency}
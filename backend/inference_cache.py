@@ -0,0 +1,128 @@
+# backend/inference_cache.py
+"""Content-addressed cache for model inference results (in-process LRU + optional SQLite tier)."""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Lower-case and collapse whitespace so trivially different duplicates share a key."""
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+
+def config_fingerprint(*parts):
+    """Stable short hash of the model configuration a cached result depends on."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class InferenceCache:
+    """
+    Two-tier cache for JSON-serialisable inference results.
+
+    Each namespace (e.g. "category") is bound to a configuration fingerprint that is
+    part of every key, so changing a model name or label set makes old entries
+    unreachable. Rows on disk from an outdated fingerprint are purged on startup.
+    """
+
+    def __init__(self, fingerprints, max_entries=2048, ttl=7 * 24 * 3600, disk_path=None):
+        self.fingerprints = dict(fingerprints)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memoryHits": 0, "diskHits": 0, "misses": 0, "writes": 0}
+        self._db = None
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS inference_cache ("
+                "key TEXT PRIMARY KEY, namespace TEXT, fingerprint TEXT, value TEXT, expires_at REAL)"
+            )
+            self._db.execute("DELETE FROM inference_cache WHERE expires_at < ?", (time.time(),))
+            for namespace, fingerprint in self.fingerprints.items():
+                cur = self._db.execute(
+                    "DELETE FROM inference_cache WHERE namespace = ? AND fingerprint != ?",
+                    (namespace, fingerprint),
+                )
+                if cur.rowcount:
+                    logger.info(f"🧹 Invalidated {cur.rowcount} cached '{namespace}' results (config changed)")
+            self._db.commit()
+        except sqlite3.Error as err:
+            logger.error(f"⚠️ Inference cache disk tier disabled: {err}")
+            self._db = None
+
+    def key(self, namespace, text, extra=""):
+        raw = "\x1f".join([namespace, self.fingerprints[namespace], normalize_text(text), extra])
+        return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        """Return a fresh copy of the cached value, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry[1] >= now:
+                self._lru.move_to_end(key)
+                self._counters["memoryHits"] += 1
+                return json.loads(entry[0])
+            if entry is not None:
+                del self._lru[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM inference_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] >= now:
+                    self._remember(key, row[0], row[1])
+                    self._counters["diskHits"] += 1
+                    return json.loads(row[0])
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        blob = json.dumps(value)
+        expires_at = time.time() + self.ttl
+        namespace = key.split(":", 1)[0]
+        with self._lock:
+            self._remember(key, blob, expires_at)
+            self._counters["writes"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO inference_cache VALUES (?, ?, ?, ?, ?)",
+                        (key, namespace, self.fingerprints[namespace], blob, expires_at),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as err:
+                    logger.error(f"⚠️ Inference cache write failed: {err}")
+
+    def _remember(self, key, blob, expires_at):
+        self._lru[key] = (blob, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["memoryHits"] + self._counters["diskHits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hitRate": round(hits / lookups, 3) if lookups else None,
+                "memoryEntries": len(self._lru),
+                "diskEnabled": self._db is not None,
+            }
@@ -0,0 +1,162 @@
+# backend/keyword_rules.py
+"""
+Precompiled keyword matcher for the urgency and per-category rule tables.
+
+All tables are compiled into one trie-shaped regex with word boundaries, so a
+single pass over the text finds every position where a keyword starts ("fire"
+no longer matches "firewall"). The regex only reports the longest keyword at
+each position, so every keyword starting there is then collected by walking
+the trie: "no water supply" still yields urgent "no water", and both "pipe"
+and "pipe burst" count.
+Tables can be overridden from a JSON file that is re-read when it changes:
+
+    {
+      "urgent": ["urgent", "emergency", ...],
+      "categories": {"sanitation": ["garbage", ...], "water": ["pipeline leak", ...]}
+    }
+
+Keys missing from the file fall back to the built-in defaults.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def normalize(text):
+    return _WS.sub(" ", (text or "").lower()).strip()
+
+
+def _build_trie(words):
+    """Nested dicts keyed by character; "" marks the end of a keyword."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    return trie
+
+
+def _trie_pattern(trie):
+    """Build a regex alternation shaped like a prefix trie (fast for large keyword sets)."""
+
+    def emit(node):
+        terminal = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy optional: prefer the longer keyword, backtrack to the shorter one
+            return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """One compiled pattern over the urgent table and every category table."""
+
+    def __init__(self, urgent, categories):
+        self.urgent = [normalize(k) for k in urgent]
+        self.categories = {cat: [normalize(k) for k in kws] for cat, kws in categories.items()}
+        self._tags = {}
+        for k in self.urgent:
+            self._tags.setdefault(k, []).append(("urgent", None))
+        for cat, kws in self.categories.items():
+            for k in kws:
+                self._tags.setdefault(k, []).append(("category", cat))
+        self._order = {k: i for i, k in enumerate(self.urgent)}
+        words = [k for k in self._tags if k]
+        self._trie = _build_trie(words)
+        # Zero-width lookahead: finds every start position, including ones inside an earlier hit
+        self._pattern = re.compile(
+            r"(?<![a-z0-9])(?=" + _trie_pattern(self._trie) + r"(?![a-z0-9]))"
+        ) if words else None
+
+    def _keywords_at(self, text, start):
+        """Every keyword that starts at `start` and ends on a word boundary, shortest first."""
+        node, i = self._trie, start
+        while i < len(text) and text[i] in node:
+            node = node[text[i]]
+            i += 1
+            if "" in node and (i == len(text) or text[i] not in _WORD_CHARS):
+                yield text[start:i]
+
+    def match(self, text):
+        """Return {"urgent": [...in table order], "categories": {category: [keywords...]}}."""
+        hits = {"urgent": [], "categories": {}}
+        if self._pattern is None:
+            return hits
+        text = normalize(text)
+        seen = set()
+        keywords = (k for m in self._pattern.finditer(text) for k in self._keywords_at(text, m.start()))
+        for keyword in keywords:
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            for kind, cat in self._tags[keyword]:
+                if kind == "urgent":
+                    hits["urgent"].append(keyword)
+                else:
+                    hits["categories"].setdefault(cat, []).append(keyword)
+        hits["urgent"].sort(key=self._order.__getitem__)
+        return hits
+
+    def tables(self):
+        return {"urgent": list(self.urgent), "categories": {c: list(k) for c, k in self.categories.items()}}
+
+
+class KeywordRules:
+    """Holds the active KeywordMatcher and hot-reloads it when the rules file changes."""
+
+    def __init__(self, default_urgent, default_categories, path=None, reload_interval=5.0):
+        self.default_urgent = list(default_urgent)
+        self.default_categories = {c: list(k) for c, k in default_categories.items()}
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._matcher = KeywordMatcher(self.default_urgent, self.default_categories)
+        self._maybe_reload(force=True)
+
+    @property
+    def matcher(self):
+        self._maybe_reload()
+        return self._matcher
+
+    def _maybe_reload(self, force=False):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    config = json.load(f)
+                categories = dict(self.default_categories)
+                categories.update(config.get("categories", {}))
+                self._matcher = KeywordMatcher(config.get("urgent", self.default_urgent), categories)
+                self._mtime = mtime
+                logger.info(f"✅ Loaded keyword rules from {self.path}")
+            except (OSError, ValueError, AttributeError, TypeError) as err:
+                # Keep serving the previous tables; retry once the file changes again
+                self._mtime = mtime
+                logger.error(f"⚠️ Invalid keyword rules file {self.path}: {err}")
@@ -0,0 +1,118 @@
+# backend/local_inference.py
+"""
+In-process CPU inference for the category and priority models.
+
+Alternative to the HF Inference API, selected with INFERENCE_BACKEND=local.
+Models run through ONNX Runtime (default) or PyTorch with dynamic int8
+quantization, and requests that arrive within a short window are batched.
+Outputs mirror the HF Inference API JSON so the existing parsers in
+classify_category/classify_priority work unchanged.
+
+Optional dependencies: `transformers` plus either `optimum[onnxruntime]` or `torch`.
+"""
+import json
+import logging
+import os
+
+from batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class LocalInferenceUnavailable(RuntimeError):
+    """Raised when the optional local inference dependencies are missing."""
+
+
+def _load_model(model_name, runtime, quantize, cache_dir):
+    if runtime == "onnx":
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+
+        if not quantize:
+            return ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        quantized_dir = os.path.join(cache_dir, model_name.replace("/", "__") + "-int8")
+        if not os.path.isdir(quantized_dir):
+            exported = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(exported)
+            quantizer.quantize(
+                save_dir=quantized_dir,
+                quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+            )
+        return ORTModelForSequenceClassification.from_pretrained(quantized_dir, file_name="model_quantized.onnx")
+
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class LocalInferenceEngine:
+    """Loads the zero-shot and sentiment models once and serves them through micro-batchers."""
+
+    def __init__(self, category_model, priority_model, runtime="onnx", quantize=True,
+                 max_batch_size=16, max_wait=0.01, cache_dir=None):
+        self.category_model = category_model
+        self.priority_model = priority_model
+        self.runtime = runtime
+        self.quantize = quantize
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(__file__), ".cache", "models")
+        self._pipelines = {}
+        self._batchers = {}
+
+    def load(self):
+        """Load both models (blocking). Call once at startup."""
+        try:
+            # Imported here so that importing this module stays cheap
+            from transformers import AutoTokenizer, pipeline
+        except ImportError:
+            raise LocalInferenceUnavailable("transformers is not installed")
+        for model_name, task, kwargs in (
+            (self.category_model, "zero-shot-classification", {}),
+            (self.priority_model, "text-classification", {"top_k": None}),
+        ):
+            logger.info(f"⏳ Loading local model {model_name} ({self.runtime}, int8={self.quantize})")
+            model = _load_model(model_name, self.runtime, self.quantize, self.cache_dir)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self._pipelines[model_name] = pipeline(task, model=model, tokenizer=tokenizer, **kwargs)
+            self._batchers[model_name] = MicroBatcher(
+                lambda items, name=model_name: self._run_batch(name, items),
+                max_batch_size=self.max_batch_size,
+                max_wait=self.max_wait,
+                name=f"local-{task}",
+            )
+        logger.info("✅ Local inference engine ready")
+
+    def infer(self, model_name, text, task_params=None):
+        """Classify one text; returns the same JSON shape as the HF Inference API."""
+        batcher = self._batchers.get(model_name)
+        if batcher is None:
+            raise KeyError(f"model not loaded locally: {model_name}")
+        return batcher.submit((text, json.dumps(task_params or {}, sort_keys=True)))
+
+    def _run_batch(self, model_name, items):
+        # Zero-shot calls only batch together when they share candidate labels.
+        groups = {}
+        for i, (text, params) in enumerate(items):
+            groups.setdefault(params, []).append(i)
+
+        results = [None] * len(items)
+        pipe = self._pipelines[model_name]
+        for params, indices in groups.items():
+            texts = [items[i][0] for i in indices]
+            outputs = pipe(texts, batch_size=len(texts), **json.loads(params))
+            for i, out in zip(indices, outputs):
+                # HF API: zero-shot -> {"labels", "scores"}; text-classification -> [[{label, score}, ...]]
+                results[i] = out if isinstance(out, dict) else [out]
+        return results
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self._batchers.items()}
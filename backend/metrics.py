@@ -0,0 +1,93 @@
+# backend/metrics.py
+"""
+Prometheus metrics for the classification and submit paths (served at /metrics).
+
+Stage durations (rules, each HF call, Groq, Firestore writes) go into one
+histogram labelled by stage; counters track provider errors, items that fell
+back to defaults/rules because a model call failed, and whether Groq refined
+an item. prometheus_client is optional: without it every call here is a no-op
+and `render()` returns None. With several gunicorn workers, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory so /metrics covers all of them.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+        start_http_server,
+    )
+except ImportError:
+    CONTENT_TYPE_LATEST = CollectorRegistry = Counter = Histogram = None
+    generate_latest = multiprocess = start_http_server = None
+
+ENABLED = Histogram is not None
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+if ENABLED:
+    STAGE_SECONDS = Histogram(
+        "grievance_stage_seconds", "Duration of one processing stage", ["stage"], buckets=STAGE_BUCKETS,
+    )
+    STAGE_ERRORS = Counter("grievance_stage_errors_total", "Failed provider or Firestore calls", ["stage"])
+    FALLBACKS = Counter(
+        "grievance_fallbacks_total", "Items that used default/rule results because a model call failed", ["model"],
+    )
+    GROQ_OUTCOMES = Counter("grievance_groq_total", "Groq refinement per classified item", ["outcome"])
+
+
+def observe_stage(stage, seconds):
+    """GrievancePipeline timing hook: `hook(stage, seconds)`."""
+    if ENABLED:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def count_error(stage):
+    if ENABLED:
+        STAGE_ERRORS.labels(stage).inc()
+
+
+def count_fallback(model):
+    if ENABLED:
+        FALLBACKS.labels(model).inc()
+
+
+def count_groq(outcome):
+    """outcome: refined, skipped (gated off) or failed (rule-path result kept)."""
+    if ENABLED:
+        GROQ_OUTCOMES.labels(outcome).inc()
+
+
+@contextmanager
+def timed(stage, timings=None):
+    """Time a block as `stage`; errors are counted and re-raised. Also stores milliseconds in `timings`."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        count_error(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        observe_stage(stage, elapsed)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 1)
+
+
+def render():
+    """(body, content type) in the Prometheus text format, or None without prometheus_client."""
+    if not ENABLED:
+        return None
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def serve(port):
+    """Expose the metrics on http://0.0.0.0:<port>/ from a daemon thread (for CLI tools). False if unavailable."""
+    if not ENABLED:
+        return False
+    start_http_server(port)
+    return True
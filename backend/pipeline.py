@@ -0,0 +1,1075 @@
+# backend/pipeline.py
+"""
+Grievance classification pipeline shared by the API server and tools/recategorize.py.
+
+Import-light on purpose: no Flask or Firebase, and the Groq client and local
+inference engine are created on first use, so the CLI starts quickly.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+
+import requests
+from dotenv import load_dotenv
+
+from batching import AdaptiveMicroBatcher
+from hf_client import DeadlineExceeded, HFClient
+from inference_cache import InferenceCache, config_fingerprint
+from local_inference import LocalInferenceEngine
+from keyword_rules import KeywordRules
+import rate_limit
+import metrics
+import circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+# --- 1. Config ---
+# Hugging Face Config
+HF_API_TOKEN = os.getenv("HF_API_TOKEN") or os.getenv("HUGGINGFACE_API_TOKEN")
+HF_BASE_URL = os.getenv("HF_BASE_URL", "https://router.huggingface.co/hf-inference")
+# Shared keep-alive session for classify_category and classify_priority
+hf_client = HFClient(
+    HF_BASE_URL,
+    HF_API_TOKEN,
+    pool_size=int(os.getenv("HF_POOL_SIZE", 10)),
+    connect_timeout=float(os.getenv("HF_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.getenv("HF_READ_TIMEOUT", 30)),
+    max_retries=int(os.getenv("HF_MAX_RETRIES", 3)),
+    backoff=float(os.getenv("HF_RETRY_BACKOFF", 0.5)),
+    backoff_max=float(os.getenv("HF_RETRY_BACKOFF_MAX", 8)),
+)
+
+# Micro-batching of remote HF calls: concurrent classify_category/classify_priority calls for the
+# same model are sent as one request with a list of `inputs`. The batch size adapts (AIMD) between
+# HF_BATCH_MIN_SIZE and HF_BATCH_MAX_SIZE to keep each request under HF_BATCH_TARGET_MS.
+# Callers are bounded by INFERENCE_WORKERS, so that also caps how many items can share a batch.
+HF_MICRO_BATCH = os.getenv("HF_MICRO_BATCH", "false").lower() == "true"
+HF_BATCH_MIN_SIZE = int(os.getenv("HF_BATCH_MIN_SIZE", 1))
+HF_BATCH_MAX_SIZE = int(os.getenv("HF_BATCH_MAX_SIZE", 32))
+HF_BATCH_WAIT_MS = float(os.getenv("HF_BATCH_WAIT_MS", 10))
+HF_BATCH_TARGET_MS = float(os.getenv("HF_BATCH_TARGET_MS", 1000))
+HF_BATCH_CONCURRENCY = int(os.getenv("HF_BATCH_CONCURRENCY", 4))
+# Items a batch could not answer (4xx on list inputs, wrong result count or shape) are re-sent one
+# per request, this many at a time; models that rejected list inputs skip the batched request after that
+HF_BATCH_FALLBACK_CONCURRENCY = int(os.getenv("HF_BATCH_FALLBACK_CONCURRENCY", 8))
+_hf_batchers = {}
+_hf_batchers_lock = threading.Lock()
+_hf_list_inputs_rejected = set()
+_hf_batch_fallbacks = Counter()
+
+# Groq Config (client created lazily by get_groq_client)
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # None = api.groq.com; e.g. tools/fake_providers.py for benchmarks
+GROQ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct" 
+_groq_client = None
+_groq_client_lock = threading.Lock()
+
+# Concurrent inference config (seconds; each stage timeout is measured from the start of the stage)
+# The stage executor only runs model calls: a classification has at most two in flight (the HF
+# category and priority calls), so the default covers every gunicorn request thread at once.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2 * int(os.getenv("GUNICORN_THREADS", 8))))
+HF_STAGE_TIMEOUT = float(os.getenv("HF_STAGE_TIMEOUT", 20))
+GROQ_STAGE_TIMEOUT = float(os.getenv("GROQ_STAGE_TIMEOUT", 20))
+# Budget for one whole classification; each stage gets what is left of it (and at most its own timeout)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", 25))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+
+# --- 2. Constants (Mirroring server.js) ---
+CATEGORY_MODEL = "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"
+PRIORITY_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+# Stage names (metrics labels and modelInfo.stageTimingsMs keys) of the two HF calls
+HF_STAGE_NAMES = {CATEGORY_MODEL: "hfCategory", PRIORITY_MODEL: "hfPriority"}
+
+CATEGORY_LABELS = [
+    "Issues related to water supply, water pressure, contamination, or no water",
+    "Issues related to roads, potholes, footpaths, traffic, or road damage",
+    "Issues related to electricity, power cuts, voltage fluctuations, or streetlights not working",
+    "Issues related to sanitation, garbage, sewage, drainage, or public cleanliness",
+    "Issues related to health services, hospitals, clinics, medicines, or public health",
+    "Issues related to governance, staff behavior, corruption, permissions, or government service delays",
+    "Other issues not matching the above categories",
+]
+
+CATEGORY_KEYS = [
+    "water", "roads", "electricity", "sanitation", "health", "governance", "other",
+]
+
+PRIORITY_LEVELS = ["high", "medium", "low"]
+
+URGENT_KEYWORDS = [
+    "urgent", "emergency", "immediately", "asap", "accident", "fire", "flood",
+    "electrocution", "collapsed", "burst", "serious", "critical",
+    "life threatening", "danger", "injury", "major issue", "no water",
+    "no electricity",
+]
+
+# Sentiment thresholds used to derive the initial priority
+NEGATIVE_HIGH_THRESHOLD = 0.7
+NEGATIVE_MEDIUM_THRESHOLD = 0.35
+NEUTRAL_MEDIUM_THRESHOLD = 0.6
+
+DEFAULT_CATEGORY_RESULT = {
+    "rawLabel": "Other issues not matching the above categories", "category": "other", "confidence": 0.0,
+}
+DEFAULT_PRIORITY_RESULT = {"sentiment": "neutral", "sentimentScore": 0.0}
+
+# Inference result cache. Keys include a fingerprint of the model config, so changing
+# CATEGORY_MODEL, CATEGORY_LABELS, PRIORITY_MODEL or GROQ_MODEL invalidates old entries.
+inference_cache = InferenceCache(
+    fingerprints={
+        "category": config_fingerprint(CATEGORY_MODEL, CATEGORY_LABELS),
+        "priority": config_fingerprint(PRIORITY_MODEL),
+        "groq": config_fingerprint(GROQ_MODEL, CATEGORY_KEYS),
+    },
+    max_entries=int(os.getenv("INFERENCE_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("INFERENCE_CACHE_TTL", 7 * 24 * 3600)),
+    disk_path=os.getenv("INFERENCE_CACHE_PATH"),  # e.g. backend/.cache/inference.sqlite3
+)
+
+# Inference backend: "remote" (HF Inference API, default) or "local" (in-process CPU models).
+# The local engine is loaded on first use, or eagerly via warm_up() at server startup.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "remote").lower()
+_local_engine = None
+_local_engine_failed = False
+_local_engine_lock = threading.Lock()
+
+SANITATION_KEYWORDS = [
+    "garbage", "waste", "trash", "dustbin", "sewage", "sewer", "drainage",
+    "drain", "litter", "dirty", "filth", "smell", "stink", "stray animals",
+    "dump", "waste collection", "garbage collection",
+]
+
+# Rule tables per category key; only sanitation has built-in keywords; the rest can be
+# filled from the KEYWORD_RULES_PATH JSON file, which is hot-reloaded when it changes.
+CATEGORY_KEYWORDS = {key: [] for key in CATEGORY_KEYS}
+CATEGORY_KEYWORDS["sanitation"] = SANITATION_KEYWORDS
+keyword_rules = KeywordRules(
+    URGENT_KEYWORDS,
+    CATEGORY_KEYWORDS,
+    path=os.getenv("KEYWORD_RULES_PATH"),
+    reload_interval=float(os.getenv("KEYWORD_RULES_RELOAD_INTERVAL", 5)),
+)
+
+# Bump when classification logic changes in code (prompts, decide_initial, stage order)
+PIPELINE_REVISION = 1
+
+# --- 3. Helper Functions ---
+def pipeline_version(keyword_tables, gate):
+    """
+    Hash of everything that shapes an hfEngine: models, labels, keyword tables,
+    sentiment thresholds, the Groq gate settings and PIPELINE_REVISION.
+    """
+    return config_fingerprint(
+        PIPELINE_REVISION,
+        CATEGORY_MODEL, CATEGORY_LABELS, CATEGORY_KEYS,
+        PRIORITY_MODEL, PRIORITY_LEVELS, GROQ_MODEL,
+        [NEGATIVE_HIGH_THRESHOLD, NEGATIVE_MEDIUM_THRESHOLD, NEUTRAL_MEDIUM_THRESHOLD],
+        keyword_tables, gate,
+    )
+
+def classification_fields(hf_engine):
+    """
+    Fields to merge into a grievance once classified. The top-level pipelineVersion
+    ("" until classified) is what tools/recategorize.py queries for stale documents.
+    """
+    return {"hfEngine": hf_engine, "pipelineVersion": hf_engine.get("pipelineVersion", "")}
+
+def get_groq_client():
+    """Create the Groq client on first use (keeps `import pipeline` fast for the CLI)."""
+    global _groq_client
+    if _groq_client is None and GROQ_API_KEY:
+        with _groq_client_lock:
+            if _groq_client is None:
+                from groq import Groq
+                _groq_client = Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
+    return _groq_client
+
+def get_local_engine():
+    """Return the local inference engine when INFERENCE_BACKEND=local, loading it on first use."""
+    global _local_engine, _local_engine_failed
+    if INFERENCE_BACKEND != "local" or _local_engine_failed:
+        return _local_engine
+    if _local_engine is None:
+        with _local_engine_lock:
+            if _local_engine is None and not _local_engine_failed:
+                try:
+                    engine = LocalInferenceEngine(
+                        CATEGORY_MODEL,
+                        PRIORITY_MODEL,
+                        runtime=os.getenv("LOCAL_INFERENCE_RUNTIME", "onnx"),
+                        quantize=os.getenv("LOCAL_INFERENCE_QUANTIZE", "1") == "1",
+                        max_batch_size=int(os.getenv("LOCAL_INFERENCE_BATCH_SIZE", 16)),
+                        max_wait=float(os.getenv("LOCAL_INFERENCE_BATCH_WAIT_MS", 10)) / 1000,
+                    )
+                    engine.load()
+                    _local_engine = engine
+                except Exception as e:
+                    logger.error(f"❌ Local inference unavailable, falling back to HF Inference API: {e}")
+                    _local_engine_failed = True
+    return _local_engine
+
+def warm_up():
+    """Eagerly create heavy clients (server startup); the CLI skips this and pays on first use."""
+    logger.info(f"HF_API_TOKEN: {'✅ Set' if HF_API_TOKEN else '❌ Not Set'}")
+    logger.info(f"GROQ_API_KEY: {'✅ Set' if GROQ_API_KEY else '❌ Not Set'}")
+    get_groq_client()
+    get_local_engine()
+    logger.info(f"INFERENCE_BACKEND: {'local' if _local_engine else 'remote'}")
+
+def map_label_to_key(label):
+    """Map model label to simple category key."""
+    try:
+        idx = CATEGORY_LABELS.index(label)
+        return CATEGORY_KEYS[idx]
+    except ValueError:
+        return "other"
+
+def match_rules(text):
+    """Single pass over the text: urgent keyword hits plus keyword hits per category."""
+    return keyword_rules.matcher.match(text)
+
+def category_from_rule_hits(rule_hits):
+    """The category with the most keyword hits (ties go to the earlier CATEGORY_KEYS entry)."""
+    hits = rule_hits["categories"]
+    matched = [key for key in CATEGORY_KEYS if hits.get(key)]
+    if not matched:
+        return None
+    return max(matched, key=lambda key: len(hits[key]))
+
+def infer_category_from_keywords(text):
+    """Simple keyword-based category override."""
+    return category_from_rule_hits(match_rules(text))
+
+KEYWORD_STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "there", "their",
+    "was", "were", "from", "will", "your", "you", "are", "sir",
+    "madam", "please", "kindly", "city", "area", "ward",
+}
+
+def tokenize(text):
+    """Lowercase 3+ letter words without stopwords (keywords and duplicate detection)."""
+    return [t for t in re.findall(r'[a-z]{3,}', text.lower()) if t not in KEYWORD_STOPWORDS]
+
+def extract_keywords(text, top_k=5):
+    """Extract top N non-stopwords from text (Matches server.js logic)."""
+    freq = Counter(tokenize(text))
+    return [w for w, _ in freq.most_common(top_k)]
+
+def find_urgent_matches(text):
+    """Finds matching urgent keywords in the text."""
+    return match_rules(text)["urgent"]
+
+def normalize_sentiment(sentiment):
+    """Normalize sentiment label from the model to 'negative', 'neutral', or 'positive'."""
+    s = (sentiment or "").lower()
+    if s in ["label_0", "negative"]:
+        return "negative"
+    if s in ["label_1", "neutral"]:
+        return "neutral"
+    if s in ["label_2", "positive"]:
+        return "positive"
+    return "neutral"
+
+def decide_initial(cat_res, pri_res, urgent_matches, keyword_category):
+    """PRIORITY & CATEGORY DECISION LOGIC (HF/Keyword runs first). Returns (hf_category, hf_priority)."""
+    hf_priority = "low"
+    score = pri_res.get("sentimentScore")
+    sentiment = normalize_sentiment(pri_res.get("sentiment"))
+
+    if len(urgent_matches) > 0:
+        hf_priority = "high"
+    elif sentiment == "negative":
+        if score > NEGATIVE_HIGH_THRESHOLD: hf_priority = "high"
+        elif score > NEGATIVE_MEDIUM_THRESHOLD: hf_priority = "medium"
+    elif sentiment == "neutral":
+        if score > NEUTRAL_MEDIUM_THRESHOLD: hf_priority = "medium"
+
+    hf_category = cat_res.get("category", "other")
+    if keyword_category:
+        hf_category = keyword_category
+
+    if hf_category == "sanitation" and hf_priority == "low":
+        hf_priority = "medium"
+
+    return hf_category, hf_priority
+
+def get_hf_batcher(model_name):
+    """The shared micro-batcher for one remote HF model, created on first use."""
+    batcher = _hf_batchers.get(model_name)
+    if batcher is None:
+        with _hf_batchers_lock:
+            batcher = _hf_batchers.get(model_name)
+            if batcher is None:
+                batcher = AdaptiveMicroBatcher(
+                    lambda items, name=model_name: classify_huggingface_batch(name, items),
+                    min_batch_size=HF_BATCH_MIN_SIZE,
+                    max_batch_size=HF_BATCH_MAX_SIZE,
+                    target_latency=HF_BATCH_TARGET_MS / 1000,
+                    max_wait=HF_BATCH_WAIT_MS / 1000,
+                    concurrency=HF_BATCH_CONCURRENCY,
+                    name=f"hf-batch-{HF_STAGE_NAMES.get(model_name, model_name)}",
+                )
+                _hf_batchers[model_name] = batcher
+    return batcher
+
+def post_huggingface(model_name, payload, deadline=None):
+    """POST one payload to a HF model and return the JSON; records the breaker outcome and error metric, then re-raises."""
+    response = None
+    try:
+        response = hf_client.post(model_name, payload, deadline=deadline)
+        response.raise_for_status()
+        circuit_breaker.record("hf", ok=True)
+        return response.json()
+    except requests.exceptions.HTTPError as err:
+        logger.error(f"⚠️ HF {model_name} HTTP error: {err} - {response.text}")
+        metrics.count_error(HF_STAGE_NAMES.get(model_name, "hf"))
+        # Other 4xx responses are about this request, not the provider's health
+        circuit_breaker.record("hf", ok=response.status_code < 500 and response.status_code != 429)
+        raise
+    except DeadlineExceeded as err:
+        # The request's budget ran out before the call; not a provider failure
+        logger.warning(f"⚠️ {err}")
+        metrics.count_error(HF_STAGE_NAMES.get(model_name, "hf"))
+        raise
+    except Exception as err:
+        logger.error(f"⚠️ classify_huggingface error for {model_name}: {err}")
+        metrics.count_error(HF_STAGE_NAMES.get(model_name, "hf"))
+        circuit_breaker.record("hf", ok=False)
+        raise
+
+def _batch_item_result(out, zero_shot):
+    """One item of a list-input HF response in the single-call shape, or None if it is malformed."""
+    if zero_shot:
+        # {"labels": [...], "scores": [...]}
+        if (isinstance(out, dict) and isinstance(out.get("labels"), list) and out["labels"]
+                and isinstance(out.get("scores"), list) and len(out["scores"]) == len(out["labels"])):
+            return out
+        return None
+    # Text classification: [{label, score}, ...] per input (or one {label, score})
+    candidates = [out] if isinstance(out, dict) else out
+    if (isinstance(candidates, list) and candidates
+            and all(isinstance(c, dict) and "label" in c and "score" in c for c in candidates)):
+        return [candidates]
+    return None
+
+def _classify_huggingface_each(model_name, items, indices, params):
+    """Send the given batch items one per request (concurrently); None for items that fail."""
+    def one(i):
+        text, _, deadline = items[i]
+        try:
+            return post_huggingface(model_name, {"inputs": text, "parameters": params}, deadline=deadline)
+        except Exception:
+            return None
+
+    with _hf_batchers_lock:
+        _hf_batch_fallbacks[HF_STAGE_NAMES.get(model_name, model_name)] += len(indices)
+    if len(indices) == 1:
+        return [one(indices[0])]
+    with ThreadPoolExecutor(max_workers=min(len(indices), HF_BATCH_FALLBACK_CONCURRENCY)) as pool:
+        return list(pool.map(one, indices))
+
+def classify_huggingface_batch(model_name, items):
+    """
+    MicroBatcher callback: `items` are (text, parameters JSON, deadline) tuples; returns one result per item.
+
+    Items with the same parameters go out as one request with a list of `inputs`. The request may run
+    until the latest deadline in the group; callers with an earlier one stop waiting on their own.
+    Each item's result is checked against the expected shape. If the endpoint rejects the list with a
+    4xx, returns the wrong number of results, or an item is malformed, those items are re-sent one per
+    request instead of falling back to defaults. 429/5xx and network errors fail the whole batch.
+    """
+    groups = {}
+    for i, (_, params, _) in enumerate(items):
+        groups.setdefault(params, []).append(i)
+
+    results = [None] * len(items)
+    for params, indices in groups.items():
+        task_params = json.loads(params)
+        zero_shot = "candidate_labels" in task_params
+        retry = list(indices)
+        if model_name not in _hf_list_inputs_rejected:
+            deadlines = [items[i][2] for i in indices]
+            payload = {"inputs": [items[i][0] for i in indices], "parameters": task_params}
+            try:
+                data = post_huggingface(model_name, payload, deadline=None if None in deadlines else max(deadlines))
+            except requests.exceptions.HTTPError as err:
+                status = err.response.status_code if err.response is not None else None
+                if status is None or status >= 500 or status == 429:
+                    raise
+                logger.warning(f"⚠️ HF {model_name} rejected list inputs ({status}); sending items one by one")
+                _hf_list_inputs_rejected.add(model_name)
+                data = None
+            if isinstance(data, list) and len(data) == len(indices):
+                retry = []
+                for i, out in zip(indices, data):
+                    results[i] = _batch_item_result(out, zero_shot)
+                    if results[i] is None:
+                        retry.append(i)
+            elif data is not None:
+                logger.warning(f"⚠️ HF {model_name} returned {len(data) if isinstance(data, list) else 'no'} "
+                               f"results for {len(indices)} inputs; sending items one by one")
+        if retry:
+            for i, out in zip(retry, _classify_huggingface_each(model_name, items, retry, task_params)):
+                results[i] = out
+    return results
+
+def classify_huggingface(text, model_name, task_params=None, deadline=None):
+    """
+    Generic function to call Hugging Face Inference API (or the local engine when enabled).
+
+    Returns None (callers use their defaults) when the HF circuit is open or the call fails.
+    With HF_MICRO_BATCH, the call is queued and sent together with other concurrent ones.
+    """
+    local_engine = get_local_engine()
+    if local_engine is not None:
+        try:
+            return local_engine.infer(model_name, text, task_params)
+        except Exception as err:
+            logger.error(f"⚠️ Local inference error for {model_name}: {err}")
+            return None
+
+    if not HF_API_TOKEN: return None
+    if not circuit_breaker.allow("hf"): return None
+
+    if HF_MICRO_BATCH:
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        try:
+            return get_hf_batcher(model_name).submit(
+                (text, json.dumps(task_params or {}, sort_keys=True), deadline), timeout=timeout,
+            )
+        except FutureTimeoutError:
+            logger.error(f"⚠️ HF {model_name} batched call missed its deadline")
+            metrics.count_error(HF_STAGE_NAMES.get(model_name, "hf"))
+            return None
+        except Exception:
+            return None  # already logged and counted once for the whole batch
+
+    payload = {
+        "inputs": text,
+        "parameters": task_params if task_params else {},
+    }
+    try:
+        return post_huggingface(model_name, payload, deadline=deadline)
+    except Exception:
+        return None
+
+def classify_category(text, deadline=None):
+    """AI: Category Classification using Hugging Face Zero-Shot Classification."""
+    default_res = DEFAULT_CATEGORY_RESULT
+    cache_key = inference_cache.key("category", text)
+    cached = inference_cache.get(cache_key)
+    if cached is not None: return cached
+
+    data = classify_huggingface(
+        text, CATEGORY_MODEL, task_params={"candidate_labels": CATEGORY_LABELS, "multi_label": False},
+        deadline=deadline,
+    )
+
+    if not data: return dict(default_res)
+
+    raw_label = default_res['rawLabel']
+    confidence = default_res['confidence']
+
+    if isinstance(data, dict) and 'labels' in data and data['labels']:
+        raw_label = data['labels'][0]
+        confidence = data['scores'][0] if data['scores'] else 0.0
+    elif isinstance(data, list) and data and isinstance(data[0], list) and data[0]:
+        candidates = sorted(data[0], key=lambda x: x.get('score', 0), reverse=True)
+        if candidates:
+             raw_label = candidates[0].get('label', raw_label)
+             confidence = candidates[0].get('score', confidence)
+    elif isinstance(data, list) and data and isinstance(data[0], dict):
+        candidates = sorted(data, key=lambda x: x.get('score', 0), reverse=True)
+        if candidates:
+            raw_label = candidates[0].get('label', raw_label)
+            confidence = candidates[0].get('score', confidence)
+    else:
+        logger.error(f"⚠️ HF category unknown format: {data}")
+
+    result = {
+        "rawLabel": raw_label,
+        "category": map_label_to_key(raw_label),
+        "confidence": confidence,
+    }
+    inference_cache.set(cache_key, result)
+    return result
+
+def classify_priority(text, deadline=None):
+    """AI: Priority Classification using Hugging Face Sentiment Analysis."""
+    default_res = DEFAULT_PRIORITY_RESULT
+    cache_key = inference_cache.key("priority", text)
+    cached = inference_cache.get(cache_key)
+    if cached is not None: return cached
+
+    data = classify_huggingface(text, PRIORITY_MODEL, deadline=deadline)
+    if not data: return dict(default_res)
+
+    sentiment = default_res['sentiment']
+    score = default_res['sentimentScore']
+
+    if isinstance(data, list) and data and isinstance(data[0], list) and data[0]:
+        candidates = sorted(data[0], key=lambda x: x.get('score', 0), reverse=True)
+        if candidates:
+            sentiment = candidates[0].get('label', sentiment)
+            score = candidates[0].get('score', score)
+    elif isinstance(data, list) and data and isinstance(data[0], dict):
+        candidates = sorted(data, key=lambda x: x.get('score', 0), reverse=True)
+        if candidates:
+            sentiment = candidates[0].get('label', sentiment)
+            score = candidates[0].get('score', score)
+    else:
+        logger.error(f"⚠️ HF priority unknown format: {data}")
+
+    result = {"sentiment": sentiment, "sentimentScore": score}
+    inference_cache.set(cache_key, result)
+    return result
+
+
+# Static prompt parts, built once instead of per call
+GROQ_JSON_FORMAT_INSTRUCTION = (
+    "Respond ONLY with a single JSON object. The object MUST have three keys: "
+    "'category' (string, one of: " + ", ".join(CATEGORY_KEYS) + "), "
+    "'priority' (string, one of: " + ", ".join(PRIORITY_LEVELS) + "), and "
+    "'explanation' (string, a brief 2-3 sentence reason for the FINAL classification). "
+    "Do not add any other text outside the JSON object."
+)
+
+GROQ_BATCH_SYSTEM_PROMPT = (
+    "You are an expert grievance classification refiner. "
+    "You will receive a JSON object with a 'grievances' array. Each item has an 'id', the grievance 'text', "
+    "and an initial classification from simpler models: 'initialCategory' (mapped from 'rawLabel') and "
+    "'initialPriority'. For each item, review the text and the initial classification. "
+    "If the initial classification is accurate, return it. If the classification is likely wrong, provide a better one. "
+    "Respond ONLY with a single JSON object with one key, 'results': an array with exactly one entry per input item, "
+    "each having the keys 'id' (the item's id), "
+    "'category' (string, one of: " + ", ".join(CATEGORY_KEYS) + "), "
+    "'priority' (string, one of: " + ", ".join(PRIORITY_LEVELS) + "), and "
+    "'explanation' (string, a brief 2-3 sentence reason for the FINAL classification). "
+    "Do not add any other text outside the JSON object."
+)
+
+GROQ_BATCH_SIZE = int(os.getenv("GROQ_BATCH_SIZE", 10))
+
+# Groq request/token accounting (single vs batched calls)
+_groq_usage_lock = threading.Lock()
+groq_usage = {
+    "singleRequests": 0, "singlePromptTokens": 0, "singleCompletionTokens": 0,
+    "batchRequests": 0, "batchItems": 0, "batchPromptTokens": 0, "batchCompletionTokens": 0,
+    "batchFallbacks": 0,
+}
+
+
+def _record_groq_usage(kind, chat_completion, items=1):
+    usage = getattr(chat_completion, "usage", None)
+    with _groq_usage_lock:
+        groq_usage[f"{kind}Requests"] += 1
+        if kind == "batch":
+            groq_usage["batchItems"] += items
+        if usage is not None:
+            groq_usage[f"{kind}PromptTokens"] += usage.prompt_tokens or 0
+            groq_usage[f"{kind}CompletionTokens"] += usage.completion_tokens or 0
+
+
+def groq_usage_report():
+    """Counters plus the requests/tokens saved by batching, estimated from observed single-call averages."""
+    with _groq_usage_lock:
+        report = dict(groq_usage)
+    singles = report["singleRequests"]
+    batched = report["batchItems"]
+    # Items that fell back to a single call were paid for twice
+    report["requestsSaved"] = batched - report["batchRequests"] - report["batchFallbacks"]
+    if singles and batched:
+        per_item = (report["singlePromptTokens"] + report["singleCompletionTokens"]) / singles
+        spent = report["batchPromptTokens"] + report["batchCompletionTokens"] + per_item * report["batchFallbacks"]
+        report["estimatedTokensSaved"] = round(per_item * batched - spent)
+    else:
+        report["estimatedTokensSaved"] = None  # needs at least one single call as a baseline
+    return report
+
+
+def refine_with_groq(text, initial_category, initial_priority, hf_raw_label, deadline=None): # <--- RENAMED AND UPDATED SIGNATURE
+    """
+    LLM Wrapper: Uses Groq to validate and refine the initial category and priority 
+    determined by Hugging Face and rule-based logic.
+
+    Returns None when the Groq circuit is open, `deadline` (time.monotonic()) has passed or the call fails.
+    """
+    groq_client = get_groq_client()
+    if not groq_client:
+        return None
+
+    cache_key = inference_cache.key("groq", text, f"{initial_category}|{initial_priority}|{hf_raw_label}")
+    cached = inference_cache.get(cache_key)
+    if cached is not None: return cached
+
+    remaining = deadline - time.monotonic() if deadline is not None else None
+    if (remaining is not None and remaining <= 0) or not circuit_breaker.allow("groq"):
+        return None
+
+    system_prompt = (
+        "You are an expert grievance classification refiner. "
+        f"Initial Category (from simpler models): '{initial_category}' (mapped from: '{hf_raw_label}') "
+        f"Initial Priority (from simpler models): '{initial_priority}' "
+        "Your task is to review the grievance text and the initial classification. "
+        "If the initial classification is accurate, return it. If the classification is likely wrong, provide a better one. "
+        "The category and priority in your response MUST be one of the defined values. "
+        + GROQ_JSON_FORMAT_INSTRUCTION
+    )
+
+    if remaining is not None:
+        # Within a request deadline: one attempt, cut off when the budget runs out
+        groq_client = groq_client.with_options(timeout=remaining, max_retries=0)
+
+    try:
+        rate_limit.acquire("groq")
+        chat_completion = groq_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Grievance Text: {text}"}
+            ],
+            model=GROQ_MODEL,
+            response_format={"type": "json_object"}, 
+            temperature=0.0
+        )
+        circuit_breaker.record("groq", ok=True)
+        _record_groq_usage("single", chat_completion)
+        
+        json_string = chat_completion.choices[0].message.content
+        parsed_content = json.loads(json_string)
+
+        logger.info(f"✅ Groq Refinement Result: {parsed_content}")
+        inference_cache.set(cache_key, parsed_content)
+        return parsed_content
+
+    except Exception as err:
+        logger.error(f"⚠️ Groq refinement error: {err}")
+        metrics.count_error("groq")
+        _record_groq_failure(err)
+        return None
+
+def _record_groq_failure(err):
+    # API errors carry the HTTP status; other 4xx responses are about the request, not Groq's health
+    status = getattr(err, "status_code", None)
+    circuit_breaker.record("groq", ok=status is not None and status < 500 and status != 429)
+
+def _valid_refinement(item):
+    return (
+        isinstance(item, dict)
+        and item.get("category") in CATEGORY_KEYS
+        and item.get("priority") in PRIORITY_LEVELS
+        and isinstance(item.get("explanation"), str)
+    )
+
+def refine_with_groq_batch(items, batch_size=None):
+    """
+    Batched variant of refine_with_groq for bulk reprocessing.
+
+    `items` is a list of (text, initial_category, initial_priority, hf_raw_label) tuples.
+    Up to `batch_size` uncached items are packed into one JSON-mode request; any item
+    missing from an otherwise successful response, or failing validation, is retried
+    with refine_with_groq. When the request itself fails (429/5xx/timeout, after the
+    client's own retries), the chunk's items stay None and keep their rule/HF
+    classification rather than sending one more call per item to a failing provider.
+    Returns one {category, priority, explanation} dict (or None) per item, in order.
+    """
+    groq_client = get_groq_client()
+    if not groq_client:
+        return [None] * len(items)
+
+    batch_size = batch_size or GROQ_BATCH_SIZE
+    results = [None] * len(items)
+    keys = []
+    pending = []
+    for i, (text, initial_category, initial_priority, hf_raw_label) in enumerate(items):
+        key = inference_cache.key("groq", text, f"{initial_category}|{initial_priority}|{hf_raw_label}")
+        keys.append(key)
+        cached = inference_cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        payload = {"grievances": [
+            {
+                "id": str(i),
+                "text": items[i][0],
+                "initialCategory": items[i][1],
+                "initialPriority": items[i][2],
+                "rawLabel": items[i][3],
+            }
+            for i in chunk
+        ]}
+        returned = {}
+        if not circuit_breaker.allow("groq"):
+            continue  # results stay None: the items keep their rule/HF classification
+        try:
+            rate_limit.acquire("groq")
+            chat_completion = groq_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": GROQ_BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+                ],
+                model=GROQ_MODEL,
+                response_format={"type": "json_object"},
+                temperature=0.0,
+            )
+            circuit_breaker.record("groq", ok=True)
+            _record_groq_usage("batch", chat_completion, items=len(chunk))
+            parsed = json.loads(chat_completion.choices[0].message.content)
+            for entry in parsed.get("results", []):
+                if isinstance(entry, dict):
+                    returned[str(entry.get("id"))] = entry
+        except Exception as err:
+            logger.error(f"⚠️ Groq batch refinement error ({len(chunk)} items): {err}")
+            metrics.count_error("groqBatch")
+            _record_groq_failure(err)
+            continue  # results stay None, like the open-circuit case
+
+        for i in chunk:
+            entry = returned.get(str(i))
+            if _valid_refinement(entry):
+                result = {k: entry[k] for k in ("category", "priority", "explanation")}
+                inference_cache.set(keys[i], result)
+                results[i] = result
+            else:
+                with _groq_usage_lock:
+                    groq_usage["batchFallbacks"] += 1
+                results[i] = refine_with_groq(*items[i])
+
+    logger.info(f"✅ Groq batch refinement: {len(items)} items, {len(pending)} uncached")
+    return results
+
+
+def wait_for_stage(future, deadline, default, stage):
+    """Wait for a stage future until `deadline` (monotonic), returning `default` on timeout or error."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        future.cancel()
+        logger.error(f"⚠️ {stage} stage timed out")
+    except Exception as err:
+        logger.error(f"⚠️ {stage} stage failed: {err}")
+    return default
+
+
+# --- 4. Groq Gating ---
+class GroqGatePolicy:
+    """
+    Decides whether refine_with_groq runs for an item.
+
+    mode="always" refines everything (previous behaviour). mode="gated" skips Groq
+    when the keyword and model categories agree, the category is confident
+    (model confidence >= min_confidence, or a keyword rule picked it), and the
+    priority is settled (urgent keyword hit, or sentiment score >= min_sentiment_score).
+    """
+
+    def __init__(self, mode="always", min_confidence=0.85, min_sentiment_score=0.8, require_agreement=True):
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.min_sentiment_score = min_sentiment_score
+        self.require_agreement = require_agreement
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            mode=os.getenv("GROQ_GATE_MODE", "always").lower(),
+            min_confidence=float(os.getenv("GROQ_GATE_MIN_CONFIDENCE", 0.85)),
+            min_sentiment_score=float(os.getenv("GROQ_GATE_MIN_SENTIMENT", 0.8)),
+            require_agreement=os.getenv("GROQ_GATE_REQUIRE_AGREEMENT", "1") == "1",
+        )
+
+    def decide(self, category_confidence, sentiment_score, urgent_matches, keyword_category, model_category):
+        """Returns (refine, reason)."""
+        if self.mode != "gated":
+            return True, "always"
+        if self.require_agreement and keyword_category and keyword_category != model_category:
+            return True, "keyword/model category disagree"
+        if not (keyword_category or category_confidence >= self.min_confidence):
+            return True, f"category confidence {category_confidence:.2f} < {self.min_confidence}"
+        if not (urgent_matches or sentiment_score >= self.min_sentiment_score):
+            return True, f"sentiment score {sentiment_score:.2f} < {self.min_sentiment_score}"
+        return False, "confident rules/models"
+
+    def describe(self):
+        return {
+            "mode": self.mode,
+            "minConfidence": self.min_confidence,
+            "minSentimentScore": self.min_sentiment_score,
+            "requireAgreement": self.require_agreement,
+        }
+
+
+# --- 5. Pipeline ---
+class GrievancePipeline:
+    """
+    Classification pipeline: rules -> hf -> groq -> assemble.
+
+    Each stage reads and extends a per-item context dict. After every stage, and
+    after each HF call ("hfCategory", "hfPriority"), the registered timing hooks
+    are called as `hook(stage, seconds)`. `run` classifies one text; `run_many`
+    classifies a batch with bounded concurrency and `iter_many` streams the same
+    results as they complete.
+    """
+
+    STAGES = ("rules", "hf", "groq", "assemble")
+
+    def __init__(self, executor=None, gate=None):
+        self._executor = executor
+        self.gate = gate or GroqGatePolicy.from_env()
+        self.hooks = []
+        self._version = None  # (keyword matcher, gate settings, version)
+
+    @property
+    def executor(self):
+        return self._executor or inference_executor
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @property
+    def version(self):
+        """pipeline_version() of this pipeline, recomputed when the keyword rules reload or the gate changes."""
+        matcher, gate = keyword_rules.matcher, self.gate.describe()
+        cached = self._version
+        if cached is None or cached[0] is not matcher or cached[1] != gate:
+            cached = self._version = (matcher, gate, pipeline_version(matcher.tables(), gate))
+        return cached[2]
+
+    def run(self, text, executor=None, deadline=None):
+        """Classify one text and return the hfEngine object; `deadline` defaults to now + REQUEST_DEADLINE."""
+        ctx = self._new_context(text, executor or self.executor, deadline)
+        for stage in self.STAGES:
+            self._run_stage(stage, ctx)
+        return ctx["hfEngine"]
+
+    def run_many(self, texts, concurrency=4, groq_batch_size=None):
+        """Classify a batch; results are in input order, None where an item failed."""
+        texts = list(texts)
+        results = [None] * len(texts)
+        for index, hf_engine in self.iter_many(texts, concurrency, groq_batch_size):
+            results[index] = hf_engine
+        return results
+
+    def iter_many(self, texts, concurrency=4, groq_batch_size=None):
+        """
+        Classify a batch, yielding `(index, hfEngine)` as items finish (hfEngine is None on failure).
+
+        With `groq_batch_size`, the groq stage is replaced by refine_with_groq_batch,
+        called whenever that many items have finished their rules and hf stages.
+        """
+        # Items get their own stage executor so they never queue behind each other's HF calls.
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pipeline-item") as items, \
+                ThreadPoolExecutor(max_workers=2 * concurrency, thread_name_prefix="pipeline-stage") as stages:
+            if not groq_batch_size:
+                futures = {items.submit(self._run_safe, text, stages): i for i, text in enumerate(texts)}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+                return
+
+            def front(text):
+                ctx = self._new_context(text, stages)
+                for stage in ("rules", "hf"):
+                    self._run_stage(stage, ctx)
+                ctx["groq"] = None
+                return ctx
+
+            futures = {items.submit(self._safe, front, text): i for i, text in enumerate(texts)}
+            pending = []
+            for future in as_completed(futures):
+                index, ctx = futures[future], future.result()
+                if ctx is not None and self._gate(ctx):
+                    pending.append((index, ctx))
+                    if len(pending) >= groq_batch_size:
+                        yield from self._refine_and_assemble(pending, groq_batch_size)
+                        pending = []
+                else:
+                    yield index, self._assemble_safe(ctx)
+            if pending:
+                yield from self._refine_and_assemble(pending, groq_batch_size)
+
+    def _refine_and_assemble(self, pending, groq_batch_size):
+        started = time.perf_counter()
+        refined = refine_with_groq_batch(
+            [(c["text"], c["hfCategory"], c["hfPriority"], c["cat"].get("rawLabel", "other")) for _, c in pending],
+            batch_size=groq_batch_size,
+        )
+        elapsed = time.perf_counter() - started
+        self._notify("groq", elapsed)
+        for (index, ctx), groq_res in zip(pending, refined):
+            ctx["groq"] = groq_res
+            ctx["timings"]["groq"] = elapsed  # the whole batched call
+            yield index, self._assemble_safe(ctx)
+
+    def _assemble_safe(self, ctx):
+        if ctx is None:
+            return None
+        self._safe(lambda c: self._run_stage("assemble", c), ctx)
+        return ctx.get("hfEngine")
+
+    def _new_context(self, text, executor, deadline=None):
+        deadline = deadline or time.monotonic() + REQUEST_DEADLINE
+        return {"text": text, "executor": executor, "deadline": deadline, "timings": {}}
+
+    def _run_stage(self, stage, ctx):
+        started = time.perf_counter()
+        getattr(self, f"stage_{stage}")(ctx)
+        elapsed = time.perf_counter() - started
+        ctx["timings"][stage] = elapsed
+        self._notify(stage, elapsed)
+
+    def _notify(self, stage, elapsed):
+        for hook in self.hooks:
+            hook(stage, elapsed)
+
+    def _safe(self, fn, arg):
+        try:
+            return fn(arg)
+        except Exception as err:
+            logger.error(f"⚠️ Pipeline item failed: {err}")
+            return None
+
+    def _run_safe(self, text, executor):
+        return self._safe(lambda t: self.run(t, executor), text)
+
+    # --- Stages ---
+    def stage_rules(self, ctx):
+        text = ctx["text"]
+        rule_hits = match_rules(text)
+        ctx["urgentMatches"] = rule_hits["urgent"]
+        ctx["keywordCategory"] = category_from_rule_hits(rule_hits)
+        ctx["keywords"] = extract_keywords(text)
+
+    def _timed_call(self, stage, fn, ctx, deadline):
+        started = time.perf_counter()
+        try:
+            return fn(ctx["text"], deadline=deadline)
+        finally:
+            elapsed = time.perf_counter() - started
+            ctx["timings"][stage] = elapsed
+            self._notify(stage, elapsed)
+
+    def stage_hf(self, ctx):
+        """Both HF calls in parallel, bounded by HF_STAGE_TIMEOUT and the request deadline, then the initial decision."""
+        executor = ctx["executor"]
+        deadline = min(time.monotonic() + HF_STAGE_TIMEOUT, ctx["deadline"])
+        cat_future = executor.submit(self._timed_call, "hfCategory", classify_category, ctx, deadline)
+        pri_future = executor.submit(self._timed_call, "hfPriority", classify_priority, ctx, deadline)
+        ctx["cat"] = wait_for_stage(cat_future, deadline, dict(DEFAULT_CATEGORY_RESULT), "HF category")
+        ctx["pri"] = wait_for_stage(pri_future, deadline, dict(DEFAULT_PRIORITY_RESULT), "HF priority")
+        # Defaults mean the call failed or timed out and the rules decide alone
+        if ctx["cat"] == DEFAULT_CATEGORY_RESULT:
+            metrics.count_fallback("hfCategory")
+        if ctx["pri"] == DEFAULT_PRIORITY_RESULT:
+            metrics.count_fallback("hfPriority")
+        ctx["hfCategory"], ctx["hfPriority"] = decide_initial(
+            ctx["cat"], ctx["pri"], ctx["urgentMatches"], ctx["keywordCategory"]
+        )
+
+    def _gate(self, ctx):
+        refine, reason = self.gate.decide(
+            float(ctx["cat"].get("confidence", 0.0)),
+            float(ctx["pri"].get("sentimentScore") or 0.0),
+            ctx["urgentMatches"],
+            ctx["keywordCategory"],
+            ctx["cat"].get("category", "other"),
+        )
+        ctx["groqGate"] = {"decision": "refine" if refine else "skip", "reason": reason}
+        return refine
+
+    def stage_groq(self, ctx):
+        """LLM Refinement (SECOND LOGIC PASS / WRAPPER), bounded by GROQ_STAGE_TIMEOUT and the request deadline."""
+        ctx["groq"] = None
+        if not self._gate(ctx):
+            return
+        deadline = min(time.monotonic() + GROQ_STAGE_TIMEOUT, ctx["deadline"])
+        hf_raw_label = ctx["cat"].get("rawLabel", "other")
+        future = ctx["executor"].submit(
+            refine_with_groq, ctx["text"], ctx["hfCategory"], ctx["hfPriority"], hf_raw_label, deadline
+        )
+        ctx["groq"] = wait_for_stage(future, deadline, None, "Groq refinement")
+
+    def stage_assemble(self, ctx):
+        """FINAL CLASSIFICATION (Prioritizes Groq refinement) and the hfEngine object."""
+        cat_res, pri_res, groq_res = ctx["cat"], ctx["pri"], ctx["groq"]
+        hf_category, hf_priority = ctx["hfCategory"], ctx["hfPriority"]
+        hf_raw_label = cat_res.get("rawLabel", "other")
+        sentiment_raw = pri_res.get("sentiment")
+        score = pri_res.get("sentimentScore")
+
+        if ctx["groqGate"]["decision"] == "skip":
+            metrics.count_groq("skipped")
+        elif groq_res:
+            metrics.count_groq("refined")
+        else:
+            metrics.count_groq("failed")
+            metrics.count_fallback("groq")
+
+        if groq_res:
+            priority = groq_res.get("priority", hf_priority)
+            category = groq_res.get("category", hf_category)
+            ai_explanation = groq_res.get("explanation", "Refined by Groq LLM.")
+        else:
+            # Fallback to the existing logic results if Groq fails
+            priority = hf_priority
+            category = hf_category
+            ai_explanation = (
+                f"Category '{category}' predicted from '{hf_raw_label}' "
+                f"(score: {float(cat_res.get('confidence', 0.0)):.2f}), "
+                f"Priority '{priority}' determined using sentiment ('{sentiment_raw}', "
+                f"score: {float(score):.2f}) and urgency keywords."
+            )
+
+        ctx["hfEngine"] = {
+            "pipelineVersion": self.version,
+            "category": category,
+            "priority": priority,
+            "isUrgent": priority == "high",
+            "keywords": ctx["keywords"],
+            "explanation": ai_explanation,
+
+            # Keep all model data for diagnostics
+            "rawCategoryLabel": hf_raw_label,
+            "categoryConfidence": float(cat_res.get("confidence", 0.0)),
+            "urgentMatches": ctx["urgentMatches"],
+            "modelInfo": {
+                "categoryModel": CATEGORY_MODEL,
+                "priorityModel": PRIORITY_MODEL,
+                "sentimentLabel": sentiment_raw,
+                "sentimentScore": float(score),
+                "groqModel": GROQ_MODEL if groq_res else "None",
+                "hfCategory": hf_category,
+                "hfPriority": hf_priority,
+                "groqGate": ctx["groqGate"],
+                # Stages finished so far; the server adds its Firestore write timings
+                "stageTimingsMs": {stage: round(s * 1000, 1) for stage, s in ctx["timings"].items()},
+            },
+        }
+
+
+grievance_pipeline = GrievancePipeline()
+
+
+def pipeline_stats():
+    """Runtime stats of the shared clients, for the server's /runtime-stats endpoint."""
+    return {
+        "hfClient": hf_client.stats(),
+        "groqUsage": groq_usage_report(),
+        "inferenceCache": inference_cache.stats(),
+        "rateLimits": rate_limit.stats(),
+        "inferenceBackend": "local" if _local_engine else "remote",
+        "localInference": _local_engine.stats() if _local_engine else None,
+        "hfBatching": {
+            **{HF_STAGE_NAMES.get(m, m): b.stats() for m, b in _hf_batchers.items()},
+            "singleFallbacks": dict(_hf_batch_fallbacks),
+        } if HF_MICRO_BATCH else None,
+    }
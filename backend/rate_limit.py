@@ -0,0 +1,68 @@
+# backend/rate_limit.py
+"""Per-provider token-bucket rate limits ("hf", "groq") shared by every caller in the process."""
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+        self.acquired = 0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def configure(provider, rate, burst=None):
+    """Set (or with rate <= 0, remove) the limit for a provider."""
+    with _lock:
+        if rate and rate > 0:
+            _limiters[provider] = TokenBucket(rate, burst)
+        else:
+            _limiters.pop(provider, None)
+
+
+def acquire(provider):
+    """Block until the provider's limit allows another request (no-op when unlimited)."""
+    limiter = _limiters.get(provider)
+    if limiter is not None:
+        limiter.acquire()
+
+
+def stats():
+    with _lock:
+        return {
+            provider: {
+                "ratePerSecond": limiter.rate,
+                "acquired": limiter.acquired,
+                "waitedSeconds": round(limiter.waited_seconds, 2),
+            }
+            for provider, limiter in _limiters.items()
+        }
+
+
+for _provider in ("hf", "groq"):
+    configure(_provider, float(os.getenv(f"{_provider.upper()}_RATE_LIMIT", 0)))
@@ -1,16 +1,26 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import json
 import firebase_admin
 from firebase_admin import credentials, firestore
-import requests
-import re
-from collections import Counter
+import itertools
 import logging
-import json
-from groq import Groq
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pipeline
+import geo
+import metrics
+import circuit_breaker
+from pipeline import grievance_pipeline, classification_fields
+from classification_queue import ClassificationQueue, QueueFullError
+from dedup import DuplicateIndex, reuse_classification
+from grievance_stats import GrievanceStats, submission_deltas, classification_deltas, merge_deltas, add_deltas
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,367 +34,516 @@ CORS(app)
 
 # Firebase Admin init
 try:
-    # Assumes 'serviceAccountKey.json' is in the 'backend' directory
-    service_account_path = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
-    if os.path.exists(service_account_path):
-        cred = credentials.Certificate(service_account_path)
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        # `firebase emulators:start --only firestore`: no credentials, any project id
+        from google.cloud import firestore as cloud_firestore
+        db = cloud_firestore.Client(project=os.getenv("GOOGLE_CLOUD_PROJECT", "demo-grievance"))
+        logger.info(f"Using the Firestore emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')}")
     else:
-        # Fallback for cloud environments or if the user configures it differently
-        cred = credentials.ApplicationDefault()
+        # Assumes 'serviceAccountKey.json' is in the 'backend' directory
+        service_account_path = os.path.join(os.path.dirname(__file__), "serviceAccountKey.json")
+        if os.path.exists(service_account_path):
+            cred = credentials.Certificate(service_account_path)
+        else:
+            # Fallback for cloud environments or if the user configures it differently
+            cred = credentials.ApplicationDefault()
 
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(cred)
+        db = firestore.client()
 except Exception as e:
     logger.error(f"Error initializing Firebase Admin: {e}")
     db = None
 
-# Hugging Face Config
-HF_API_TOKEN = os.getenv("HF_API_TOKEN") or os.getenv("HUGGINGFACE_API_TOKEN")
-HF_BASE_URL = "https://router.huggingface.co/hf-inference"
-logger.info(f"HF_API_TOKEN: {'✅ Set' if HF_API_TOKEN else '❌ Not Set'}")
-
-# Groq Config
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct" 
-logger.info(f"GROQ_API_KEY: {'✅ Set' if GROQ_API_KEY else '❌ Not Set'}")
-groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-
-
-# --- 2. Constants (Mirroring server.js) ---
-CATEGORY_MODEL = "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"
-PRIORITY_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
-
-CATEGORY_LABELS = [
-    "Issues related to water supply, water pressure, contamination, or no water",
-    "Issues related to roads, potholes, footpaths, traffic, or road damage",
-    "Issues related to electricity, power cuts, voltage fluctuations, or streetlights not working",
-    "Issues related to sanitation, garbage, sewage, drainage, or public cleanliness",
-    "Issues related to health services, hospitals, clinics, medicines, or public health",
-    "Issues related to governance, staff behavior, corruption, permissions, or government service delays",
-    "Other issues not matching the above categories",
-]
-
-CATEGORY_KEYS = [
-    "water", "roads", "electricity", "sanitation", "health", "governance", "other",
-]
-
-URGENT_KEYWORDS = [
-    "urgent", "emergency", "immediately", "asap", "accident", "fire", "flood",
-    "electrocution", "collapsed", "burst", "serious", "critical",
-    "life threatening", "danger", "injury", "major issue", "no water",
-    "no electricity",
-]
-
-SANITATION_KEYWORDS = [
-    "garbage", "waste", "trash", "dustbin", "sewage", "sewer", "drainage",
-    "drain", "litter", "dirty", "filth", "smell", "stink", "stray animals",
-    "dump", "waste collection", "garbage collection",
-]
-
-# --- 3. Helper Functions ---
-def map_label_to_key(label):
-    """Map model label to simple category key."""
-    try:
-        idx = CATEGORY_LABELS.index(label)
-        return CATEGORY_KEYS[idx]
-    except ValueError:
-        return "other"
+# Classification pipeline (shared with tools/recategorize.py); raw Firestore writes get their own timeout
+FIRESTORE_STAGE_TIMEOUT = float(os.getenv("FIRESTORE_STAGE_TIMEOUT", 10))
+# Stage durations feed the grievance_stage_seconds histogram behind /metrics
+grievance_pipeline.add_hook(metrics.observe_stage)
+
+# Aggregate counters behind /stats, updated in the same commit as each grievance write
+grievance_stats = GrievanceStats(
+    db, shards=int(os.getenv("STATS_SHARDS", 10)), cache_ttl=float(os.getenv("STATS_CACHE_TTL", 10))
+)
+
+# Near-duplicate detection: submissions matching an open grievance reuse its classification.
+# DEDUP_SCOPE_PRECISION limits matches to the same/neighbouring geohash cell (0 = anywhere).
+# The index is per process; each worker re-reads recent grievances every DEDUP_SYNC_INTERVAL
+# seconds to see those saved by other workers.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+duplicate_index = None
+if DEDUP_ENABLED:
+    duplicate_index = DuplicateIndex(
+        threshold=float(os.getenv("DEDUP_THRESHOLD", 0.6)),
+        scope_precision=int(os.getenv("DEDUP_SCOPE_PRECISION", 6)) or None,
+        max_age_days=float(os.getenv("DEDUP_MAX_AGE_DAYS", 14)),
+        max_entries=int(os.getenv("DEDUP_MAX_ENTRIES", 50000)),
+    )
+DEDUP_SYNC_INTERVAL = float(os.getenv("DEDUP_SYNC_INTERVAL", 30))
+DEDUP_SYNC_OVERLAP = float(os.getenv("DEDUP_SYNC_OVERLAP", 300))
+logger.info(f"DEDUP_ENABLED: {DEDUP_ENABLED}")
 
-def infer_category_from_keywords(text):
-    """Simple keyword-based category override."""
-    lower = text.lower()
-    if any(k in lower for k in SANITATION_KEYWORDS):
-        return "sanitation"
-    return None
 
-def extract_keywords(text, top_k=5):
-    """Extract top N non-stopwords from text (Matches server.js logic)."""
-    tokens = re.findall(r'[a-z]{3,}', text.lower()) or []
-    stopwords = {
-        "the", "and", "for", "with", "this", "that", "there", "their",
-        "was", "were", "from", "will", "your", "you", "are", "sir",
-        "madam", "please", "kindly", "city", "area", "ward",
-    }
-    freq = Counter(t for t in tokens if t not in stopwords)
-    return [w for w, _ in freq.most_common(top_k)]
-
-def find_urgent_matches(text):
-    """Finds matching urgent keywords in the text."""
-    lower = text.lower()
-    return [k for k in URGENT_KEYWORDS if k in lower]
-
-def normalize_sentiment(sentiment):
-    """Normalize sentiment label from the model to 'negative', 'neutral', or 'positive'."""
-    s = (sentiment or "").lower()
-    if s in ["label_0", "negative"]:
-        return "negative"
-    if s in ["label_1", "neutral"]:
-        return "neutral"
-    if s in ["label_2", "positive"]:
-        return "positive"
-    return "neutral"
-
-def classify_huggingface(text, model_name, task_params=None):
-    """Generic function to call Hugging Face Inference API."""
-    if not HF_API_TOKEN: return None
-
-    headers = {
-        "Authorization": f"Bearer {HF_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "inputs": text,
-        "parameters": task_params if task_params else {},
+# --- 2. Helper Functions ---
+def build_grievance(data):
+    """Validate a submission and build the raw grievance document. Returns (doc, text) or raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    title = data.get("title")
+    description = data.get("description")
+    user_id = data.get("userId")
+    # Capture Location Data
+    latitude = data.get("latitude")
+    longitude = data.get("longitude")
+
+    if not title or not description or not user_id:
+        raise ValueError("Missing required fields: title, description, userId")
+
+    new_grievance = {
+        "title": title,
+        "description": description,
+        "userId": user_id,
+        "status": "open",
+        "createdAt": firestore.SERVER_TIMESTAMP,
+        "pipelineVersion": "",  # set with hfEngine; "" marks a grievance still waiting for classification
     }
 
-    try:
-        response = requests.post(f"{HF_BASE_URL}/models/{model_name}", headers=headers, json=payload)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as err:
-        logger.error(f"⚠️ HF {model_name} HTTP error: {err} - {response.text}")
-        return None
-    except Exception as err:
-        logger.error(f"⚠️ classify_huggingface error for {model_name}: {err}")
-        return None
+    # Add location data if available (optional fields)
+    if latitude is not None and longitude is not None:
+        try:
+            new_grievance["latitude"] = float(latitude)
+            new_grievance["longitude"] = float(longitude)
+            # Cell for /grievances/nearby and the hotspot job
+            if geo.valid_location(new_grievance["latitude"], new_grievance["longitude"]):
+                new_grievance["geohash"] = geo.encode(new_grievance["latitude"], new_grievance["longitude"])
+        except (ValueError, TypeError):
+            logger.warning("Received invalid latitude/longitude data.")
 
-def classify_category(text):
-    """AI: Category Classification using Hugging Face Zero-Shot Classification."""
-    default_res = {
-        "rawLabel": "Other issues not matching the above categories", "category": "other", "confidence": 0.0,
-    }
-    data = classify_huggingface(
-        text, CATEGORY_MODEL, task_params={"candidate_labels": CATEGORY_LABELS, "multi_label": False}
-    )
+    return new_grievance, f"{title}\n{description}".strip()
 
-    if not data: return default_res
-
-    raw_label = default_res['rawLabel']
-    confidence = default_res['confidence']
-
-    if isinstance(data, dict) and 'labels' in data and data['labels']:
-        raw_label = data['labels'][0]
-        confidence = data['scores'][0] if data['scores'] else 0.0
-    elif isinstance(data, list) and data and isinstance(data[0], list) and data[0]:
-        candidates = sorted(data[0], key=lambda x: x.get('score', 0), reverse=True)
-        if candidates:
-             raw_label = candidates[0].get('label', raw_label)
-             confidence = candidates[0].get('score', confidence)
-    elif isinstance(data, list) and data and isinstance(data[0], dict):
-        candidates = sorted(data, key=lambda x: x.get('score', 0), reverse=True)
-        if candidates:
-            raw_label = candidates[0].get('label', raw_label)
-            confidence = candidates[0].get('score', confidence)
-    else:
-        logger.error(f"⚠️ HF category unknown format: {data}")
 
-    return {
-        "rawLabel": raw_label,
-        "category": map_label_to_key(raw_label),
-        "confidence": confidence,
-    }
+def parse_batch_body(req):
+    """Read a batch body as a JSON array or NDJSON (one object per line)."""
+    body = req.get_data(as_text=True).strip()
+    if req.mimetype != "application/x-ndjson" and body.startswith("["):
+        return json.loads(body)
+    return [json.loads(line) for line in body.splitlines() if line.strip()]
 
-def classify_priority(text):
-    """AI: Priority Classification using Hugging Face Sentiment Analysis."""
-    default_res = {"sentiment": "neutral", "sentimentScore": 0.0}
-    data = classify_huggingface(text, PRIORITY_MODEL)
-    if not data: return default_res
-
-    sentiment = default_res['sentiment']
-    score = default_res['sentimentScore']
-
-    if isinstance(data, list) and data and isinstance(data[0], list) and data[0]:
-        candidates = sorted(data[0], key=lambda x: x.get('score', 0), reverse=True)
-        if candidates:
-            sentiment = candidates[0].get('label', sentiment)
-            score = candidates[0].get('score', score)
-    elif isinstance(data, list) and data and isinstance(data[0], dict):
-        candidates = sorted(data, key=lambda x: x.get('score', 0), reverse=True)
-        if candidates:
-            sentiment = candidates[0].get('label', sentiment)
-            score = candidates[0].get('score', score)
-    else:
-        logger.error(f"⚠️ HF priority unknown format: {data}")
 
-    return {"sentiment": sentiment, "sentimentScore": score}
+def commit_with_stats(writes, deltas, stage, timings=None):
+    """
+    Commit (doc_ref, data, merge) writes together with their stats deltas, timed as `stage`.
 
+    The counters never cost a grievance: if the combined commit fails, the
+    documents are committed again on their own and the counters are left for
+    tools/rebuild_stats.py.
+    """
+    def commit(with_stats):
+        batch = db.batch()
+        for doc_ref, data, merge in writes:
+            batch.set(doc_ref, data, merge=merge)
+        if with_stats:
+            grievance_stats.apply(deltas, batch)
+        batch.commit()
+
+    with metrics.timed(stage, timings):
+        try:
+            commit(with_stats=True)
+        except Exception as err:
+            logger.warning(f"⚠️ Stats update failed, writing {len(writes)} grievance(s) without it: {err}")
+            commit(with_stats=False)
+            return
+    grievance_stats.apply_keywords(deltas)
+
+
+def write_with_stats(doc_ref, data, deltas, merge=False, timings=None):
+    """Write a grievance document and its stats deltas in one commit (timed as firestoreAdd/firestoreMerge)."""
+    commit_with_stats([(doc_ref, data, merge)], deltas, "firestoreMerge" if merge else "firestoreAdd", timings)
+
+
+def add_stage_timings(hf_engine, timings):
+    """Record server-side stage timings (ms) next to the pipeline's in modelInfo.stageTimingsMs."""
+    hf_engine.setdefault("modelInfo", {}).setdefault("stageTimingsMs", {}).update(timings)
+
+
+# Clusters whose grievance turned out not to be open are dropped and the lookup repeated, up to this many times
+DEDUP_MAX_STALE_CLUSTERS = 3
 
-def refine_with_groq(text, initial_category, initial_priority, hf_raw_label): # <--- RENAMED AND UPDATED SIGNATURE
+
+def find_open_duplicate(text, geohash=None):
     """
-    LLM Wrapper: Uses Groq to validate and refine the initial category and priority 
-    determined by Hugging Face and rule-based logic.
+    The index match for `text`, if its cluster's grievance is still open.
+
+    The index only learns about new grievances, not status changes (admin.html
+    resolves grievances directly in Firestore), so the cluster is re-read before
+    anything is linked to it; resolved or deleted clusters leave the index.
     """
-    if not groq_client:
+    if duplicate_index is None:
         return None
+    for _ in range(DEDUP_MAX_STALE_CLUSTERS):
+        match = duplicate_index.lookup(text, geohash)
+        if not match:
+            return None
+        try:
+            snap = db.collection("grievances").document(match["clusterId"]).get(["status"])
+        except Exception as err:
+            logger.warning(f"⚠️ Could not check duplicate cluster {match['clusterId']}: {err}")
+            return None
+        if snap.exists and (snap.to_dict() or {}).get("status", "open") == "open":
+            return match
+        logger.info(f"🧹 Duplicate cluster {match['clusterId']} is no longer open; removed from the index")
+        duplicate_index.remove_cluster(match["clusterId"])
+    return None
 
-    category_list = CATEGORY_KEYS
-    priority_list = ["high", "medium", "low"]
-    
-    json_format_instruction = (
-        "Respond ONLY with a single JSON object. The object MUST have three keys: "
-        "'category' (string, one of: " + ", ".join(category_list) + "), "
-        "'priority' (string, one of: " + ", ".join(priority_list) + "), and "
-        "'explanation' (string, a brief 2-3 sentence reason for the FINAL classification). "
-        "Do not add any other text outside the JSON object."
-    )
-    
-    system_prompt = (
-        "You are an expert grievance classification refiner. "
-        f"Initial Category (from simpler models): '{initial_category}' (mapped from: '{hf_raw_label}') "
-        f"Initial Priority (from simpler models): '{initial_priority}' "
-        "Your task is to review the grievance text and the initial classification. "
-        "If the initial classification is accurate, return it. If the classification is likely wrong, provide a better one. "
-        "The category and priority in your response MUST be one of the defined values. "
-        + json_format_instruction
+
+def classify_grievance(text, geohash=None, deadline=None):
+    """hfEngine for a new grievance: an open near-duplicate's classification if one matches, else the pipeline."""
+    match = find_open_duplicate(text, geohash)
+    if match:
+        logger.info(f"♻️ Near-duplicate of {match['clusterId']} (similarity {match['similarity']:.2f})")
+        return reuse_classification(match, text)
+    # Rules -> HF -> Groq -> final hfEngine object
+    return grievance_pipeline.run(text, deadline=deadline)
+
+
+def index_grievance(doc_id, text, geohash, hf_engine):
+    """Make a saved, classified grievance available for near-duplicate matching."""
+    if duplicate_index is not None:
+        duplicate_index.add(doc_id, text, geohash, hf_engine, cluster_id=hf_engine.get("duplicateOf"))
+
+
+def classify_and_merge(job):
+    """Background worker handler: classify a saved grievance and merge hfEngine into its document."""
+    hf_engine = classify_grievance(job["text"], job.get("geohash"))
+    doc_ref = db.collection("grievances").document(job["docId"])
+    write_with_stats(doc_ref, classification_fields(hf_engine), classification_deltas(hf_engine), merge=True)
+    index_grievance(job["docId"], job["text"], job.get("geohash"), hf_engine)
+    logger.info(f"✅ Saved AI data to Firestore for {job['docId']} (async)")
+    return hf_engine
+
+
+# --- 3. Async Classification Queue ---
+# SUBMIT_MODE=sync keeps the request open until classification finishes (default).
+# SUBMIT_MODE=async saves the raw grievance, returns 202 and classifies in the background.
+SUBMIT_MODE = os.getenv("SUBMIT_MODE", "sync").lower()
+classification_queue = ClassificationQueue(
+    classify_and_merge,
+    workers=int(os.getenv("CLASSIFY_WORKERS", 4)),
+    max_size=int(os.getenv("CLASSIFY_QUEUE_SIZE", 200)),
+    max_retries=int(os.getenv("CLASSIFY_MAX_RETRIES", 3)),
+    retry_backoff=float(os.getenv("CLASSIFY_RETRY_BACKOFF", 1.0)),
+)
+logger.info(f"SUBMIT_MODE: {SUBMIT_MODE}")
+
+# Bulk submissions (/submit-grievances/batch); Firestore caps a WriteBatch at 500 writes,
+# one of which each commit spends on the stats delta
+BATCH_SUBMIT_MAX_ITEMS = int(os.getenv("BATCH_SUBMIT_MAX_ITEMS", 500))
+BATCH_SUBMIT_CONCURRENCY = int(os.getenv("BATCH_SUBMIT_CONCURRENCY", 4))
+FIRESTORE_BATCH_LIMIT = 499
+
+
+# --- 4. Write Strategy ---
+# WRITE_STRATEGY=two_phase saves the raw grievance, then merges hfEngine once classified (default).
+# WRITE_STRATEGY=single pre-allocates the document ID and writes raw fields and hfEngine together
+# when classification finishes within SINGLE_WRITE_DEADLINE, otherwise falls back to two_phase.
+# Applies to SUBMIT_MODE=sync; async submissions are two-phase by design.
+WRITE_STRATEGY = os.getenv("WRITE_STRATEGY", "two_phase").lower()
+SINGLE_WRITE_DEADLINE = float(os.getenv("SINGLE_WRITE_DEADLINE", 5))
+# Runs whole pipeline.run calls, so it must not share the pipeline's stage executor
+submit_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SUBMIT_WORKERS", 16)), thread_name_prefix="submit"
+)
+# Overlaps the raw save with classification; kept off the stage executor so slow Firestore writes
+# never hold threads the HF calls are waiting for
+firestore_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FIRESTORE_WORKERS", os.getenv("GUNICORN_THREADS", 8))), thread_name_prefix="firestore"
+)
+write_paths = Counter()
+write_paths_lock = threading.Lock()
+logger.info(f"WRITE_STRATEGY: {WRITE_STRATEGY}")
+
+
+def record_write_path(path):
+    with write_paths_lock:
+        write_paths[path] += 1
+
+
+def save_two_phase(new_grievance, text, deadline=None):
+    """Save the raw grievance (overlapped with classification), then merge hfEngine."""
+    started = time.monotonic()
+    doc_ref = db.collection("grievances").document()
+    timings = {}
+    add_future = firestore_executor.submit(
+        write_with_stats, doc_ref, new_grievance, submission_deltas(), timings=timings
     )
 
+    hf_engine = classify_grievance(text, new_grievance.get("geohash"), deadline)
+
+    # Merging into a document whose raw write failed would leave a partial record, so wait for it.
+    add_future.result(timeout=max(0.0, started + FIRESTORE_STAGE_TIMEOUT - time.monotonic()))
+    add_stage_timings(hf_engine, timings)
+
+    # Update the document with AI results
+    write_with_stats(doc_ref, classification_fields(hf_engine), classification_deltas(hf_engine), merge=True)
+    index_grievance(doc_ref.id, text, new_grievance.get("geohash"), hf_engine)
+    record_write_path("two_phase")
+    logger.info("✅ Saved AI data to Firestore")
+    return doc_ref.id, hf_engine
+
+
+def merge_classification(doc_ref, text, geohash, hf_engine, timings=None):
+    """Merge hfEngine into a grievance whose raw document is already saved."""
+    if timings:
+        add_stage_timings(hf_engine, timings)
+    write_with_stats(doc_ref, classification_fields(hf_engine), classification_deltas(hf_engine), merge=True)
+    index_grievance(doc_ref.id, text, geohash, hf_engine)
+
+
+def save_single_write(new_grievance, text, deadline=None):
+    """
+    One write with raw fields and hfEngine, unless classification misses SINGLE_WRITE_DEADLINE.
+
+    Returns (doc_id, hfEngine); hfEngine is None when the raw grievance was saved
+    but its classification is still running (merged in the background) or failed
+    (left for tools/recategorize.py --only-missing).
+    """
+    doc_ref = db.collection("grievances").document()
+    geohash = new_grievance.get("geohash")
+    deadline = deadline if deadline is not None else time.monotonic() + pipeline.REQUEST_DEADLINE
+    classify_future = submit_executor.submit(classify_grievance, text, geohash, deadline)
     try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Grievance Text: {text}"}
-            ],
-            model=GROQ_MODEL,
-            response_format={"type": "json_object"}, 
-            temperature=0.0
-        )
-        
-        json_string = chat_completion.choices[0].message.content
-        parsed_content = json.loads(json_string)
-
-        logger.info(f"✅ Groq Refinement Result: {parsed_content}")
-        return parsed_content
+        hf_engine = classify_future.result(timeout=SINGLE_WRITE_DEADLINE)
+    except FutureTimeoutError:
+        # Still running: persist the raw grievance now so it is never lost
+        logger.warning(f"⚠️ Single write for {doc_ref.id} fell back to two-phase: deadline passed")
+        timings = {}
+        write_with_stats(doc_ref, new_grievance, submission_deltas(), timings=timings)
+        record_write_path("fallback")
+    except Exception as err:
+        # Classification failed: save the raw grievance on its own and let reprocessing classify it
+        logger.error(f"❌ Classification failed for {doc_ref.id}, saving it unclassified: {err}")
+        write_with_stats(doc_ref, new_grievance, submission_deltas())
+        record_write_path("unclassified")
+        return doc_ref.id, None
+    else:
+        deltas = merge_deltas(submission_deltas(), classification_deltas(hf_engine))
+        write_with_stats(doc_ref, {**new_grievance, **classification_fields(hf_engine)}, deltas)
+        index_grievance(doc_ref.id, text, geohash, hf_engine)
+        record_write_path("single")
+        logger.info("✅ Saved AI data to Firestore")
+        return doc_ref.id, hf_engine
 
+    # Fallback path: wait for classification only as long as the request deadline allows
+    try:
+        hf_engine = classify_future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        def merge_when_done(future):
+            try:
+                merge_classification(doc_ref, text, geohash, future.result(), timings)
+                logger.info(f"✅ Saved AI data to Firestore for {doc_ref.id} (background)")
+            except Exception as err:
+                logger.error(f"❌ Background merge failed for {doc_ref.id}: {err}")
+
+        classify_future.add_done_callback(merge_when_done)
+        return doc_ref.id, None
     except Exception as err:
-        logger.error(f"⚠️ Groq refinement error: {err}")
-        return None
+        logger.error(f"❌ Classification failed for {doc_ref.id}, left unclassified: {err}")
+        return doc_ref.id, None
+    merge_classification(doc_ref, text, geohash, hf_engine, timings)
+    logger.info("✅ Saved AI data to Firestore")
+    return doc_ref.id, hf_engine
 
 
-# --- 4. MAIN ROUTE ---
+# --- 5. MAIN ROUTE ---
 @app.route("/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "ok", "service": "grievance-backend"})
+    # Still 200 while a provider's circuit is open: submissions are served from the rule fallback
+    breakers = circuit_breaker.stats()
+    degraded = any(b["state"] != circuit_breaker.CLOSED for b in breakers.values())
+    return jsonify({
+        "status": "degraded" if degraded else "ok",
+        "service": "grievance-backend",
+        "circuitBreakers": breakers,
+    })
+
+@app.route("/runtime-stats", methods=["GET"])
+def runtime_stats():
+    return jsonify({
+        "submitMode": SUBMIT_MODE,
+        "writeStrategy": {"strategy": WRITE_STRATEGY, "paths": dict(write_paths)},
+        "queue": classification_queue.stats(),
+        "dedup": duplicate_index.stats() if duplicate_index is not None else None,
+        **pipeline.pipeline_stats(),
+    })
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    rendered = metrics.render()
+    if rendered is None:
+        return jsonify({"error": "prometheus_client is not installed"}), 503
+    body, content_type = rendered
+    return Response(body, content_type=content_type)
+
+@app.route("/stats", methods=["GET"])
+def grievance_stats_summary():
+    """Dashboard counts from the aggregate counters (no collection scan)."""
+    if db is None:
+        return jsonify({"error": "Firebase not initialized"}), 500
+    try:
+        days = max(1, min(int(request.args.get("days", 30)), 366))
+        top = max(1, min(int(request.args.get("topKeywords", 20)), 100))
+    except ValueError:
+        return jsonify({"error": "days and topKeywords must be integers"}), 400
+    try:
+        return jsonify(grievance_stats.summary(days=days, top_keywords=top))
+    except Exception as err:
+        logger.error(f"❌ Server error: {err}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+# Filters served by the composite indexes in firestore.indexes.json
+LIST_FILTERS = {"status": "status", "category": "hfEngine.category", "priority": "hfEngine.priority"}
+LIST_MAX_LIMIT = 100
+
+@app.route("/grievances", methods=["GET"])
+def list_grievances():
+    """Newest first, optionally filtered by status/category/priority; page with ?cursor=<nextCursor>."""
+    if db is None:
+        return jsonify({"error": "Firebase not initialized"}), 500
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), LIST_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        query = db.collection("grievances")
+        for param, field in LIST_FILTERS.items():
+            value = request.args.get(param)
+            if value:
+                query = query.where(field, "==", value.lower())
+        query = query.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
+
+        cursor = request.args.get("cursor")
+        if cursor:
+            cursor_snap = db.collection("grievances").document(cursor).get()
+            if not cursor_snap.exists:
+                return jsonify({"error": "Unknown cursor"}), 400
+            query = query.start_after(cursor_snap)
+
+        items = []
+        for snap in query.stream():
+            data = snap.to_dict() or {}
+            if hasattr(data.get("createdAt"), "isoformat"):
+                data["createdAt"] = data["createdAt"].isoformat()
+            items.append({"id": snap.id, **data})
+        return jsonify({"items": items, "nextCursor": items[-1]["id"] if len(items) == limit else None})
+    except Exception as err:
+        logger.error(f"❌ Server error: {err}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", 50))
+# Per-cell read cap, so a dense area cannot turn one request into thousands of reads
+NEARBY_CELL_LIMIT = int(os.getenv("NEARBY_CELL_LIMIT", 500))
+
+@app.route("/grievances/nearby", methods=["GET"])
+def nearby_grievances():
+    """Grievances within radiusKm of lat/lng, nearest first (geohash cell range queries + distance filter)."""
+    if db is None:
+        return jsonify({"error": "Firebase not initialized"}), 500
+    try:
+        lat, lng = float(request.args["lat"]), float(request.args["lng"])
+        radius_km = float(request.args.get("radiusKm", 1))
+        limit = max(1, min(int(request.args.get("limit", 50)), 200))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lng are required; radiusKm and limit must be numbers"}), 400
+    if not geo.valid_location(lat, lng) or not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return jsonify({"error": f"Invalid location or radiusKm (max {NEARBY_MAX_RADIUS_KM})"}), 400
+    # Read here: query_cell runs on worker threads, outside the request context
+    filters = {param: request.args.get(param, "").lower() for param in ("status", "category")}
+
+    def query_cell(cell):
+        low, high = geo.prefix_range(cell)
+        query = db.collection("grievances")
+        for param, field in LIST_FILTERS.items():
+            value = filters.get(param)
+            if value:
+                query = query.where(field, "==", value)
+        query = query.where("geohash", ">=", low).where("geohash", "<", high)
+        return list(query.limit(NEARBY_CELL_LIMIT).stream())
+
+    try:
+        cells = geo.neighbours(geo.encode(lat, lng, geo.precision_for_radius(radius_km, lat)))
+        pages = list(submit_executor.map(query_cell, cells))
+
+        items = []
+        for snap in (snap for page in pages for snap in page):
+            data = snap.to_dict() or {}
+            distance = geo.haversine_km(lat, lng, data.get("latitude", 0.0), data.get("longitude", 0.0))
+            if distance <= radius_km:
+                if hasattr(data.get("createdAt"), "isoformat"):
+                    data["createdAt"] = data["createdAt"].isoformat()
+                items.append({"id": snap.id, "distanceKm": round(distance, 3), **data})
+        items.sort(key=lambda item: item["distanceKm"])
+        return jsonify({
+            "items": items[:limit],
+            "cells": cells,
+            "truncated": any(len(page) >= NEARBY_CELL_LIMIT for page in pages),
+        })
+    except Exception as err:
+        logger.error(f"❌ Server error: {err}")
+        return jsonify({"error": "Internal Server Error"}), 500
 
 @app.route("/submit-grievance", methods=["POST"])
 def submit_grievance():
     if db is None:
         return jsonify({"error": "Firebase not initialized"}), 500
 
-    data = request.get_json()
-    title = data.get("title")
-    description = data.get("description")
-    user_id = data.get("userId")
-    # Capture Location Data
-    latitude = data.get("latitude")
-    longitude = data.get("longitude")
-
-    if not title or not description or not user_id:
-        return jsonify({"error": "Missing required fields: title, description, userId"}), 400
+    try:
+        new_grievance, text = build_grievance(request.get_json(silent=True))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
 
-    text = f"{title}\n{description}".strip()
+    if SUBMIT_MODE == "async" and classification_queue.is_full():
+        # Backpressure: refuse before writing anything so the client can retry later.
+        response = jsonify({"error": "Classification queue is full, please retry shortly."})
+        response.headers["Retry-After"] = "5"
+        return response, 503
 
     try:
-        # 1. Save raw grievance first
-        new_grievance = {
-            "title": title,
-            "description": description,
-            "userId": user_id,
-            "status": "open",
-            "createdAt": firestore.SERVER_TIMESTAMP,
-        }
-        
-        # Add location data if available (optional fields)
-        if latitude is not None and longitude is not None:
+        if SUBMIT_MODE == "async":
+            # Save the raw grievance, then hand classification to the background workers.
+            doc_ref = db.collection("grievances").document()
+            write_with_stats(doc_ref, new_grievance, submission_deltas())
+            job = {"docId": doc_ref.id, "text": text, "geohash": new_grievance.get("geohash")}
             try:
-                new_grievance["latitude"] = float(latitude)
-                new_grievance["longitude"] = float(longitude)
-            except (ValueError, TypeError):
-                logger.warning("Received invalid latitude/longitude data.")
-
-        # Firestore automatically adds the document ID
-        _, doc_ref = db.collection("grievances").add(new_grievance)
-        doc_id = doc_ref.id
-
-        # 2. HF/Rule-based Classification (FIRST LOGIC PASS)
-        cat_res = classify_category(text)
-        pri_res = classify_priority(text)
-
-        # 3. PRIORITY & CATEGORY DECISION LOGIC (HF/Keyword runs first)
-        hf_priority = "low"
-        sentiment_raw = pri_res.get("sentiment")
-        score = pri_res.get("sentimentScore")
-        sentiment = normalize_sentiment(sentiment_raw)
-        urgent_matches = find_urgent_matches(text)
-
-        if len(urgent_matches) > 0:
-            hf_priority = "high"
-        elif sentiment == "negative":
-            if score > 0.7: hf_priority = "high"
-            elif score > 0.35: hf_priority = "medium"
-        elif sentiment == "neutral":
-            if score > 0.6: hf_priority = "medium"
-
-        hf_category = cat_res.get("category", "other")
-        keyword_category = infer_category_from_keywords(text)
-        if keyword_category:
-            hf_category = keyword_category
-        
-        if hf_category == "sanitation" and hf_priority == "low":
-            hf_priority = "medium"
-            
-        hf_raw_label = cat_res.get("rawLabel", "other") # Keep raw label for refinement prompt
-
-        # 4. LLM Refinement (SECOND LOGIC PASS / WRAPPER)
-        groq_res = refine_with_groq(text, hf_category, hf_priority, hf_raw_label)
-
-        # 5. FINAL CLASSIFICATION (Prioritizes Groq refinement)
-        
-        if groq_res:
-            priority = groq_res.get("priority", hf_priority)
-            category = groq_res.get("category", hf_category)
-            ai_explanation = groq_res.get("explanation", "Refined by Groq LLM.")
+                classification_queue.submit(doc_ref.id, job)
+            except QueueFullError:
+                # Lost the race for the last slot (or shutdown started): classify inline rather than drop the job.
+                logger.warning(f"⚠️ Queue full, classifying {doc_ref.id} inline")
+                hf_engine = classify_and_merge(job)
+                return jsonify({
+                    "message": "Grievance submitted and analyzed successfully!",
+                    "grievanceId": doc_ref.id,
+                    "hfEngine": hf_engine,
+                })
+            return jsonify({
+                "message": "Grievance submitted, analysis pending.",
+                "grievanceId": doc_ref.id,
+                "hfEngine": {"status": "pending"},
+            }), 202
+
+        # Classification gets what is left of REQUEST_DEADLINE, measured from here
+        deadline = time.monotonic() + pipeline.REQUEST_DEADLINE
+        if WRITE_STRATEGY == "single":
+            doc_id, hf_engine = save_single_write(new_grievance, text, deadline)
         else:
-            # Fallback to the existing logic results if Groq fails
-            priority = hf_priority
-            category = hf_category
-            ai_explanation = (
-                f"Category '{category}' predicted from '{hf_raw_label}' "
-                f"(score: {float(cat_res.get('confidence', 0.0)):.2f}), "
-                f"Priority '{priority}' determined using sentiment ('{sentiment_raw}', "
-                f"score: {float(score):.2f}) and urgency keywords."
-            )
-        
-        is_urgent = priority == "high"
-        keywords = extract_keywords(text)
-
-        # 6. Build final hfEngine object
-        hf_engine = {
-            "category": category,
-            "priority": priority,
-            "isUrgent": is_urgent,
-            "keywords": keywords,
-            "explanation": ai_explanation,
-            
-            # Keep all model data for diagnostics
-            "rawCategoryLabel": hf_raw_label,
-            "categoryConfidence": float(cat_res.get("confidence", 0.0)),
-            "urgentMatches": urgent_matches,
-            "modelInfo": {
-                "categoryModel": CATEGORY_MODEL,
-                "priorityModel": PRIORITY_MODEL,
-                "sentimentLabel": sentiment_raw,
-                "sentimentScore": float(score),
-                "groqModel": GROQ_MODEL if groq_res else "None",
-                "hfCategory": hf_category,
-                "hfPriority": hf_priority,
-            },
-        }
-
-        # Update the document with AI results
-        db.collection("grievances").document(doc_id).set({"hfEngine": hf_engine}, merge=True)
-        logger.info("✅ Saved AI data to Firestore")
-
+            doc_id, hf_engine = save_two_phase(new_grievance, text, deadline)
+
+        if hf_engine is None:
+            # Saved, but not classified within the deadline
+            return jsonify({
+                "message": "Grievance submitted, analysis pending.",
+                "grievanceId": doc_id,
+                "hfEngine": {"status": "pending"},
+            })
         return jsonify({
             "message": "Grievance submitted and analyzed successfully!",
             "grievanceId": doc_id,
@@ -395,7 +554,130 @@ def submit_grievance():
         logger.error(f"❌ Server error: {err}")
         return jsonify({"error": "Internal Server Error"}), 500
 
+@app.route("/submit-grievances/batch", methods=["POST"])
+def submit_grievances_batch():
+    """
+    Bulk submission: a JSON array or NDJSON body of grievances.
+
+    All items are validated before anything is written; the raw documents are
+    saved with batched commits, then classified together (Groq refinement in
+    GROQ_BATCH_SIZE chunks) and one NDJSON line per item is streamed back as it
+    completes, followed by a summary line.
+    """
+    if db is None:
+        return jsonify({"error": "Firebase not initialized"}), 500
+
+    try:
+        items = parse_batch_body(request)
+    except ValueError as err:
+        return jsonify({"error": f"Invalid JSON/NDJSON body: {err}"}), 400
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of grievances"}), 400
+    if len(items) > BATCH_SUBMIT_MAX_ITEMS:
+        return jsonify({"error": f"Batch too large: {len(items)} items (limit {BATCH_SUBMIT_MAX_ITEMS})"}), 413
+
+    grievances, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            grievances.append(build_grievance(item))
+        except ValueError as err:
+            errors.append({"index": index, "error": str(err)})
+    if errors:
+        return jsonify({"error": "Validation failed, nothing was saved", "items": errors}), 400
+
+    try:
+        # Pre-allocate document IDs so the raw writes can go out as batched commits
+        collection = db.collection("grievances")
+        doc_refs = [collection.document() for _ in grievances]
+        for start in range(0, len(doc_refs), FIRESTORE_BATCH_LIMIT):
+            chunk = doc_refs[start:start + FIRESTORE_BATCH_LIMIT]
+            writes = [
+                (doc_ref, new_grievance, False)
+                for doc_ref, (new_grievance, _) in zip(chunk, grievances[start:start + FIRESTORE_BATCH_LIMIT])
+            ]
+            commit_with_stats(writes, merge_deltas(*(submission_deltas() for _ in chunk)), "firestoreBatchAdd")
+        logger.info(f"✅ Saved {len(doc_refs)} raw grievances in a batch")
+    except Exception as err:
+        logger.error(f"❌ Server error: {err}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+    def generate():
+        analyzed = 0
+        writes, deltas = [], {}
+
+        def flush():
+            commit_with_stats(writes, deltas, "firestoreBatchMerge")
+
+        try:
+            # Near-duplicates of open grievances are answered first, without inference
+            reused = {}
+            if duplicate_index is not None:
+                for index, (new_grievance, text) in enumerate(grievances):
+                    match = find_open_duplicate(text, new_grievance.get("geohash"))
+                    if match:
+                        reused[index] = reuse_classification(match, text)
+            to_classify = [index for index in range(len(grievances)) if index not in reused]
+            classified = grievance_pipeline.iter_many(
+                [grievances[index][1] for index in to_classify],
+                concurrency=BATCH_SUBMIT_CONCURRENCY,
+                groq_batch_size=pipeline.GROQ_BATCH_SIZE,
+            )
+            results = itertools.chain(
+                reused.items(), ((to_classify[position], hf_engine) for position, hf_engine in classified)
+            )
+            for index, hf_engine in results:
+                line = {"index": index, "grievanceId": doc_refs[index].id}
+                if hf_engine is None:
+                    # Raw document stays saved; tools/recategorize.py --only-missing picks it up
+                    line["error"] = "Classification failed"
+                else:
+                    writes.append((doc_refs[index], classification_fields(hf_engine), True))
+                    add_deltas(deltas, classification_deltas(hf_engine))
+                    analyzed += 1
+                    line["hfEngine"] = hf_engine
+                    new_grievance, text = grievances[index]
+                    index_grievance(doc_refs[index].id, text, new_grievance.get("geohash"), hf_engine)
+                    if len(writes) >= FIRESTORE_BATCH_LIMIT:
+                        flush()
+                        writes, deltas = [], {}
+                yield json.dumps(line) + "\n"
+        finally:
+            # AI results are merged with one commit at the end (or when the batch fills)
+            if writes:
+                flush()
+            logger.info(f"✅ Saved AI data for {analyzed}/{len(doc_refs)} batch grievances")
+        yield json.dumps({"done": True, "submitted": len(doc_refs), "analyzed": analyzed}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# --- 6. Lifecycle ---
+def start_background_work():
+    """Warm clients and start background threads. Runs once per serving process (in each worker under gunicorn)."""
+    pipeline.warm_up()
+    if SUBMIT_MODE == "async":
+        classification_queue.start()
+    if duplicate_index is not None and db is not None:
+        threading.Thread(
+            target=duplicate_index.keep_synced, args=(db, DEDUP_SYNC_INTERVAL, DEDUP_SYNC_OVERLAP),
+            name="dedup-sync", daemon=True,
+        ).start()
+
+
+def stop_background_work(timeout=None):
+    """Graceful shutdown: finish the classifications already queued (async mode)."""
+    if SUBMIT_MODE == "async":
+        logger.info(f"⏳ Draining classification queue ({classification_queue.stats()['depth']} queued)")
+        classification_queue.shutdown(timeout=timeout)
+    submit_executor.shutdown(wait=False)
+    firestore_executor.shutdown(wait=False)
+
+
+# gunicorn.conf.py calls these from its worker hooks, after the fork
+if os.getenv("GUNICORN_MANAGED") != "1":
+    start_background_work()
+
 # --- 7. Start Server ---
+# Development only; production runs gunicorn with backend/gunicorn.conf.py
 if __name__ == "__main__":
     PORT = int(os.getenv("PORT", 5000))
-    app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=PORT, debug=os.getenv("FLASK_DEBUG", "1") == "1")
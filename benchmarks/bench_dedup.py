@@ -0,0 +1,66 @@
+# benchmarks/bench_dedup.py
+"""
+Near-duplicate lookup latency vs index size (--dedup-sizes), unscoped and
+scoped by geohash cell. Each round looks up lightly edited copies of indexed
+texts (should match) and fresh texts (should not); the match and false-match
+rates are stored in extra_info.
+"""
+import random
+
+import pytest
+
+import geo
+from dedup import DuplicateIndex
+
+VOCABULARY = (
+    "water pipe burst leak supply drainage sewage overflow garbage dump collection street light pole "
+    "pothole road crack footpath traffic signal school hospital clinic doctor medicine power outage "
+    "voltage transformer cable stray dogs park tree fallen market bus stop noise pollution smoke "
+    "flooding rain tank contamination bribe office certificate delay staff rude ambulance fire"
+).split()
+HF_ENGINE = {"category": "water", "priority": "high", "keywords": [], "modelInfo": {}}
+LOOKUPS_PER_ROUND = 200
+
+
+def random_text(rng, words=18):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def edit(rng, text, changes=2):
+    words = text.split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+def random_geohash(rng):
+    return geo.encode(rng.uniform(12.8, 13.2), rng.uniform(77.4, 77.8))
+
+
+@pytest.mark.parametrize("scope_precision", [None, 6], ids=["unscoped", "scoped"])
+def bench_dedup_lookup(benchmark, dedup_size, scope_precision):
+    rng = random.Random(dedup_size)
+    index = DuplicateIndex(scope_precision=scope_precision, max_entries=dedup_size + 1)
+    docs = [(random_text(rng), random_geohash(rng)) for _ in range(dedup_size)]
+    for i, (text, cell) in enumerate(docs):
+        index.add(f"doc-{i}", text, cell, HF_ENGINE)
+
+    queries = []
+    for i in range(LOOKUPS_PER_ROUND):
+        if i % 2 == 0:
+            text, cell = docs[rng.randrange(dedup_size)]
+            queries.append((edit(rng, text), cell, True))
+        else:
+            queries.append((random_text(rng), random_geohash(rng), False))
+
+    def lookup_all():
+        return [(index.lookup(text, cell) is not None, duplicate) for text, cell, duplicate in queries]
+
+    outcomes = benchmark(lookup_all)
+
+    half = LOOKUPS_PER_ROUND / 2
+    benchmark.extra_info.update({
+        "lookupUs": round(benchmark.stats.stats.mean / LOOKUPS_PER_ROUND * 1e6, 1),
+        "matchRate": round(sum(hit for hit, duplicate in outcomes if duplicate) / half, 3),
+        "falseMatchRate": round(sum(hit for hit, duplicate in outcomes if not duplicate) / half, 3),
+    })
@@ -0,0 +1,60 @@
+# benchmarks/bench_hf_batching.py
+"""
+classify_category with and without HF micro-batching (HF_MICRO_BATCH) at
+1/8/32/64 concurrent callers (--hf-batch-concurrency). The fake HF charges
+--hf-per-item-ms per extra input in a batch. Each round classifies
+CALLS_PER_CALLER fresh texts per caller; extra_info has the throughput, the
+callers' p50/p95 latency (queueing included) and the mean batch size.
+"""
+import itertools
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pipeline
+
+CALLS_PER_CALLER = 8
+_counter = itertools.count()
+
+
+def classify_all(texts, callers):
+    def timed(text):
+        started = time.perf_counter()
+        pipeline.classify_category(text)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        return list(executor.map(timed, texts))
+
+
+@pytest.mark.parametrize("batched", [False, True], ids=["single", "batched"])
+def bench_classify_category(benchmark, fake_providers, monkeypatch, callers, batched):
+    monkeypatch.setattr(pipeline, "HF_MICRO_BATCH", batched)
+    size = callers * CALLS_PER_CALLER
+    before = pipeline.get_hf_batcher(pipeline.CATEGORY_MODEL).stats() if batched else None
+    latencies = []
+
+    def run(texts):
+        latencies.extend(classify_all(texts, callers))
+
+    def setup():
+        return ([f"Water pipe burst near market road {next(_counter)}, no water supply." for _ in range(size)],), {}
+
+    benchmark.pedantic(run, setup=setup, rounds=3, iterations=1)
+
+    latencies.sort()
+    benchmark.extra_info.update({
+        "itemsPerSecond": round(size / benchmark.stats.stats.mean, 1),
+        "p50Ms": round(statistics.median(latencies) * 1000, 1),
+        "p95Ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    })
+    if batched:
+        after = pipeline.get_hf_batcher(pipeline.CATEGORY_MODEL).stats()
+        batches = after["batches"] - before["batches"]
+        assert after["errors"] == before["errors"], after
+        benchmark.extra_info.update({
+            "meanBatchSize": round((after["items"] - before["items"]) / batches, 2) if batches else None,
+            "batchLimit": after["batchLimit"],
+        })
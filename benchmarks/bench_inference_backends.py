@@ -0,0 +1,77 @@
+# benchmarks/bench_inference_backends.py
+"""
+classify_category + classify_priority per grievance on the remote backend (the
+fake HF server) and the local CPU engine, at several client concurrency levels
+(--inference-concurrency). The local engine needs `transformers` plus
+`optimum[onnxruntime]` (or `torch`) and is skipped without them; its runtime
+comes from LOCAL_INFERENCE_RUNTIME.
+"""
+import itertools
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pipeline
+
+SAMPLES = [
+    "No water supply in our street for three days, please fix immediately.",
+    "Huge pothole on the main road near the school is causing accidents.",
+    "Streetlights have not been working for a week and the area is unsafe at night.",
+    "Garbage has not been collected and the drain is overflowing with sewage.",
+    "The primary health centre has no medicines and the doctor is always absent.",
+    "The ward office staff asked for a bribe to process my birth certificate.",
+    "Stray dogs near the park are chasing children.",
+    "Power cuts every evening with voltage fluctuations damaging appliances.",
+]
+REQUESTS_PER_ROUND = 32
+
+_counter = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def local_engine():
+    pytest.importorskip("transformers")
+    from local_inference import LocalInferenceEngine
+
+    engine = LocalInferenceEngine(
+        pipeline.CATEGORY_MODEL, pipeline.PRIORITY_MODEL,
+        runtime=os.getenv("LOCAL_INFERENCE_RUNTIME", "onnx"),
+    )
+    engine.load()
+    return engine
+
+
+def classify_one(text):
+    started = time.perf_counter()
+    pipeline.classify_category(text)
+    pipeline.classify_priority(text)
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize("backend", ["remote", "local"])
+def bench_inference_backend(benchmark, request, fake_providers, monkeypatch, backend, inference_concurrency):
+    engine = request.getfixturevalue("local_engine") if backend == "local" else None
+    monkeypatch.setattr(pipeline, "_local_engine", engine)
+    if engine is not None:
+        classify_one(SAMPLES[0])  # warm-up
+    latencies = []
+
+    def run(texts):
+        with ThreadPoolExecutor(max_workers=inference_concurrency) as executor:
+            latencies.extend(executor.map(classify_one, texts))
+
+    def setup():
+        # Fresh texts every round, so nothing is served from caches
+        return ([f"{SAMPLES[i % len(SAMPLES)]} (#{next(_counter)})" for i in range(REQUESTS_PER_ROUND)],), {}
+
+    benchmark.pedantic(run, setup=setup, rounds=3, iterations=1)
+
+    latencies.sort()
+    benchmark.extra_info.update({
+        "itemsPerSecond": round(REQUESTS_PER_ROUND / benchmark.stats.stats.mean, 1),
+        "p50Ms": round(statistics.median(latencies) * 1000, 1),
+        "p95Ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    })
@@ -0,0 +1,60 @@
+# benchmarks/bench_recategorize.py
+"""
+tools/recategorize.py over 1k/10k/100k seeded grievances (--recategorize-sizes),
+with Firestore on the emulator and fake HF/Groq. One round per size: the
+collection is wiped and re-seeded before it, outside the measured time.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+SEED_BATCH = 500
+TEMPLATES = (
+    "Water pipe burst near {place}, no water since morning.",
+    "Huge pothole on the road outside {place}, two bikes fell yesterday.",
+    "Street lights not working around {place} for a week.",
+    "Garbage has not been collected near {place}, drains are overflowing.",
+    "The clinic at {place} has no doctor and no medicines.",
+)
+PLACES = ("the market", "bus stand", "school", "temple", "park", "hospital", "railway gate")
+
+
+@pytest.fixture(scope="module")
+def recategorize(firestore_emulator):
+    import recategorize as module
+
+    return module
+
+
+def seed(db, size, rng):
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    batch = db.batch()
+    for i in range(size):
+        batch.set(db.collection("grievances").document(f"bench-{i:06d}"), {
+            "title": "Bench grievance",
+            "description": f"{rng.choice(TEMPLATES).format(place=rng.choice(PLACES))} Ref {i}.",
+            "userId": "bench-user",
+            "status": "open",
+            "createdAt": start + timedelta(seconds=i),
+        })
+        if (i + 1) % SEED_BATCH == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+
+
+def bench_recategorize_all(benchmark, fake_providers, firestore_emulator, recategorize, recategorize_size):
+    rng = random.Random(recategorize_size)
+
+    def setup():
+        firestore_emulator()
+        seed(recategorize.db, recategorize_size, rng)
+
+    counts = benchmark.pedantic(
+        recategorize.recategorize_all,
+        kwargs={"concurrency": 16, "page_size": 500, "checkpoint_path": None},
+        setup=setup, rounds=1, iterations=1,
+    )
+    benchmark.extra_info["docsPerSecond"] = round(recategorize_size / benchmark.stats.stats.mean, 1)
+    assert counts["written"] == recategorize_size, counts
@@ -0,0 +1,55 @@
+# benchmarks/bench_request_path.py
+"""
+The submit path end to end: the classification pipeline alone (fake HF/Groq),
+then POST /submit-grievance through Flask with Firestore on the emulator, with
+a location (geohash write) and with near-duplicate reuse on and off.
+"""
+import itertools
+
+import pytest
+
+from pipeline import grievance_pipeline
+
+_counter = itertools.count()
+
+
+def grievance_text():
+    # A fresh text per call, so nothing is served from caches along the way
+    return f"Water pipe burst near market road {next(_counter)}, no water supply since morning."
+
+
+def bench_pipeline_run(benchmark, fake_providers):
+    hf_engine = benchmark(lambda: grievance_pipeline.run(grievance_text()))
+    assert hf_engine["modelInfo"]["groqModel"] != "None", "Groq refinement did not reach the fake"
+
+
+@pytest.fixture(scope="module")
+def client(firestore_emulator):
+    import server
+
+    assert server.db is not None, "Firestore client did not initialise against the emulator"
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("dedup", [False, True], ids=["classified", "dedup"])
+def bench_submit_grievance(benchmark, fake_providers, monkeypatch, client, dedup):
+    """With a location the write gets a geohash; with dedup, repeats of one report reuse its classification."""
+    import server
+    from dedup import DuplicateIndex
+
+    if dedup:
+        monkeypatch.setattr(server, "duplicate_index", DuplicateIndex())
+
+    def submit():
+        return client.post("/submit-grievance", json={
+            "title": "Water pipe burst",
+            "description": grievance_text(),
+            "userId": "bench-user",
+            "latitude": 12.97,
+            "longitude": 77.59,
+        })
+
+    response = benchmark(submit)
+    assert response.status_code == 200, response.get_json()
+    if dedup:
+        assert "duplicateOf" in response.get_json()["hfEngine"], "near-duplicates were not matched"
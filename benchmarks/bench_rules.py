@@ -0,0 +1,104 @@
+# benchmarks/bench_rules.py
+"""Rule helpers that run on every submission before any model call, and how keyword matching scales with the rule tables."""
+import random
+import string
+
+import pytest
+
+from keyword_rules import KeywordMatcher
+from pipeline import SANITATION_KEYWORDS, URGENT_KEYWORDS, extract_keywords, find_urgent_matches
+
+SHORT = "Water pipe burst near the market, no water since morning. Urgent!"
+LONG = " ".join([
+    "The drainage on our street has been overflowing for two weeks and sewage is entering houses.",
+    "Garbage collection has not happened either, the smell is unbearable and children are falling sick.",
+    "We complained at the ward office several times but the staff keep delaying the matter.",
+    "Street lights are also not working so the flooded road is dangerous at night.",
+] * 10)
+TEXTS = {"short": SHORT, "long": LONG}
+
+
+@pytest.mark.parametrize("size", TEXTS)
+def bench_extract_keywords(benchmark, size):
+    keywords = benchmark(extract_keywords, TEXTS[size])
+    assert keywords
+
+
+@pytest.mark.parametrize("size", TEXTS)
+def bench_find_urgent_matches(benchmark, size):
+    benchmark(find_urgent_matches, TEXTS[size])
+
+
+# Linear `k in lower` scans vs the compiled KeywordMatcher, with the urgent and
+# sanitation tables padded with synthetic keywords to 10x and 100x their size
+RULE_TEXTS = [
+    "Water pipe burst near the market, no water since morning. Please fix immediately.",
+    "Garbage has not been collected for a week and the drain is overflowing.",
+    "Streetlight not working on 4th cross road, it is dangerous at night.",
+    "The clinic staff were rude and asked for money for free medicines.",
+]
+
+
+def padded_rules(words, factor, rng):
+    padded = list(words)
+    while len(padded) < len(words) * factor:
+        n = rng.randint(1, 2)
+        padded.append(" ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(n)))
+    return padded
+
+
+def linear_scan(text, urgent, sanitation):
+    lower = text.lower()
+    urgent_hits = [k for k in urgent if k in lower]
+    category = "sanitation" if any(k in lower for k in sanitation) else None
+    return urgent_hits, category
+
+
+@pytest.mark.parametrize("factor", [1, 10, 100], ids=["1x", "10x", "100x"])
+@pytest.mark.parametrize("approach", ["linear", "compiled"])
+def bench_keyword_rules(benchmark, approach, factor):
+    rng = random.Random(7)
+    urgent = padded_rules(URGENT_KEYWORDS, factor, rng)
+    sanitation = padded_rules(SANITATION_KEYWORDS, factor, rng)
+    if approach == "compiled":
+        match = KeywordMatcher(urgent, {"sanitation": sanitation}).match
+    else:
+        def match(text):
+            return linear_scan(text, urgent, sanitation)
+
+    benchmark(lambda: [match(text) for text in RULE_TEXTS])
+    benchmark.extra_info["rules"] = len(urgent) + len(sanitation)
+
+
+# Overlapping and prefix keywords across and within tables: the matcher must report what the
+# old substring scan did (word boundaries aside), or urgent hits and category counts are lost
+OVERLAP_URGENT = ["no water", "fire", "burst", "flood"]
+OVERLAP_CATEGORIES = {
+    "water": ["no water supply", "water", "pipe", "pipe burst"],
+    "electricity": ["fire hazard", "short circuit"],
+}
+OVERLAP_TEXTS = [
+    "There is no water supply in our lane.",
+    "Exposed wires are a fire hazard, there was a short circuit.",
+    "The pipe burst last night and the road is flooded with water.",
+    "Pipe burst again; no water supply since the fire.",
+]
+
+
+def substring_scan(text):
+    lower = text.lower()
+    return {
+        "urgent": [k for k in OVERLAP_URGENT if k in lower],
+        "categories": {c: sorted(k for k in kws if k in lower) for c, kws in OVERLAP_CATEGORIES.items()
+                       if any(k in lower for k in kws)},
+    }
+
+
+@pytest.mark.parametrize("index", range(len(OVERLAP_TEXTS)))
+def bench_keyword_matcher_overlaps(benchmark, index):
+    text = OVERLAP_TEXTS[index]
+    hits = benchmark(KeywordMatcher(OVERLAP_URGENT, OVERLAP_CATEGORIES).match, text)
+    # "flood" is a substring of "flooded" only; the matcher keeps to whole words on purpose
+    expected = substring_scan(text)
+    expected["urgent"] = [k for k in expected["urgent"] if k != "flood"]
+    assert {"urgent": hits["urgent"], "categories": {c: sorted(k) for c, k in hits["categories"].items()}} == expected
@@ -0,0 +1,47 @@
+# benchmarks/bench_submit_stubbed.py
+"""
+POST /submit-grievance with HF, Groq and Firestore replaced by sleep-based
+stubs (tools/stub_backends.py), so the numbers reflect request orchestration:
+the old sequential flow (every stage inline) against the concurrent stages.
+Needs no emulator. Stub latencies come from --stub-hf-ms, --stub-groq-ms and
+--stub-firestore-ms.
+"""
+import pytest
+
+PAYLOAD = {
+    "title": "Water pipe burst",
+    "description": "A pipe burst near the market and there is no water since morning.",
+    "userId": "bench-user",
+    "latitude": 12.97,
+    "longitude": 77.59,
+}
+
+
+@pytest.fixture
+def stubbed_client(pytestconfig, monkeypatch):
+    import server
+    from stub_backends import install_stubs
+
+    install_stubs(
+        pytestconfig.getoption("--stub-hf-ms"),
+        pytestconfig.getoption("--stub-groq-ms"),
+        pytestconfig.getoption("--stub-firestore-ms"),
+        setattr=monkeypatch.setattr,
+    )
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("flow", ["sequential", "concurrent"])
+def bench_submit_stubbed(benchmark, monkeypatch, stubbed_client, flow):
+    import pipeline
+    import server
+    from stub_backends import SerialExecutor
+
+    if flow == "sequential":
+        monkeypatch.setattr(pipeline, "inference_executor", SerialExecutor())
+        monkeypatch.setattr(server, "firestore_executor", SerialExecutor())
+
+    response = benchmark.pedantic(
+        lambda: stubbed_client.post("/submit-grievance", json=PAYLOAD), rounds=10, iterations=1,
+    )
+    assert response.status_code == 200, response.get_json()
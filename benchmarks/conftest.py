@@ -0,0 +1,121 @@
+# benchmarks/conftest.py
+"""
+pytest-benchmark suite for the rule helpers, near-duplicate lookups, the
+submit request path (stubbed and end to end), the inference backends, HF
+micro-batching and bulk recategorization, run against tools/fake_providers.py
+instead of the paid HF and Groq APIs. Benchmarks that touch Firestore need the
+emulator and are skipped without it.
+
+    pip install -r benchmarks/requirements.txt
+    firebase emulators:start --only firestore --project demo-grievance   # optional
+    cd benchmarks
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 pytest --provider-latency-ms 50
+
+Every run is saved under benchmarks/.benchmarks (--benchmark-autosave, tagged
+with the commit); compare against an earlier one with e.g.
+`pytest --benchmark-compare=0001 --benchmark-compare-fail=median:10%`.
+"""
+import os
+import sys
+
+import pytest
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCH_DIR, "..", "backend"))
+sys.path.append(os.path.join(BENCH_DIR, "..", "tools"))
+
+EMULATOR_PROJECT = "demo-grievance"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("grievance benchmarks")
+    group.addoption("--provider-latency-ms", type=float, default=50, help="fake HF/Groq response latency")
+    group.addoption("--provider-error-rate", type=float, default=0, help="fraction of fake responses that are 500s")
+    group.addoption("--hf-per-item-ms", type=float, default=5,
+                    help="extra fake HF latency per input after the first in a batched request")
+    group.addoption("--hf-capacity", type=int, default=4,
+                    help="fake HF requests served at once, like a model server with a few replicas (0 = unlimited)")
+    group.addoption("--hf-batch-concurrency", default="1,8,32,64",
+                    help="comma-separated caller counts for bench_hf_batching.py")
+    group.addoption("--recategorize-sizes", default="1000,10000,100000",
+                    help="comma-separated document counts for bench_recategorize.py")
+    group.addoption("--dedup-sizes", default="1000,10000",
+                    help="comma-separated index sizes for bench_dedup.py")
+    group.addoption("--inference-concurrency", default="1,4,16",
+                    help="comma-separated caller counts for bench_inference_backends.py")
+    group.addoption("--stub-hf-ms", type=float, default=300, help="stub HF latency in bench_submit_stubbed.py")
+    group.addoption("--stub-groq-ms", type=float, default=400, help="stub Groq latency in bench_submit_stubbed.py")
+    group.addoption("--stub-firestore-ms", type=float, default=80,
+                    help="stub Firestore latency in bench_submit_stubbed.py")
+
+
+def pytest_configure(config):
+    """Start the fake providers and point the backend at them before any backend module is imported."""
+    import fake_providers
+
+    behaviour = dict(
+        latency_ms=config.getoption("--provider-latency-ms"),
+        error_rate=config.getoption("--provider-error-rate"),
+    )
+    config.fake_providers = fake_providers.start(
+        hf=fake_providers.Behaviour(**behaviour, per_item_ms=config.getoption("--hf-per-item-ms"),
+                                     capacity=config.getoption("--hf-capacity")),
+        groq=fake_providers.Behaviour(**behaviour),
+    )
+    os.environ.update({
+        "HF_BASE_URL": config.fake_providers.url,
+        "HF_API_TOKEN": "fake",
+        "GROQ_BASE_URL": config.fake_providers.url,
+        "GROQ_API_KEY": "fake",
+        # Repeated texts must reach the fakes, not the inference cache
+        "INFERENCE_CACHE_SIZE": "0",
+        "INFERENCE_BACKEND": "remote",
+        "SUBMIT_MODE": "sync",
+        "DEDUP_ENABLED": "false",
+        "GUNICORN_MANAGED": "1",  # no background threads at `import server`
+        "GOOGLE_CLOUD_PROJECT": os.getenv("GOOGLE_CLOUD_PROJECT", EMULATOR_PROJECT),
+    })
+    os.environ.pop("INFERENCE_CACHE_PATH", None)
+
+
+def pytest_unconfigure(config):
+    server = getattr(config, "fake_providers", None)
+    if server is not None:
+        server.shutdown()
+
+
+def pytest_generate_tests(metafunc):
+    if "recategorize_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--recategorize-sizes").split(",") if s]
+        metafunc.parametrize("recategorize_size", sizes, ids=[f"{s}docs" for s in sizes])
+    if "callers" in metafunc.fixturenames:
+        levels = [int(s) for s in metafunc.config.getoption("--hf-batch-concurrency").split(",") if s]
+        metafunc.parametrize("callers", levels, ids=[f"{n}callers" for n in levels])
+    if "inference_concurrency" in metafunc.fixturenames:
+        levels = [int(s) for s in metafunc.config.getoption("--inference-concurrency").split(",") if s]
+        metafunc.parametrize("inference_concurrency", levels, ids=[f"{n}callers" for n in levels])
+    if "dedup_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--dedup-sizes").split(",") if s]
+        metafunc.parametrize("dedup_size", sizes, ids=[f"{s}entries" for s in sizes])
+
+
+@pytest.fixture(scope="session")
+def fake_providers(pytestconfig):
+    return pytestconfig.fake_providers
+
+
+@pytest.fixture(scope="session")
+def firestore_emulator():
+    """Returns a function that wipes the emulator's database; skips when no emulator is configured."""
+    host = os.getenv("FIRESTORE_EMULATOR_HOST")
+    if not host:
+        pytest.skip("FIRESTORE_EMULATOR_HOST is not set (firebase emulators:start --only firestore)")
+    url = (f"http://{host}/emulator/v1/projects/{os.environ['GOOGLE_CLOUD_PROJECT']}"
+           f"/databases/(default)/documents")
+
+    def clear():
+        requests.delete(url, timeout=30).raise_for_status()
+
+    clear()
+    return clear
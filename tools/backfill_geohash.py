@@ -0,0 +1,49 @@
+# tools/backfill_geohash.py
+"""
+Add the `geohash` field to grievances saved before it was computed at write time.
+
+Usage:
+    python tools/backfill_geohash.py [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+import geo  # noqa: E402
+from firestore_util import init_db, iter_pages  # noqa: E402
+
+
+def backfill(db, dry_run=False, page_size=400):
+    query = db.collection("grievances").select(["latitude", "longitude", "geohash"]).order_by("__name__")
+    updated = scanned = 0
+    for page in iter_pages(query, page_size):
+        batch, pending = db.batch(), 0
+        for snap in page:
+            data = snap.to_dict() or {}
+            lat, lng = data.get("latitude"), data.get("longitude")
+            if data.get("geohash") or lat is None or lng is None or not geo.valid_location(lat, lng):
+                continue
+            batch.update(snap.reference, {"geohash": geo.encode(lat, lng)})
+            pending += 1
+        if pending and not dry_run:
+            batch.commit()
+        updated += pending
+        scanned += len(page)
+    return scanned, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    scanned, updated = backfill(init_db(), dry_run=args.dry_run)
+    logger.info(f"✅ Scanned {scanned} grievances, {'would update' if args.dry_run else 'updated'} {updated}")
+
+
+if __name__ == "__main__":
+    main()
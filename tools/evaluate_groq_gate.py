@@ -0,0 +1,103 @@
+# tools/evaluate_groq_gate.py
+"""
+Offline evaluator for the Groq gating policy (GROQ_GATE_MODE=gated).
+
+Replays stored hfEngine records that were refined by Groq and, for each
+threshold combination, reports how many Groq calls the gate would skip, the
+latency and cost saved, and how often the skipped items' rule/HF result
+(hfCategory/hfPriority) agrees with the full Groq refinement.
+
+Usage:
+    python tools/evaluate_groq_gate.py --confidence 0.6,0.7,0.8,0.9 --sentiment 0.6,0.8
+"""
+import argparse
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from pipeline import GroqGatePolicy, match_rules, category_from_rule_hits, map_label_to_key  # noqa: E402
+from firestore_util import init_db, iter_collection  # noqa: E402
+
+
+def load_records(db, page_size=500, limit=None):
+    """Stream hfEngine records where Groq actually ran (those carry the ground truth)."""
+    query = db.collection("grievances").select(["title", "description", "hfEngine"]).order_by("__name__")
+    records = []
+    for snap in iter_collection(query, page_size):
+        data = snap.to_dict() or {}
+        engine = data.get("hfEngine") or {}
+        info = engine.get("modelInfo") or {}
+        if info.get("groqModel") in (None, "None") or "hfCategory" not in info:
+            continue
+        text = f"{data.get('title', '')}\n{data.get('description', '')}".strip()
+        records.append({
+            "categoryConfidence": float(engine.get("categoryConfidence", 0.0)),
+            "sentimentScore": float(info.get("sentimentScore", 0.0)),
+            "urgentMatches": engine.get("urgentMatches") or [],
+            "keywordCategory": category_from_rule_hits(match_rules(text)),
+            "modelCategory": map_label_to_key(engine.get("rawCategoryLabel")),
+            "hf": (info.get("hfCategory"), info.get("hfPriority")),
+            "final": (engine.get("category"), engine.get("priority")),
+            "groqMs": (info.get("stageTimingsMs") or {}).get("groq"),
+        })
+        if limit and len(records) >= limit:
+            break
+    return records
+
+
+def evaluate(records, policy, default_groq_ms, tokens_per_call, price_per_1k):
+    skipped = agree = 0
+    saved_ms = 0.0
+    for r in records:
+        refine, _ = policy.decide(
+            r["categoryConfidence"], r["sentimentScore"], r["urgentMatches"], r["keywordCategory"], r["modelCategory"]
+        )
+        if refine:
+            continue
+        skipped += 1
+        saved_ms += r["groqMs"] if r["groqMs"] is not None else default_groq_ms
+        agree += r["hf"] == r["final"]
+    n = len(records)
+    return {
+        "skipRate": skipped / n if n else 0.0,
+        # Refined items match full refinement by definition; only skipped items can disagree
+        "agreement": (n - skipped + agree) / n if n else 1.0,
+        "skippedAgreement": agree / skipped if skipped else None,
+        "savedMsPerRequest": saved_ms / n if n else 0.0,
+        "savedCost": skipped * tokens_per_call / 1000 * price_per_1k,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--confidence", default="0.5,0.6,0.7,0.8,0.9", help="min category confidence values")
+    parser.add_argument("--sentiment", default="0.6,0.8", help="min sentiment score values")
+    parser.add_argument("--no-agreement", action="store_true", help="do not require keyword/model agreement")
+    parser.add_argument("--groq-ms", type=float, default=800,
+                        help="Groq latency assumed when a record has no stored stage timing (default: 800)")
+    parser.add_argument("--tokens-per-call", type=int, default=450, help="average Groq tokens per refinement")
+    parser.add_argument("--price-per-1k", type=float, default=0.0002, help="Groq price per 1k tokens")
+    parser.add_argument("--limit", type=int, help="evaluate at most this many records")
+    args = parser.parse_args()
+
+    records = load_records(init_db(), limit=args.limit)
+    logger.info(f"📌 {len(records)} Groq-refined records")
+    if not records:
+        return
+
+    print(f"{'minConf':>8}{'minSent':>9}{'skip%':>8}{'agree%':>8}{'skipAgree%':>12}{'saved ms/req':>14}{'saved $':>10}")
+    for conf in (float(c) for c in args.confidence.split(",")):
+        for sent in (float(s) for s in args.sentiment.split(",")):
+            policy = GroqGatePolicy("gated", conf, sent, require_agreement=not args.no_agreement)
+            r = evaluate(records, policy, args.groq_ms, args.tokens_per_call, args.price_per_1k)
+            skip_agree = f"{100 * r['skippedAgreement']:.1f}" if r["skippedAgreement"] is not None else "-"
+            print(f"{conf:>8.2f}{sent:>9.2f}{100 * r['skipRate']:>8.1f}{100 * r['agreement']:>8.1f}"
+                  f"{skip_agree:>12}{r['savedMsPerRequest']:>14.1f}{r['savedCost']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
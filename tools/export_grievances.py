@@ -0,0 +1,340 @@
+# tools/export_grievances.py
+"""
+Export grievances to local Parquet or gzipped NDJSON files for analytics.
+
+The collection is streamed page by page in createdAt order, so memory stays at
+one page (plus one Parquet row group). hfEngine fields are flattened into
+columns: category, priority, isUrgent, categoryConfidence, sentiment,
+sentimentScore, keywords, urgentMatches, duplicateOf, groqRefined and
+pipelineVersion.
+
+A manifest (_manifest.json) in the output directory lists the files and the
+createdAt watermark. By default a run only exports grievances created after the
+watermark; --full re-exports everything and replaces the old files. Rows are
+snapshots: status changes and re-classifications of grievances that were already
+exported only show up after a --full export. Grievances newer than --lag seconds
+are left for the next run, so documents still being classified are not exported
+half-done.
+
+Parquet needs pyarrow (pip install pyarrow); without it use --format ndjson.
+The query subcommand reads only the files listed in the manifest, never Firestore.
+
+Usage:
+    python tools/export_grievances.py export --out exports/grievances [--format parquet|ndjson] [--full]
+    python tools/export_grievances.py query --dir exports/grievances --where status=open --group-by category
+    python tools/export_grievances.py query --dir exports/grievances --since 2025-01-01 --columns id,category --limit 20
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from firestore_util import init_db, iter_pages
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = "_manifest.json"
+EXTENSIONS = {"parquet": ".parquet", "ndjson": ".ndjson.gz"}
+
+# (column, type) of every exported row, in file order
+COLUMNS = (
+    ("id", "string"),
+    ("title", "string"),
+    ("description", "string"),
+    ("userId", "string"),
+    ("status", "string"),
+    ("createdAt", "timestamp"),
+    ("latitude", "float"),
+    ("longitude", "float"),
+    ("geohash", "string"),
+    ("category", "string"),
+    ("priority", "string"),
+    ("isUrgent", "bool"),
+    ("categoryConfidence", "float"),
+    ("sentiment", "string"),
+    ("sentimentScore", "float"),
+    ("keywords", "list"),
+    ("urgentMatches", "list"),
+    ("duplicateOf", "string"),
+    ("groqRefined", "bool"),
+    ("pipelineVersion", "string"),
+)
+
+
+def flatten(snap):
+    """One export row for a grievance snapshot."""
+    data = snap.to_dict() or {}
+    hf_engine = data.get("hfEngine") or {}
+    model_info = hf_engine.get("modelInfo") or {}
+    created_at = data.get("createdAt")
+    return {
+        "id": snap.id,
+        "title": data.get("title"),
+        "description": data.get("description"),
+        "userId": data.get("userId"),
+        "status": data.get("status"),
+        "createdAt": created_at if isinstance(created_at, datetime) else None,
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "geohash": data.get("geohash"),
+        "category": hf_engine.get("category"),
+        "priority": hf_engine.get("priority"),
+        "isUrgent": hf_engine.get("isUrgent"),
+        "categoryConfidence": hf_engine.get("categoryConfidence"),
+        "sentiment": model_info.get("sentimentLabel"),
+        "sentimentScore": model_info.get("sentimentScore"),
+        "keywords": list(hf_engine.get("keywords") or []),
+        "urgentMatches": list(hf_engine.get("urgentMatches") or []),
+        "duplicateOf": hf_engine.get("duplicateOf"),
+        "groqRefined": model_info.get("groqModel") not in (None, "None") if hf_engine else None,
+        "pipelineVersion": hf_engine.get("pipelineVersion"),
+    }
+
+
+# --- Writers ---
+class NdjsonWriter:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            created_at = row["createdAt"]
+            self._file.write(json.dumps({**row, "createdAt": created_at.isoformat() if created_at else None}) + "\n")
+        self.rows += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Each write() call becomes one row group."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "string": pa.string(), "float": pa.float64(), "bool": pa.bool_(),
+            "timestamp": pa.timestamp("us", tz="UTC"), "list": pa.list_(pa.string()),
+        }
+        self._pa = pa
+        self.schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+        self.path = path
+        self.rows = 0
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"parquet": ParquetWriter, "ndjson": NdjsonWriter}
+
+
+def default_format():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "ndjson"
+    return "parquet"
+
+
+# --- Manifest ---
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# --- Export ---
+def export(db, out_dir, fmt, full=False, page_size=500, rows_per_file=100000, lag=60):
+    """Stream grievances into new files under `out_dir` and update the manifest. Returns the rows written."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    if manifest and manifest["format"] != fmt and not full:
+        raise ValueError(f"{out_dir} holds a {manifest['format']} export; use --format {manifest['format']} or --full")
+    watermark = None
+    if manifest and not full and manifest.get("watermark"):
+        watermark = datetime.fromisoformat(manifest["watermark"])
+
+    until = datetime.now(timezone.utc) - timedelta(seconds=lag)
+    query = db.collection("grievances").where("createdAt", "<", until)
+    if watermark is not None:
+        query = query.where("createdAt", ">", watermark)
+    query = query.order_by("createdAt").order_by("__name__")
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    files, writer, newest = [], None, watermark
+    total = 0
+
+    def close_writer():
+        writer.close()
+        files.append({"path": os.path.basename(writer.path), "rows": writer.rows,
+                      "minCreatedAt": first_created.isoformat(), "maxCreatedAt": newest.isoformat()})
+
+    try:
+        for page in iter_pages(query, page_size):
+            rows = [flatten(snap) for snap in page]
+            if writer is None or writer.rows >= rows_per_file:
+                if writer is not None:
+                    close_writer()
+                path = os.path.join(out_dir, f"grievances-{run_id}-{len(files):04d}{EXTENSIONS[fmt]}")
+                writer = WRITERS[fmt](path)
+                first_created = rows[0]["createdAt"]
+            writer.write(rows)
+            newest = rows[-1]["createdAt"]
+            total += len(rows)
+            logger.info(f"📌 {total} grievances exported")
+        if writer is not None:
+            close_writer()
+            writer = None
+    finally:
+        if writer is not None:
+            # Failed mid-file: the partial file is not in the manifest, so queries never read it
+            writer.close()
+
+    previous = (manifest or {}).get("files", []) if not full else []
+    save_manifest(out_dir, {
+        "format": fmt,
+        "watermark": newest.isoformat() if newest else None,
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+        "files": previous + files,
+    })
+    if full and manifest:
+        for entry in manifest.get("files", []):
+            if any(entry["path"] == new["path"] for new in files):
+                continue
+            try:
+                os.remove(os.path.join(out_dir, entry["path"]))
+            except OSError:
+                pass
+    logger.info(f"✅ Exported {total} grievances into {len(files)} new file(s) in {out_dir}")
+    return total
+
+
+# --- Query ---
+def iter_rows(directory, columns=None, where=None, since=None):
+    """
+    Rows of an export (dicts with createdAt as datetime), filtered by `where`
+    ({column: value}; list columns match if they contain the value) and `since`.
+    """
+    manifest = load_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No {MANIFEST} in {directory}")
+    where = where or {}
+    needed = None if columns is None else sorted(set(columns) | set(where) | ({"createdAt"} if since else set()))
+    for entry in manifest["files"]:
+        if since and datetime.fromisoformat(entry["maxCreatedAt"]) < since:
+            continue
+        path = os.path.join(directory, entry["path"])
+        for row in _read_file(path, needed):
+            if since and (row["createdAt"] is None or row["createdAt"] < since):
+                continue
+            if all(_matches(row.get(column), value) for column, value in where.items()):
+                yield {c: row.get(c) for c in columns} if columns else row
+
+
+def _read_file(path, columns):
+    if path.endswith(EXTENSIONS["parquet"]):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(columns=columns):
+            yield from batch.to_pylist()
+    else:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if row.get("createdAt"):
+                    row["createdAt"] = datetime.fromisoformat(row["createdAt"])
+                yield row
+
+
+def _matches(actual, expected):
+    if isinstance(actual, list):
+        return expected in actual
+    return str(actual).lower() == expected.lower()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def query(args):
+    where = dict(clause.split("=", 1) for clause in args.where)
+    columns = args.columns.split(",") if args.columns else None
+    if args.group_by:
+        columns = [args.group_by]
+    rows = iter_rows(args.dir, columns=columns, where=where, since=args.since)
+    if args.group_by:
+        counts = Counter()
+        for row in rows:
+            value = row.get(args.group_by)
+            counts.update(value if isinstance(value, list) else [value])
+        for value, count in counts.most_common(args.limit):
+            print(f"{value}\t{count}")
+        return
+    for i, row in enumerate(rows):
+        if args.limit and i >= args.limit:
+            break
+        print(json.dumps(row, default=_json_value, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="stream Firestore into local files")
+    export_parser.add_argument("--out", default="exports/grievances", help="output directory")
+    export_parser.add_argument("--format", choices=sorted(WRITERS), help="default: parquet if pyarrow is installed")
+    export_parser.add_argument("--full", action="store_true", help="re-export everything, replacing old files")
+    export_parser.add_argument("--page-size", type=int, default=500)
+    export_parser.add_argument("--rows-per-file", type=int, default=100000)
+    export_parser.add_argument("--lag", type=float, default=60, help="skip grievances newer than this (seconds)")
+
+    query_parser = commands.add_parser("query", help="filter or count exported rows")
+    query_parser.add_argument("--dir", default="exports/grievances")
+    query_parser.add_argument("--where", action="append", default=[], metavar="COLUMN=VALUE")
+    query_parser.add_argument("--since", type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+                              help="only grievances created at or after this ISO date/time (UTC)")
+    query_parser.add_argument("--columns", help="comma-separated columns to print")
+    query_parser.add_argument("--group-by", help="print row counts per value of this column")
+    query_parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    if args.command == "query":
+        query(args)
+        return
+    fmt = args.format or default_format()
+    if fmt == "parquet" and default_format() != "parquet":
+        logger.error("❌ pyarrow is not installed; pip install pyarrow or use --format ndjson")
+        sys.exit(1)
+    try:
+        export(init_db(), args.out, fmt, full=args.full, page_size=args.page_size,
+               rows_per_file=args.rows_per_file, lag=args.lag)
+    except Exception as err:
+        logger.error(f"❌ Export failed: {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
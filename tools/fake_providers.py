@@ -0,0 +1,284 @@
+# tools/fake_providers.py
+"""
+Fake Hugging Face Inference and Groq HTTP servers for benchmarks and local runs.
+
+One threaded HTTP server answers both APIs with canned, deterministic results
+(derived from a hash of the text) after a configurable latency:
+
+    POST /models/<model>                 HF zero-shot (candidate_labels) or sentiment
+    POST /openai/v1/chat/completions     Groq chat completion, single or batched prompt
+    GET  /stats                          requests, ok, errors and 429s per provider
+
+A batched HF request (a list of `inputs`) takes --hf-per-item-ms longer for
+every input after the first, like a model server running one forward pass, and
+--hf-capacity caps how many HF requests are served at once (the rest wait).
+A fraction of requests can fail with 500 (--error-rate) or be throttled with
+429 + Retry-After (--throttle-rate, or everything above --rate-limit requests
+per second). HF also answers 503 "model is loading" with --loading-rate.
+
+Point the app at it (keys just have to be non-empty):
+    HF_BASE_URL=http://127.0.0.1:8808 HF_API_TOKEN=fake \
+    GROQ_BASE_URL=http://127.0.0.1:8808 GROQ_API_KEY=fake python backend/server.py
+
+Usage:
+    python tools/fake_providers.py --port 8808 --latency-ms 300 --jitter-ms 50 --error-rate 0.01
+    python tools/fake_providers.py --groq-latency-ms 800 --rate-limit 20 --retry-after 1
+    python tools/fake_providers.py --hf-latency-ms 150 --hf-per-item-ms 10 --hf-capacity 4
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTIMENT_LABELS = ("negative", "neutral", "positive")
+CATEGORY_KEYS = ("water", "roads", "electricity", "sanitation", "health", "governance", "other")
+PRIORITY_LEVELS = ("high", "medium", "low")
+SINGLE_PROMPT = re.compile(r"Initial Category \(from simpler models\): '(\w+)'.*?Initial Priority \(from simpler models\): '(\w+)'")
+
+
+class Behaviour:
+    """Latency and failure settings for one provider."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=0.0, retry_after=1.0, loading_rate=0.0, per_item_ms=0.0, capacity=0):
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.capacity = capacity
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.loading_rate = loading_rate
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(capacity) if capacity else None
+        self._window = (0, 0)  # (second, requests seen in it)
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "loading": 0}
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def over_rate_limit(self):
+        if not self.rate_limit:
+            return False
+        second = int(time.monotonic())
+        with self._lock:
+            window, seen = self._window
+            seen = seen + 1 if window == second else 1
+            self._window = (second, seen)
+        return seen > self.rate_limit
+
+    def sleep(self, items=1):
+        delay = self.latency_ms + self.per_item_ms * (items - 1) + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay <= 0:
+            return
+        if self._slots is None:
+            time.sleep(delay / 1000)
+            return
+        with self._slots:
+            time.sleep(delay / 1000)
+
+
+def _score(text, salt=""):
+    """Stable pseudo-random number in [0, 1) for a text."""
+    digest = hashlib.blake2b(f"{salt}|{text}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") / 2 ** 64
+
+
+def hf_result(inputs, parameters):
+    labels = (parameters or {}).get("candidate_labels")
+
+    def one(text):
+        if labels:
+            top = int(_score(text, "category") * len(labels))
+            confidence = 0.5 + _score(text, "confidence") / 2
+            rest = (1 - confidence) / max(1, len(labels) - 1)
+            ordered = [labels[top]] + [label for i, label in enumerate(labels) if i != top]
+            return {"sequence": text, "labels": ordered, "scores": [confidence] + [rest] * (len(labels) - 1)}
+        top = int(_score(text, "sentiment") * len(SENTIMENT_LABELS))
+        score = 0.4 + _score(text, "score") * 0.6
+        return [{"label": SENTIMENT_LABELS[top], "score": score}] + [
+            {"label": label, "score": (1 - score) / 2} for i, label in enumerate(SENTIMENT_LABELS) if i != top
+        ]
+
+    if isinstance(inputs, list):
+        return [one(text) for text in inputs]
+    result = one(inputs)
+    # The sentiment pipeline wraps a single input's scores in an outer list
+    return result if labels else [result]
+
+
+def _refinement(category, priority):
+    return {
+        "category": category if category in CATEGORY_KEYS else "other",
+        "priority": priority if priority in PRIORITY_LEVELS else "medium",
+        "explanation": "Fake refinement: the initial classification was kept.",
+    }
+
+
+def groq_result(body):
+    messages = body.get("messages") or [{}]
+    system = messages[0].get("content", "")
+    user = messages[-1].get("content", "")
+    match = SINGLE_PROMPT.search(system)
+    if match:
+        content = _refinement(match.group(1), match.group(2))
+    else:
+        try:
+            grievances = json.loads(user).get("grievances", [])
+        except (ValueError, AttributeError):
+            grievances = []
+        content = {"results": [
+            {"id": g.get("id"), **_refinement(g.get("initialCategory"), g.get("initialPriority"))}
+            for g in grievances
+        ]}
+    completion = json.dumps(content)
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(completion) // 4
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": completion},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # bursts of new connections must not be refused at the listen backlog
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # the client gave up (its timeout), nothing to report
+        super().handle_error(request, client_address)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, {name: dict(b.counts) for name, b in self.server.behaviours.items()})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "invalid JSON"})
+            return
+        if self.path.startswith("/models/"):
+            provider = "hf"
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            provider = "groq"
+        else:
+            self._send(404, {"error": "not found"})
+            return
+
+        behaviour = self.server.behaviours[provider]
+        behaviour.count("requests")
+        if behaviour.over_rate_limit() or random.random() < behaviour.throttle_rate:
+            behaviour.count("throttled")
+            self._send(429, {"error": "Rate limit reached"}, {"Retry-After": f"{behaviour.retry_after:g}"})
+            return
+        inputs = body.get("inputs") if provider == "hf" else None
+        behaviour.sleep(len(inputs) if isinstance(inputs, list) else 1)
+        if provider == "hf" and random.random() < behaviour.loading_rate:
+            behaviour.count("loading")
+            self._send(503, {"error": "Model is loading", "estimated_time": behaviour.retry_after})
+            return
+        if random.random() < behaviour.error_rate:
+            behaviour.count("errors")
+            self._send(500, {"error": "Fake internal error"})
+            return
+
+        if provider == "hf":
+            payload = hf_result(inputs or "", body.get("parameters"))
+        else:
+            payload = groq_result(body)
+        behaviour.count("ok")
+        self._send(200, payload)
+
+
+def start(port=0, hf=None, groq=None):
+    """Serve both fakes from a daemon thread. Returns the server; its URL is `server.url`."""
+    server = FakeProviderServer(("127.0.0.1", port), FakeProviderHandler)
+    server.behaviours = {"hf": hf or Behaviour(), "groq": groq or Behaviour()}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="fake-providers", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=300, help="response latency for both providers")
+    parser.add_argument("--hf-latency-ms", type=float, help="override --latency-ms for HF")
+    parser.add_argument("--groq-latency-ms", type=float, help="override --latency-ms for Groq")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests/s per provider before 429 (0 = off)")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--loading-rate", type=float, default=0, help="fraction of HF requests answered with 503")
+    parser.add_argument("--hf-per-item-ms", type=float, default=0,
+                        help="extra HF latency per input after the first in a batched request")
+    parser.add_argument("--hf-capacity", type=int, default=0, help="HF requests served at once (0 = unlimited)")
+    args = parser.parse_args()
+
+    def behaviour(latency_ms, loading_rate=0.0, per_item_ms=0.0, capacity=0):
+        return Behaviour(
+            latency_ms=args.latency_ms if latency_ms is None else latency_ms,
+            jitter_ms=args.jitter_ms, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+            rate_limit=args.rate_limit, retry_after=args.retry_after, loading_rate=loading_rate,
+            per_item_ms=per_item_ms, capacity=capacity,
+        )
+
+    server = start(
+        args.port,
+        hf=behaviour(args.hf_latency_ms, args.loading_rate, args.hf_per_item_ms, args.hf_capacity),
+        groq=behaviour(args.groq_latency_ms),
+    )
+    print(f"✅ Fake HF/Groq listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
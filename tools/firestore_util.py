@@ -0,0 +1,55 @@
+# tools/firestore_util.py
+"""
+Firestore helpers shared by the command-line tools.
+
+`init_db()` returns a client for the Firestore emulator when
+FIRESTORE_EMULATOR_HOST is set, otherwise a firebase-admin client using
+backend/serviceAccountKey.json (or Application Default Credentials).
+`iter_pages`/`iter_collection` page through a query with a start_after cursor,
+so only one page is held in memory at a time; the query needs a stable final
+sort key (order_by("__name__")). firebase_admin is imported on first use, so
+tools that can run without Firestore do not need it installed.
+"""
+import os
+
+SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), "..", "backend", "serviceAccountKey.json")
+
+
+def init_db():
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        # Firestore emulator (benchmarks, local runs): no credentials, any project id
+        from google.cloud import firestore as cloud_firestore
+        return cloud_firestore.Client(project=os.getenv("GOOGLE_CLOUD_PROJECT", "demo-grievance"))
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if os.path.exists(SERVICE_ACCOUNT_PATH):
+        cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
+    else:
+        cred = credentials.ApplicationDefault()
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def iter_pages(query, page_size, start_after=None):
+    """Yield non-empty pages (lists of snapshots), starting after the `start_after` snapshot if given."""
+    cursor = start_after
+    while True:
+        page_query = query.limit(page_size)
+        if cursor is not None:
+            page_query = page_query.start_after(cursor)
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
+
+
+def iter_collection(query, page_size=500):
+    """Yield every snapshot of `query`, fetched `page_size` at a time."""
+    for page in iter_pages(query, page_size):
+        yield from page
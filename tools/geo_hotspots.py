@@ -0,0 +1,167 @@
+# tools/geo_hotspots.py
+"""
+Flag emerging grievance hotspots: open grievances grouped by geohash cell,
+category and time window, with the current window compared to the previous
+ones.
+
+A (cell, category) group is a hotspot when its current-window count is at
+least --min-count and at least --ratio times its baseline (mean of the
+previous --baseline-windows windows). Groups are ranked by a Poisson z-score.
+All grouping is vectorized with NumPy; --synthetic N skips Firestore and times
+the job on N generated points.
+
+Usage:
+    python tools/geo_hotspots.py --precision 6 --window-hours 24 --baseline-windows 7 [--write]
+    python tools/geo_hotspots.py --synthetic 500000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+import geo  # noqa: E402
+from firestore_util import init_db, iter_collection  # noqa: E402
+
+
+def load_points(db, since, page_size=1000):
+    """Open grievances with a location created after `since`, as NumPy arrays."""
+    query = (
+        db.collection("grievances")
+        .where("status", "==", "open")
+        .where("createdAt", ">=", since)
+        .select(["latitude", "longitude", "createdAt", "hfEngine.category"])
+        .order_by("createdAt")
+        .order_by("__name__")
+    )
+    lats, lngs, times, categories = [], [], [], []
+    for snap in iter_collection(query, page_size):
+        data = snap.to_dict() or {}
+        if data.get("latitude") is None or data.get("longitude") is None or not data.get("createdAt"):
+            continue
+        lats.append(data["latitude"])
+        lngs.append(data["longitude"])
+        times.append(data["createdAt"].timestamp())
+        categories.append((data.get("hfEngine") or {}).get("category") or "other")
+    return np.array(lats), np.array(lngs), np.array(times), np.array(categories)
+
+
+def synthetic_points(n, now, window_seconds, windows, seed=7):
+    """Uniform background over a city-sized box plus a few clusters that only appear in the current window."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(12.8, 13.2, n)
+    lng = rng.uniform(77.4, 77.8, n)
+    times = now - rng.uniform(0, window_seconds * (windows + 1), n)
+    categories = rng.choice(np.array(["water", "roads", "sanitation", "electricity", "other"]), n)
+    burst = max(n // 200, 20)
+    for i, (c_lat, c_lng, category) in enumerate(((12.97, 77.59, "water"), (13.05, 77.62, "sanitation"))):
+        sl = slice(i * burst, (i + 1) * burst)
+        lat[sl] = c_lat + rng.normal(0, 0.002, burst)
+        lng[sl] = c_lng + rng.normal(0, 0.002, burst)
+        times[sl] = now - rng.uniform(0, window_seconds, burst)
+        categories[sl] = category
+    return lat, lng, times, categories
+
+
+def find_hotspots(lat, lng, times, categories, now, precision=6, window_seconds=86400,
+                  baseline_windows=7, min_count=5, ratio=3.0):
+    """Return hotspot rows sorted by score (highest first)."""
+    windows = baseline_windows + 1
+    window = np.floor((now - times) / window_seconds).astype(np.int64)
+    keep = (window >= 0) & (window < windows)
+    lat, lng, window, categories = lat[keep], lng[keep], window[keep], categories[keep]
+    if not len(lat):
+        return []
+
+    # One integer key per (cell, category): cells use 5 * precision bits, categories the low bits
+    category_names, category_idx = np.unique(categories, return_inverse=True)
+    cells = geo.cell_ids(lat, lng, precision)
+    keys = cells * np.uint64(len(category_names)) + category_idx.astype(np.uint64)
+    group_keys, group = np.unique(keys, return_inverse=True)
+
+    # counts[g, w]: grievances of group g in window w (0 = current window)
+    flat = group * windows + window
+    counts = np.bincount(flat, minlength=len(group_keys) * windows).reshape(len(group_keys), windows)
+    current = counts[:, 0]
+    baseline = counts[:, 1:].mean(axis=1) if baseline_windows else np.zeros(len(group_keys))
+    score = (current - baseline) / np.sqrt(baseline + 1.0)
+    flagged = np.nonzero((current >= min_count) & (current >= ratio * np.maximum(baseline, 1.0)))[0]
+
+    # Centroid of the current window's points per group
+    in_current = window == 0
+    lat_sum = np.bincount(group[in_current], weights=lat[in_current], minlength=len(group_keys))
+    lng_sum = np.bincount(group[in_current], weights=lng[in_current], minlength=len(group_keys))
+
+    rows = []
+    for g in flagged[np.argsort(-score[flagged])]:
+        cell, category = divmod(int(group_keys[g]), len(category_names))
+        rows.append({
+            "geohash": geo.cell_id_to_geohash(cell, precision),
+            "category": str(category_names[category]),
+            "count": int(current[g]),
+            "baseline": round(float(baseline[g]), 2),
+            "score": round(float(score[g]), 2),
+            "latitude": round(float(lat_sum[g] / current[g]), 6),
+            "longitude": round(float(lng_sum[g] / current[g]), 6),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--precision", type=int, default=6, help="geohash cell precision (6 is about 1.2 x 0.6 km)")
+    parser.add_argument("--window-hours", type=float, default=24)
+    parser.add_argument("--baseline-windows", type=int, default=7)
+    parser.add_argument("--min-count", type=int, default=5)
+    parser.add_argument("--ratio", type=float, default=3.0)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--write", action="store_true", help="save the result to the hotspots/latest document")
+    parser.add_argument("--synthetic", type=int, help="time the job on this many generated points instead")
+    args = parser.parse_args()
+
+    now = time.time()
+    window_seconds = args.window_hours * 3600
+    windows = args.baseline_windows + 1
+    db = None
+    if args.synthetic:
+        points = synthetic_points(args.synthetic, now, window_seconds, windows)
+    else:
+        db = init_db()
+        since = datetime.fromtimestamp(now - window_seconds * windows, tz=timezone.utc)
+        started = time.perf_counter()
+        points = load_points(db, since)
+        logger.info(f"📌 Loaded {len(points[0])} open grievances with a location in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    rows = find_hotspots(*points, now=now, precision=args.precision, window_seconds=window_seconds,
+                         baseline_windows=args.baseline_windows, min_count=args.min_count, ratio=args.ratio)
+    logger.info(f"✅ Grouped {len(points[0])} points in {(time.perf_counter() - started) * 1000:.0f} ms; "
+                f"{len(rows)} hotspots")
+
+    print(f"{'geohash':<10}{'category':<14}{'count':>7}{'baseline':>10}{'score':>8}  centroid")
+    for row in rows[:args.top]:
+        print(f"{row['geohash']:<10}{row['category']:<14}{row['count']:>7}{row['baseline']:>10.2f}"
+              f"{row['score']:>8.2f}  {row['latitude']:.5f},{row['longitude']:.5f}")
+
+    if args.write and db is not None:
+        from firebase_admin import firestore
+
+        db.document("hotspots/latest").set({
+            "generatedAt": firestore.SERVER_TIMESTAMP,
+            "precision": args.precision,
+            "windowHours": args.window_hours,
+            "baselineWindows": args.baseline_windows,
+            "hotspots": rows[:args.top],
+        })
+        logger.info("✅ Saved hotspots/latest")
+
+
+if __name__ == "__main__":
+    main()
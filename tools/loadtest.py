@@ -0,0 +1,140 @@
+# tools/loadtest.py
+"""
+Load-test /submit-grievance under each serving mode against stubbed backends.
+
+For every mode the server (tools/loadtest_app.py, i.e. the real app with
+sleep-based HF/Groq/Firestore stubs) is started on a free port, hit by
+--users concurrent clients for --duration seconds, then stopped with SIGTERM.
+
+Modes:
+    dev      Flask development server (threaded), what `python backend/server.py` runs
+    gthread  gunicorn with backend/gunicorn.conf.py, GUNICORN_WORKERS x GUNICORN_THREADS
+    gevent   gunicorn with the gevent worker class
+
+Usage:
+    python tools/loadtest.py --modes dev,gthread,gevent --users 64 --duration 20 --workers 2 --threads 8
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONF = os.path.join(TOOLS_DIR, "..", "backend", "gunicorn.conf.py")
+PAYLOAD = {
+    "title": "Water pipe burst",
+    "description": "A pipe burst near the market and there is no water since morning.",
+    "userId": "loadtest-user",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, args):
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "STUB_HF_MS": str(args.hf_ms),
+        "STUB_GROQ_MS": str(args.groq_ms),
+        "STUB_FIRESTORE_MS": str(args.firestore_ms),
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_THREADS": str(args.threads),
+        "GUNICORN_WORKER_CLASS": "gevent" if mode == "gevent" else "gthread",
+        "GUNICORN_ACCESS_LOG": "",
+    }
+    if mode == "dev":
+        cmd = [sys.executable, "-c",
+               f"import loadtest_app; loadtest_app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONF, "--chdir", TOOLS_DIR, "loadtest_app:app"]
+    proc = subprocess.Popen(cmd, cwd=TOOLS_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def run_load(url, users, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def user():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=PAYLOAD, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else float("nan")
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="dev,gthread,gevent")
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--hf-ms", type=float, default=300)
+    parser.add_argument("--groq-ms", type=float, default=400)
+    parser.add_argument("--firestore-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode in args.modes.split(","):
+        port = free_port()
+        proc = start_server(mode, port, args)
+        try:
+            stats = run_load(f"http://127.0.0.1:{port}/submit-grievance", args.users, args.duration)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+        print(f"{mode:<9}{stats['rps']:>9.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+              f"{stats['p99']:>10.1f}{stats['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# tools/loadtest_app.py
+"""
+WSGI entry point for tools/loadtest.py: the real server app with HF, Groq and
+Firestore replaced by the sleep-based stubs from stub_backends.py
+(latencies from STUB_HF_MS, STUB_GROQ_MS and STUB_FIRESTORE_MS).
+"""
+import os
+import sys
+
+# Every request posts the same text, so keep the inference cache from answering in front of the stubs
+os.environ["INFERENCE_CACHE_SIZE"] = "0"
+os.environ.pop("INFERENCE_CACHE_PATH", None)
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "backend"))
+from stub_backends import install_stubs  # noqa: E402
+import server  # noqa: E402
+
+install_stubs(
+    float(os.getenv("STUB_HF_MS", 300)),
+    float(os.getenv("STUB_GROQ_MS", 400)),
+    float(os.getenv("STUB_FIRESTORE_MS", 80)),
+)
+app = server.app
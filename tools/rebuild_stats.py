@@ -0,0 +1,52 @@
+# tools/rebuild_stats.py
+"""
+Recompute the /stats aggregate counters from the grievances collection.
+
+Run once after deploying the counters (existing grievances are not counted
+yet), or whenever they drift, e.g. after documents were edited by hand.
+
+Usage:
+    python tools/rebuild_stats.py [--dry-run]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from grievance_stats import GrievanceStats, submission_deltas, classification_deltas, add_deltas  # noqa: E402
+from firestore_util import init_db, iter_collection  # noqa: E402
+
+
+def compute_totals(db, page_size=500):
+    """Stream the collection page by page (only the counted fields) and sum the deltas."""
+    query = db.collection("grievances").select(["status", "createdAt", "hfEngine"]).order_by("__name__")
+    totals = {}
+    for snap in iter_collection(query, page_size):
+        data = snap.to_dict() or {}
+        add_deltas(totals, submission_deltas(data.get("status") or "open", data.get("createdAt")))
+        if data.get("hfEngine"):
+            add_deltas(totals, classification_deltas(data["hfEngine"]))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="print the totals without writing them")
+    args = parser.parse_args()
+
+    db = init_db()
+    totals = compute_totals(db)
+    logger.info(f"📌 Counted {totals.get('total', 0)} grievances")
+    if args.dry_run:
+        print(json.dumps({k: v for k, v in totals.items() if k != "byKeyword"}, indent=2, sort_keys=True))
+        return
+    GrievanceStats(db).reset(totals)
+
+
+if __name__ == "__main__":
+    main()
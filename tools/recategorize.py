@@ -1,27 +1,38 @@
 # tools/recategorize.py
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 import os
 import sys
+import json
+import time
 import logging
+import argparse
+import queue
+from datetime import datetime, timezone
+
+from firestore_util import init_db, iter_pages
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Add the backend directory to the path to import helper functions
+# Re-runs reuse earlier HF/Groq results from the on-disk inference cache unless configured otherwise
+os.environ.setdefault(
+    "INFERENCE_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", "backend", ".cache", "inference.sqlite3")
+)
+
+# Add the backend directory to the path to import the shared classification pipeline
+# (pipeline.py does not pull in Flask, and creates the Groq client only when first needed)
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 try:
-    from server import (
-        classify_category, classify_priority, refine_with_groq, # <--- UPDATED: Import refine_with_groq
-        infer_category_from_keywords, find_urgent_matches, extract_keywords,
-        normalize_sentiment,
-        CATEGORY_MODEL, PRIORITY_MODEL, GROQ_MODEL,
-        HF_API_TOKEN, GROQ_API_KEY
+    from pipeline import (
+        grievance_pipeline, classification_fields, inference_cache, groq_usage_report,
+        HF_API_TOKEN, GROQ_API_KEY, GROQ_BATCH_SIZE,
     )
+    import rate_limit
+    import metrics
+    from grievance_stats import GrievanceStats, classification_deltas, add_deltas
 except ImportError as e:
-    logger.error(f"Failed to import functions from backend/server.py: {e}")
+    logger.error(f"Failed to import backend/pipeline.py: {e}")
     sys.exit(1)
 
 
@@ -38,125 +49,283 @@ if not GROQ_API_KEY:
 
 # --- Firebase Admin init ---
 try:
-    service_account_path = os.path.join(os.path.dirname(__file__), "..", "backend", "serviceAccountKey.json")
-    if os.path.exists(service_account_path):
-        cred = credentials.Certificate(service_account_path)
-    else:
-        cred = credentials.ApplicationDefault()
-
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
+    db = init_db()
 except Exception as e:
     logger.error(f"❌ Failed to initialize Firebase Admin: {e}")
     sys.exit(1)
 
+grievance_stats = GrievanceStats(db)
+grievance_pipeline.add_hook(metrics.observe_stage)
+
+
+# --- CLASSIFICATION ---
+def document_text(doc_snap):
+    data = doc_snap.to_dict() or {}
+    return f"{data.get('title', '')}\n{data.get('description', '')}".strip()
+
+
+def reprocess_page(docs, concurrency, groq_batch_size):
+    """Classify a page of documents in one batched pipeline call. Returns [(doc_snap, hf_engine, outcome)]."""
+    results = []
+    to_classify = []
+    for doc_snap in docs:
+        text = document_text(doc_snap)
+        if text:
+            to_classify.append((doc_snap, text))
+        else:
+            logger.warning(f"   ⚠️ Skipping {doc_snap.id}: No title or description.")
+            results.append((doc_snap, None, "skipped"))
+
+    engines = grievance_pipeline.run_many(
+        [text for _, text in to_classify], concurrency=concurrency, groq_batch_size=groq_batch_size
+    )
+    for (doc_snap, _), hf_engine in zip(to_classify, engines):
+        if hf_engine is None:
+            logger.error(f"   ❌ Failed for {doc_snap.id}")
+            results.append((doc_snap, None, "failed"))
+        else:
+            logger.info(f"   ➡ {doc_snap.id} (Category: {hf_engine['category']}, Priority: {hf_engine['priority']})")
+            results.append((doc_snap, hf_engine, "classified"))
+    return results
+
+
+# --- STREAMING READER & CHECKPOINT ---
+def build_query(since=None, stale_version=None):
+    query = db.collection("grievances")
+    if stale_version is not None:
+        # Classified under another pipeline version, or saved and never classified (""). Documents
+        # written before versions were stamped have no pipelineVersion field: one full run stamps them.
+        query = query.where("pipelineVersion", "!=", stale_version).order_by("pipelineVersion")
+    if since is not None:
+        query = query.where("createdAt", ">=", since).order_by("createdAt")
+    # Document ID as the (final) sort key gives a stable cursor for pagination
+    return query.order_by("__name__")
+
+
+def load_checkpoint(path, run_key):
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("runKey") != run_key:
+        logger.warning("⚠️ Checkpoint was written for different filters; ignoring it.")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, run_key, last_doc, counts):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"runKey": run_key, "lastDocPath": last_doc.reference.path, "counts": counts}, f)
+    os.replace(tmp_path, path)
+
+
+def commit_writes(results, batch_size):
+    """
+    Write hfEngine results with batched commits (Firestore allows 500 writes per batch).
+
+    Each commit also moves the /stats counters from the old to the new category/priority.
+    """
+    batch_size = min(batch_size, 499)  # one write per commit is the stats delta
+    written = 0
+    batch, pending, deltas = db.batch(), 0, {}
+    for doc_snap, hf_engine, _ in results:
+        if hf_engine is None:
+            continue
+        batch.set(doc_snap.reference, classification_fields(hf_engine), merge=True)
+        add_deltas(deltas, classification_deltas(hf_engine, previous=(doc_snap.to_dict() or {}).get("hfEngine")))
+        pending += 1
+        if pending >= batch_size:
+            grievance_stats.apply(deltas, batch)
+            with metrics.timed("firestoreBatchMerge"):
+                batch.commit()
+            grievance_stats.apply_keywords(deltas)
+            written += pending
+            batch, pending, deltas = db.batch(), 0, {}
+    if pending:
+        grievance_stats.apply(deltas, batch)
+        with metrics.timed("firestoreBatchMerge"):
+            batch.commit()
+        grievance_stats.apply_keywords(deltas)
+        written += pending
+    return written
+
 
 # --- MAIN RE-CATEGORIZATION ---
-def recategorize_all():
-    logger.info("🔄 Fetching all grievances...")
+def recategorize_all(since=None, only_missing=False, dry_run=False, limit=None, concurrency=4,
+                     page_size=200, batch_size=400, checkpoint_path=None, resume=False,
+                     groq_batch_size=GROQ_BATCH_SIZE, stale=False):
+    stale_version = grievance_pipeline.version if stale else None
+    run_key = json.dumps({
+        "since": since.isoformat() if since else None, "onlyMissing": only_missing, "staleVersion": stale_version,
+    })
+    counts = {"scanned": 0, "classified": 0, "skipped": 0, "failed": 0, "written": 0}
+    start_after = None
+
+    if resume and checkpoint_path:
+        checkpoint = load_checkpoint(checkpoint_path, run_key)
+        if checkpoint:
+            start_after = db.document(checkpoint["lastDocPath"]).get()
+            counts.update(checkpoint.get("counts", {}))
+            logger.info(f"⏩ Resuming after {checkpoint['lastDocPath']} ({counts['scanned']} already scanned)")
+
+    if stale_version:
+        logger.info(f"📌 Only grievances not classified by pipeline version {stale_version}")
+    logger.info("🔄 Streaming grievances...")
+    started = time.monotonic()
+    processed_this_run = 0
+
     try:
-        snapshot = db.collection("grievances").stream()
+        for page in iter_pages(build_query(since, stale_version), page_size, start_after):
+            todo = [d for d in page if not (only_missing and (d.to_dict() or {}).get("hfEngine"))]
+            if limit is not None and len(todo) > limit - processed_this_run:
+                todo = todo[:max(0, limit - processed_this_run)]
+                if not todo:
+                    break
+                # Resume right after the last document actually processed
+                page = page[:page.index(todo[-1]) + 1]
+            last_doc = page[-1]
+            counts["scanned"] += len(page)
+            counts["skipped"] += len(page) - len(todo)
+
+            results = reprocess_page(todo, concurrency, groq_batch_size)
+            processed_this_run += len(todo)
+            for _, _, outcome in results:
+                counts[outcome] += 1
+
+            if not dry_run:
+                counts["written"] += commit_writes(results, batch_size)
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, run_key, last_doc, counts)
+
+            elapsed = time.monotonic() - started
+            logger.info(f"📌 {counts['scanned']} scanned, {counts['classified']} classified "
+                        f"({processed_this_run / elapsed:.1f} docs/s)")
+            if limit is not None and processed_this_run >= limit:
+                break
     except Exception as e:
         logger.error(f"❌ Failed to fetch documents: {e}")
-        return
+        return counts
+
+    elapsed = time.monotonic() - started
+    logger.info("\n📊 Throughput report")
+    logger.info(f"   Elapsed: {elapsed:.1f}s, {processed_this_run} documents this run "
+                f"({processed_this_run / elapsed if elapsed else 0:.1f} docs/s)")
+    logger.info(f"   Counts: {counts}{' (dry run, nothing written)' if dry_run else ''}")
+    logger.info(f"   Rate limits: {rate_limit.stats()}")
+    logger.info(f"   Groq usage: {groq_usage_report()}")
+    logger.info(f"📦 Inference cache: {inference_cache.stats()}")
+    logger.info("\n🎉 Re-categorization complete!")
+    return counts
 
-    docs_to_reprocess = list(snapshot)
-    logger.info(f"📌 Found {len(docs_to_reprocess)} documents\n")
 
-    for doc_snap in docs_to_reprocess:
-        data = doc_snap.to_dict()
-        doc_id = doc_snap.id
-        text = f"{data.get('title', '')}\n{data.get('description', '')}".strip()
+# --- LISTENER ---
+def listen(concurrency=4, batch_size=400, page_size=200, groq_batch_size=GROQ_BATCH_SIZE, grace=30.0):
+    """
+    Long-running mode: classify grievances that were saved without a classification
+    (pipelineVersion == "") as they appear, e.g. async submissions whose job was lost.
+    Each one is left alone for `grace` seconds first, so the server can finish its own
+    classification, and is re-read before it is classified.
+    """
+    pending = queue.Queue()  # (due time, document reference), due times in arrival order
 
-        logger.info(f"➡ Reprocessing {doc_id}")
+    def on_snapshot(snapshots, changes, read_time):
+        for change in changes:
+            if change.type.name == "ADDED":
+                pending.put((time.monotonic() + grace, change.document.reference))
 
-        if not text:
-            logger.warning(f"   ⚠️ Skipping {doc_id}: No title or description.")
-            continue
+    watch = db.collection("grievances").where("pipelineVersion", "==", "").on_snapshot(on_snapshot)
+    logger.info(f"👂 Listening for unclassified grievances (pipeline version {grievance_pipeline.version})")
+    held = None
+    try:
+        while True:
+            due, ref = held or pending.get()
+            held = None
+            time.sleep(max(0.0, due - time.monotonic()))
+            refs = [ref]
+            while len(refs) < page_size:
+                try:
+                    due, ref = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if due > time.monotonic():
+                    held = (due, ref)
+                    break
+                refs.append(ref)
 
-        try:
-            # 1. HF/Rule-based Classification (FIRST LOGIC PASS)
-            cat_res = classify_category(text)
-            pri_res = classify_priority(text)
-
-            # Apply logic from server.py (Existing HF/Keyword logic for comparison)
-            
-            hf_priority = "low"
-            sentiment_raw = pri_res.get("sentiment")
-            score = pri_res.get("sentimentScore")
-            sentiment_norm = normalize_sentiment(sentiment_raw)
-            urgent_matches = find_urgent_matches(text)
-
-            if len(urgent_matches) > 0:
-                hf_priority = "high"
-            elif sentiment_norm == "negative":
-                if score > 0.7: hf_priority = "high"
-                elif score > 0.35: hf_priority = "medium"
-            elif sentiment_norm == "neutral":
-                if score > 0.6: hf_priority = "medium"
-
-            hf_category = cat_res.get("category", "other")
-            keyword_category = infer_category_from_keywords(text)
-            if keyword_category:
-                hf_category = keyword_category
-            
-            if hf_category == "sanitation" and hf_priority == "low":
-                hf_priority = "medium"
-                
-            hf_raw_label = cat_res.get("rawLabel", "other")
-            
-            # 2. LLM Refinement (SECOND LOGIC PASS / WRAPPER)
-            groq_res = refine_with_groq(text, hf_category, hf_priority, hf_raw_label)
-
-            # 3. FINAL CLASSIFICATION (Prioritizes Groq refinement)
-            if groq_res:
-                priority = groq_res.get("priority", hf_priority)
-                category = groq_res.get("category", hf_category)
-                ai_explanation = groq_res.get("explanation", "Refined by Groq LLM.")
-            else:
-                # Fallback to the existing logic results
-                priority = hf_priority
-                category = hf_category
-                ai_explanation = (
-                    f"Category '{category}' predicted from '{hf_raw_label}' "
-                    f"(score: {float(cat_res.get('confidence', 0.0)):.2f}), "
-                    f"Priority '{priority}' determined using sentiment ('{sentiment_raw}', "
-                    f"score: {float(score):.2f}) and urgency keywords."
-                )
-
-            keywords = extract_keywords(text)
-
-            hf_engine = {
-                "category": category,
-                "priority": priority,
-                "isUrgent": priority == "high",
-                "keywords": keywords,
-                "explanation": ai_explanation,
-                
-                # Keep all model data for diagnostics
-                "rawCategoryLabel": hf_raw_label,
-                "categoryConfidence": float(cat_res.get("confidence", 0.0)),
-                "urgentMatches": urgent_matches,
-                "modelInfo": {
-                    "categoryModel": CATEGORY_MODEL,
-                    "priorityModel": PRIORITY_MODEL,
-                    "sentimentLabel": sentiment_raw,
-                    "sentimentScore": float(score),
-                    "groqModel": GROQ_MODEL if groq_res else "None",
-                    "hfCategory": hf_category,
-                    "hfPriority": hf_priority,
-                },
-            }
-
-            doc_snap.reference.set({"hfEngine": hf_engine}, merge=True)
-            logger.info(f"   ✅ Updated: {doc_id} (Category: {category}, Priority: {priority})\n")
-
-        except Exception as e:
-            logger.error(f"   ❌ Failed for {doc_id}: {e}")
+            docs = [
+                snap for snap in db.get_all(refs)
+                if snap.exists and (snap.to_dict() or {}).get("pipelineVersion") == ""
+            ]
+            if not docs:
+                continue
+            results = reprocess_page(docs, concurrency, groq_batch_size)
+            written = commit_writes(results, batch_size)
+            logger.info(f"✅ Listener classified {written}/{len(docs)} grievances")
+    except KeyboardInterrupt:
+        logger.info("⏹️ Listener stopped")
+    finally:
+        watch.unsubscribe()
 
-    logger.info("\n🎉 Re-categorization complete!")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run AI classification over stored grievances.")
+    parser.add_argument("--since", type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+                        help="only grievances created at or after this ISO date/time (UTC)")
+    parser.add_argument("--only-missing", action="store_true", help="skip documents that already have hfEngine")
+    parser.add_argument("--stale", action="store_true",
+                        help="only documents not classified by the current pipeline version (indexed query)")
+    parser.add_argument("--listen", action="store_true",
+                        help="keep running and classify new grievances still missing hfEngine")
+    parser.add_argument("--listen-grace", type=float, default=30,
+                        help="seconds a new grievance is left to the server before the listener takes it")
+    parser.add_argument("--dry-run", action="store_true", help="classify but do not write to Firestore")
+    parser.add_argument("--limit", type=int, help="stop after classifying this many documents")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads (default: 4)")
+    parser.add_argument("--page-size", type=int, default=200, help="documents fetched per page (default: 200)")
+    parser.add_argument("--batch-size", type=int, default=400, help="writes per Firestore batch, max 500")
+    parser.add_argument("--hf-rps", type=float, default=0, help="HF requests per second (0 = unlimited)")
+    parser.add_argument("--groq-rps", type=float, default=0, help="Groq requests per second (0 = unlimited)")
+    parser.add_argument("--groq-batch-size", type=int, default=GROQ_BATCH_SIZE,
+                        help=f"grievances per batched Groq request, 0 = one request each (default: {GROQ_BATCH_SIZE})")
+    parser.add_argument("--checkpoint", default=os.path.join(os.path.dirname(__file__), ".recategorize_checkpoint.json"),
+                        help="checkpoint file updated after every page")
+    parser.add_argument("--resume", action="store_true", help="continue after the last checkpointed document")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus stage timings on this port while running")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    recategorize_all()
\ No newline at end of file
+    args = parse_args()
+    if args.hf_rps:
+        rate_limit.configure("hf", args.hf_rps)
+    if args.groq_rps:
+        rate_limit.configure("groq", args.groq_rps)
+    if args.metrics_port:
+        if metrics.serve(args.metrics_port):
+            logger.info(f"📈 Metrics on http://0.0.0.0:{args.metrics_port}/")
+        else:
+            logger.warning("⚠️ prometheus_client is not installed; --metrics-port ignored")
+    if args.listen:
+        listen(
+            concurrency=args.concurrency,
+            batch_size=min(args.batch_size, 500),
+            page_size=args.page_size,
+            groq_batch_size=args.groq_batch_size,
+            grace=args.listen_grace,
+        )
+    else:
+        recategorize_all(
+            since=args.since,
+            only_missing=args.only_missing,
+            dry_run=args.dry_run,
+            limit=args.limit,
+            concurrency=args.concurrency,
+            page_size=args.page_size,
+            batch_size=min(args.batch_size, 500),
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            groq_batch_size=args.groq_batch_size,
+            stale=args.stale,
+        )
@@ -0,0 +1,76 @@
+# tools/stub_backends.py
+"""
+In-process, sleep-based stand-ins for HF, Groq and Firestore.
+
+Used by benchmarks/bench_submit_stubbed.py and tools/loadtest_app.py to measure
+request orchestration rather than model or network speed: each stub sleeps for
+a fixed latency and returns a canned result. Unlike tools/fake_providers.py
+nothing goes over HTTP, and Firestore is replaced too.
+"""
+import time
+import types
+from concurrent.futures import Future
+
+
+class SerialExecutor:
+    """Executor stand-in that runs each task inline, reproducing the old sequential flow."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as err:
+            future.set_exception(err)
+        return future
+
+
+def install_stubs(hf_ms, groq_ms, firestore_ms, setattr=setattr):
+    """
+    Replace network-bound calls in `pipeline`/`server` with sleep-based stubs.
+
+    Pass pytest's `monkeypatch.setattr` as `setattr` to have them undone after a test.
+    """
+    import pipeline
+    import server
+
+    def fake_hf(text, model_name, task_params=None, deadline=None):
+        time.sleep(hf_ms / 1000)
+        if model_name == pipeline.CATEGORY_MODEL:
+            return {"labels": [pipeline.CATEGORY_LABELS[0]], "scores": [0.91]}
+        return [[{"label": "negative", "score": 0.82}]]
+
+    def fake_groq(text, initial_category, initial_priority, hf_raw_label, deadline=None):
+        time.sleep(groq_ms / 1000)
+        return {"category": initial_category, "priority": initial_priority, "explanation": "stub"}
+
+    class FakeDoc:
+        def __init__(self, doc_id):
+            self.id = doc_id
+
+        def set(self, data, merge=False):
+            time.sleep(firestore_ms / 1000)
+
+        def get(self, field_paths=None):
+            time.sleep(firestore_ms / 1000)
+            return types.SimpleNamespace(exists=True, to_dict=lambda: {"status": "open"})
+
+    class FakeCollection:
+        def add(self, data):
+            time.sleep(firestore_ms / 1000)
+            return None, FakeDoc(f"bench-{time.monotonic_ns()}")
+
+        def document(self, doc_id=None):
+            return FakeDoc(doc_id or f"bench-{time.monotonic_ns()}")
+
+    class FakeBatch:
+        def set(self, doc_ref, data, merge=False):
+            pass
+
+        def commit(self):
+            time.sleep(firestore_ms / 1000)
+
+    db = types.SimpleNamespace(collection=lambda name: FakeCollection(), document=FakeDoc, batch=FakeBatch)
+    setattr(pipeline, "classify_huggingface", fake_hf)
+    setattr(pipeline, "refine_with_groq", fake_groq)
+    setattr(server, "db", db)
+    setattr(server.grievance_stats, "db", db)